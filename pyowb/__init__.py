@@ -1,4 +1,16 @@
 from .keywords import *
+from .graph import *
+from .compiled_plan import *
+from .resources import *
+from .rollup import *
+from .outline import *
+from .work_calendar import *
+from .profiling import *
+from .export_cache import *
+from .selection import *
+from .export_context import *
+from .plan_image import *
+from .risk import *
 from .open_work_bench import *
 from .ganttproject import *
 from .project_libre import *
@@ -0,0 +1,153 @@
+# Batch export: many plan sources, fanned out over worker processes.
+#
+#   results = export_batch(['plans/a.py', 'plans/b.json', 'teams.plans:c'],
+#                          ['owb', 'project_libre'], 'out/', start_date=datetime(2024, 1, 8))
+#
+#   Every source is loaded, compiled and written by a single worker, which
+#   sends back only a small BatchResult, so the parent never holds a plan.
+#   At most max_pending sources are queued at a time, and with
+#   max_tasks_per_child workers are replaced after that many sources, which
+#   bounds the memory of both.  A source that fails (or whose worker dies)
+#   gets a BatchResult with the error; the others are unaffected.
+#
+#   Exports are deterministic: auto IDs are numbered per export, and the
+#   start date is the one given (pass one: it defaults to now, which differs
+#   between workers).
+
+import concurrent.futures
+import os
+import time
+import traceback
+from concurrent.futures.process import BrokenProcessPool
+from collections import namedtuple
+from .export_cache import *
+from .loaders import *
+from .exporter import *
+from .profiling import *
+
+# outputs: list of (filename, written, seconds)
+# error: None, or the formatted exception (with its traceback)
+BatchResult = namedtuple('BatchResult', ['source', 'outputs', 'seconds', 'error'])
+
+# ExportCache per directory, in each worker process
+_worker_caches = {}
+
+
+def _worker_cache(cache_directory):
+    if cache_directory is None:
+        return None
+    cache = _worker_caches.get(cache_directory)
+    if cache is None:
+        cache = _worker_caches[cache_directory] = ExportCache(cache_directory)
+    return cache
+
+# Runs in a worker; must not raise, so that one source cannot fail the
+# batch: even a plan script that calls sys.exit() only fails its own job.
+def _export_job(source, formats, output_directory, options):
+    begin = time.perf_counter()
+    try:
+        exporter = PlanExporter(source, formats, output_directory, options['start_date'],
+                                options['reduce_dependencies'], options['summary_milestones'],
+                                _worker_cache(options['cache_directory']), options['selection'], options['strict'])
+        outputs = exporter.export()
+        return BatchResult(source, outputs, time.perf_counter() - begin, None)
+    except BaseException:
+        return BatchResult(source, [], time.perf_counter() - begin, traceback.format_exc())
+
+def _check_output_filenames(sources, formats, output_directory):
+    source_by_filename = {}
+    for source in sources:
+        for export_format in formats:
+            filename = os.path.normcase(os.path.abspath(output_filename(source, export_format, output_directory)))
+            if filename in source_by_filename:
+                raise PlanSourceError('{0} and {1} would both write {2}'.format(source_by_filename[filename], source, filename))
+            source_by_filename[filename] = source
+
+def _make_pool(max_workers, max_tasks_per_child):
+    if max_tasks_per_child:
+        # python 3.11+
+        return concurrent.futures.ProcessPoolExecutor(max_workers, max_tasks_per_child=max_tasks_per_child)
+    return concurrent.futures.ProcessPoolExecutor(max_workers)
+
+# Runs jobs (indices into sources) over a pool of max_workers, with at most
+# max_pending of them submitted at a time, and calls on_result(index, result)
+# as they complete; a job whose result cannot be had fails with that error.
+# If a worker dies, the pool is unusable: returns (jobs that were in
+# flight, jobs not yet submitted), else ([], []).
+def _run_jobs(jobs, submit_arguments, max_workers, max_pending, max_tasks_per_child, on_result):
+    jobs = iter(jobs)
+    pending = {}
+    with _make_pool(max_workers, max_tasks_per_child) as pool:
+        while True:
+            for index in jobs:
+                pending[pool.submit(_export_job, *submit_arguments(index))] = index
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                return ([], [])
+            done, not_done = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            broken_jobs = []
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    broken_jobs.append(index)
+                    continue
+                except BaseException:
+                    result = BatchResult(submit_arguments(index)[0], [], 0.0, traceback.format_exc())
+                on_result(index, result)
+            if broken_jobs:
+                return (broken_jobs + list(pending.values()), list(jobs))
+
+
+# Exports every source to every format in formats, into output_directory.
+# Returns a BatchResult per source, in the order of sources.
+#
+# max_workers defaults to the number of CPUs; max_pending (the number of
+#   sources queued or running at a time) to twice that.
+# max_tasks_per_child replaces a worker after that many sources (python 3.11+).
+# cache_directory, if given, is an ExportCache directory shared by the workers.
+# callback, if given, is called with each BatchResult as soon as it is done.
+# selection, if given, is a Selection (see make_selection) every export applies.
+# strict fails the source of a plan with a dependency cycle (with a
+#   DependencyCycleError) instead of reporting the cycle.
+def export_batch(sources, formats, output_directory='.', start_date=None, reduce_dependencies=False,
+                 summary_milestones=False, cache_directory=None, max_workers=None, max_pending=None,
+                 max_tasks_per_child=None, callback=None, selection=None, strict=False):
+    sources = list(sources)
+    formats = list(formats)
+    _check_output_filenames(sources, formats, output_directory)
+    os.makedirs(output_directory, exist_ok=True)
+    if not max_workers:
+        max_workers = min(os.cpu_count() or 1, max(len(sources), 1))
+    if not max_pending:
+        max_pending = 2 * max_workers
+    options = {
+        'start_date' : start_date,
+        'reduce_dependencies' : reduce_dependencies,
+        'summary_milestones' : summary_milestones,
+        'cache_directory' : cache_directory,
+        'selection' : selection,
+        'strict' : strict,
+    }
+
+    results = [None] * len(sources)
+    def _submit_arguments(index):
+        return (sources[index], formats, output_directory, options)
+    def _on_result(index, result):
+        results[index] = result
+        if callback:
+            callback(result)
+
+    jobs = range(len(sources))
+    broken_jobs = []
+    while jobs:
+        more_broken_jobs, jobs = _run_jobs(jobs, _submit_arguments, max_workers, max_pending, max_tasks_per_child, _on_result)
+        broken_jobs += more_broken_jobs
+    # retries each job whose worker died on its own, so that a job that
+    # kills its worker takes no other job with it
+    for index in sorted(broken_jobs):
+        if _run_jobs([index], _submit_arguments, 1, 1, None, _on_result)[0]:
+            _on_result(index, BatchResult(sources[index], [], 0.0, 'worker process died\n'))
+    return results
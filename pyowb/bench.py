@@ -0,0 +1,231 @@
+# Benchmarks on synthetic plans.
+#
+#   generate_plan() builds a random, but reproducible, plan of a given size;
+#   run_benchmarks() times every stage of an export on such plans and
+#   returns the timings as a JSON-compatible dict.
+#
+#   Usage:
+#       python -m pyowb.bench [--sizes 1000,10000] [--output results.json]
+
+import argparse
+import bisect
+import collections
+import inspect
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from .keywords import *
+from .tasks import *
+from .compiled_plan import *
+from .compiled_plan import _flatten_plan, _index_ids, _resolve_dependencies
+from .graph import *
+from .open_work_bench import *
+from .open_work_bench import _get_leaf_dependencies
+from .ganttproject import *
+from .project_libre import *
+from .profiling import *
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+
+_efforts = (0.5, 1, 2, 3, 5)
+_max_summary_dep_levels = 2
+
+
+# Returns a plan with task_count tasks (fewer if depth and fan_out cannot
+# hold that many).  Explicit DEPS only ever point at tasks that end before
+# the dependent task starts in pre-order, so the plan never has a cycle.
+#
+#   depth               maximum depth below the root
+#   fan_out             mean number of children of a summary
+#   sequence_ratio      fraction of summaries whose children are a SEQUENCE
+#   sequence_depth      only summaries this close to the bottom level are sequenced
+#   parallel_ratio      fraction of SEQUENCEs that switch back to PARALLEL half-way
+#   deps_density        explicit DEPS per task
+#   summary_dep_ratio   fraction of explicit DEPS that name a summary
+#
+# A SEQUENCE of summaries, or a dependency on a summary, expands into one
+# dependency per pair of leaves in OWB and ProjectLibre.  To keep the
+# exports of large plans linear in size, SEQUENCEs are limited to the lowest
+# sequence_depth levels of summaries, and a dependency on a summary names a
+# summary at most _max_summary_dep_levels above a leaf.
+def generate_plan(task_count, depth=7, fan_out=8, sequence_ratio=0.5, sequence_depth=2, parallel_ratio=0.1,
+                  deps_density=0.05, summary_dep_ratio=0.2, seed=1):
+    rnd = random.Random(seed)
+
+    # breadth-first, so that every level fills up before the next one
+    plan = {NAME : 'Synthetic plan'}
+    created = 1
+    queue = collections.deque([(plan, 0)])
+    while queue and created < task_count:
+        task, level = queue.popleft()
+        if level >= depth:
+            continue
+        child_count = min(rnd.randint(1, 2*fan_out - 1), task_count - created)
+        child_tasks = [{} for number in range(child_count)]
+        created += child_count
+        if level >= depth - sequence_depth and rnd.random() < sequence_ratio:
+            task[CHILDREN] = [SEQUENCE] + child_tasks
+            if child_count > 1 and rnd.random() < parallel_ratio:
+                task[CHILDREN].insert(1 + child_count//2, PARALLEL)
+        else:
+            task[CHILDREN] = child_tasks
+        queue.extend((child, level+1) for child in child_tasks)
+
+    tasks = []
+    parents = []
+    for position, (task, parent_position, level, sequence_predecessor_position) in enumerate(iter_preorder(plan)):
+        tasks.append(task)
+        parents.append(parent_position)
+        if position:
+            task[ID] = 't{0}'.format(position)
+            task[NAME] = 'Category{0} - task {1}'.format(position % 7, position)
+        if not has_children(task):
+            task[EFFORT] = rnd.choice(_efforts)
+
+    # subtree_end[i]: one past the last pre-order position in the subtree of i
+    subtree_end = list(range(1, len(tasks)+1))
+    for position in reversed(range(1, len(tasks))):
+        parent_position = parents[position]
+        subtree_end[parent_position] = max(subtree_end[parent_position], subtree_end[position])
+    leaf_positions = [position for position, task in enumerate(tasks) if not has_children(task)]
+
+    dependency_count = int(deps_density * len(tasks))
+    for number in range(dependency_count):
+        position = rnd.randrange(1, len(tasks))
+        earlier_leaf_count = bisect.bisect_left(leaf_positions, position)
+        if not earlier_leaf_count:
+            continue
+        predecessor_position = leaf_positions[rnd.randrange(earlier_leaf_count)]
+        if rnd.random() < summary_dep_ratio:
+            # climb to a summary that still ends before position
+            for climb in range(rnd.randint(1, _max_summary_dep_levels)):
+                parent_position = parents[predecessor_position]
+                if parent_position <= 0 or subtree_end[parent_position] > position:
+                    break
+                predecessor_position = parent_position
+        tasks[position].setdefault(DEPS, []).append(tasks[predecessor_position][ID])
+    return plan
+
+# The options of generate_plan and their defaults, from its signature.
+def _generator_defaults():
+    return dict((parameter.name, parameter.default) for parameter in inspect.signature(generate_plan).parameters.values()
+                if parameter.default is not inspect.Parameter.empty)
+
+
+def _time_call(function, *args, **kwargs):
+    begin = time.perf_counter()
+    result = function(*args, **kwargs)
+    return (time.perf_counter() - begin, result)
+
+def _file_size(filename):
+    return os.path.getsize(filename)
+
+
+# Times each stage of an export on a plan of task_count tasks.
+# Returns a list of dict(phase, seconds, ...) records.
+def benchmark_size(task_count, directory, **generator_options):
+    options = _generator_defaults()
+    options.update(generator_options)
+    records = []
+
+    def _record(phase, seconds, **details):
+        record = {'tasks' : task_count, 'phase' : phase, 'seconds' : round(seconds, 6)}
+        record.update(details)
+        records.append(record)
+
+    seconds, plan = _time_call(generate_plan, task_count, **options)
+    _record('generate_plan', seconds, generated_tasks=sum(1 for visit in iter_preorder(plan)))
+
+    id_to_task = {}
+    seconds, result = _time_call(sanitize_tasks, plan, id_to_task, False, in_place=False)
+    _record('sanitize_tasks', seconds)
+    del result, id_to_task
+
+    with profile_exports() as reports:
+        seconds, compiled = _time_call(compile_plan, plan)
+    phases = dict((record['phase'], round(record['seconds'], 6)) for record in reports[0]['phases'])
+    _record('compile_plan', seconds, dependencies=sum(len(predecessors) for predecessors in compiled.predecessors), phases=phases)
+    # what _validate_tasks used to do: resolve DEPS, then find cycles
+    tasks, parents, levels, sequence_predecessors = _flatten_plan(plan, auto_id_allocator)
+    resolve_seconds, predecessors = _time_call(_resolve_dependencies, tasks, sequence_predecessors, _index_ids(tasks))
+    cycle_seconds, cycles = _time_call(check_dependency_cycles, compiled)
+    _record('validate_tasks', resolve_seconds + cycle_seconds)
+    del tasks, parents, levels, sequence_predecessors, predecessors
+
+    seconds, leaf_dependencies = _time_call(_get_leaf_dependencies, compiled)
+    _record('leaf_expansion', seconds, leaf_dependencies=sum(len(predecessors) for predecessors in leaf_dependencies.values()))
+    del leaf_dependencies
+
+    exports = [
+        ('plan_to_owb_xml', plan_to_owb_xml, 'plan.xml', {}),
+        ('plan_to_project_libre_xml', plan_to_project_libre_xml, 'plan.project_libre.xml', {'start_date' : datetime(2016, 10, 10)}),
+        ('plan_to_ganttproject', plan_to_ganttproject, 'plan.gan', {}),
+    ]
+    for phase, function, basename, kwargs in exports:
+        filename = os.path.join(directory, basename)
+        with profile_exports() as reports:
+            seconds, result = _time_call(function, filename, compiled, **kwargs)
+        _record(phase, seconds, bytes=_file_size(filename),
+                phases=dict((record['phase'], round(record['seconds'], 6)) for record in reports[0]['phases']))
+        os.remove(filename)
+    return records
+
+
+# Returns dict(environment, options, results); results holds one record
+# per size and phase.
+def run_benchmarks(sizes=DEFAULT_SIZES, label=None, **generator_options):
+    options = _generator_defaults()
+    options.update(generator_options)
+    results = []
+    with tempfile.TemporaryDirectory(prefix='pyowb_bench_') as directory:
+        for task_count in sizes:
+            results.extend(benchmark_size(task_count, directory, **options))
+    return {
+        'label' : label,
+        'created' : datetime.now().isoformat(),
+        'environment' : {
+            'python' : platform.python_version(),
+            'implementation' : platform.python_implementation(),
+            'machine' : platform.machine(),
+        },
+        'options' : options,
+        'results' : results,
+    }
+
+def write_results(results, filename):
+    with open(filename, 'wt') as outfile:
+        json.dump(results, outfile, indent=2, sort_keys=True)
+        outfile.write('\n')
+
+
+def _parse_sizes(text):
+    return tuple(int(size) for size in text.split(','))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pyowb.bench', description='Time pyowb exports on synthetic plans.')
+    parser.add_argument('--sizes', type=_parse_sizes, default=DEFAULT_SIZES,
+                        help='comma-separated task counts (default: %(default)s)')
+    parser.add_argument('--output', help='write the results as JSON to this file (default: stdout)')
+    parser.add_argument('--label', help='free-form label stored with the results, e.g. a version')
+    generator_defaults = _generator_defaults()
+    for name, default in sorted(generator_defaults.items()):
+        parser.add_argument('--' + name.replace('_', '-'), dest=name, type=type(default), default=default)
+    args = parser.parse_args(argv)
+
+    generator_options = dict((name, getattr(args, name)) for name in generator_defaults.keys())
+    results = run_benchmarks(args.sizes, args.label, **generator_options)
+    for record in results['results']:
+        sys.stderr.write('{0:>8} tasks  {1:<28} {2:10.3f}s\n'.format(record['tasks'], record['phase'], record['seconds']))
+    if args.output:
+        write_results(results, args.output)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+# Command line interface: python -m pyowb
+#
+#   python -m pyowb export plans/team.py -f owb -f project_libre -o out/
+#   python -m pyowb export plans/team.py:make_plan --watch
+#   python -m pyowb batch plans/*.py -f owb -o out/ -j 8
+#   python -m pyowb compile plans/team.py -o team.pyowbc
+#   python -m pyowb risk plans/team.py --iterations 5000 --start-date 2024-01-08
+#
+#   With --watch the process stays up, polls the plan's source files and
+#   re-exports when they change.  The compiled plan is shared by all
+#   formats, an ExportCache keeps unchanged parts of the plan from being
+#   recomputed, and an output file is only rewritten if its content changed.
+#
+#   batch exports many sources in parallel worker processes (see batch.py);
+#   it exits with 1 if any of them failed.
+#
+#   compile saves the compiled plan as a plan image (see plan_image.py),
+#   which export and batch accept as a source and load in milliseconds.
+#
+#   risk prints the P50/P80/P95 finish dates of a Monte Carlo simulation of
+#   the plan's three-point estimates, and its most critical tasks (see
+#   risk.py; needs numpy).
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, date
+from .export_cache import *
+from .loaders import *
+from .graph import *
+from .exporter import *
+from .batch import *
+from .plan_image import *
+from .risk import *
+
+_default_poll_interval = 0.5
+
+
+def _parse_date(text):
+    return datetime.strptime(text, '%Y-%m-%d')
+
+
+def _report(results, seconds):
+    for filename, written, seconds in results:
+        sys.stderr.write('{0} {1}\n'.format('wrote    ' if written else 'unchanged', filename))
+    sys.stderr.write('exported in {0:.0f} ms\n'.format(seconds * 1000))
+
+def _run_export(exporter, reload):
+    begin = time.perf_counter()
+    results = exporter.export(reload=reload)
+    _report(results, time.perf_counter() - begin)
+
+def _modification_times(filenames):
+    times = []
+    for filename in filenames:
+        try:
+            times.append(os.stat(filename).st_mtime_ns)
+        except OSError:
+            times.append(None)
+    return times
+
+# Re-exports whenever a source file changes; returns on KeyboardInterrupt.
+def watch(exporter, interval=_default_poll_interval):
+    source_files = exporter.source_files()
+    last_times = _modification_times(source_files)
+    sys.stderr.write('watching {0} (Ctrl-C to stop)\n'.format(', '.join(source_files)))
+    try:
+        while True:
+            time.sleep(interval)
+            times = _modification_times(source_files)
+            if times == last_times:
+                continue
+            last_times = times
+            try:
+                _run_export(exporter, reload=True)
+            except Exception as error:
+                # keep watching; the next save will probably fix it
+                sys.stderr.write('ERROR: {0}: {1}\n'.format(type(error).__name__, error))
+    except KeyboardInterrupt:
+        pass
+
+
+def _add_export_arguments(parser):
+    parser.add_argument('-f', '--format', dest='formats', action='append', choices=sorted(EXPORT_FORMATS.keys()),
+                        help='output format; may be repeated (default: owb)')
+    parser.add_argument('-o', '--output-dir', default='.', help='directory for the output files (default: .)')
+    parser.add_argument('--start-date', type=_parse_date,
+                        help='project start date, YYYY-MM-DD (default: today)')
+    parser.add_argument('--reduce-dependencies', action='store_true', help='drop dependencies implied by others')
+    parser.add_argument('--summary-milestones', action='store_true', help='route summary dependencies through milestones')
+    parser.add_argument('--cache', help='ExportCache directory (default: none, or a temporary one with --watch)')
+    parser.add_argument('--select', dest='select_ids', action='append', metavar='ID',
+                        help='export only this task and its subtree; may be repeated')
+    parser.add_argument('--category', dest='select_categories', action='append', metavar='CATEGORY',
+                        help='export only the tasks of this category and their subtrees; may be repeated')
+    parser.add_argument('--stubs', action='store_true',
+                        help='with --select/--category, replace dependencies on other tasks with stub tasks')
+    parser.add_argument('--strict', action='store_true', help='fail on a dependency cycle instead of reporting it')
+
+def _start_date_from_arguments(args):
+    return args.start_date or datetime.combine(date.today(), datetime.min.time())
+
+def _selection_from_arguments(args):
+    if not args.select_ids and not args.select_categories:
+        return None
+    return make_selection(args.select_ids or (), args.select_categories or (), args.stubs)
+
+def _exporter_from_arguments(args, source, cache):
+    return PlanExporter(source, args.formats or ['owb'], args.output_dir, _start_date_from_arguments(args),
+                        args.reduce_dependencies, args.summary_milestones, cache, _selection_from_arguments(args), args.strict)
+
+def _command_export(args):
+    os.makedirs(args.output_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix='pyowb_cache_') as temp_directory:
+        cache_directory = args.cache or (temp_directory if args.watch else None)
+        cache = ExportCache(cache_directory) if cache_directory else None
+        exporter = _exporter_from_arguments(args, args.source, cache)
+        _run_export(exporter, reload=False)
+        if args.watch:
+            watch(exporter, args.interval)
+    return 0
+
+def _report_batch_result(result):
+    if result.error:
+        sys.stderr.write('ERROR: {0}: failed after {1:.0f} ms\n{2}'.format(result.source, result.seconds * 1000, result.error))
+        return
+    for filename, written, seconds in result.outputs:
+        sys.stderr.write('{0} {1} ({2:.0f} ms)\n'.format('wrote    ' if written else 'unchanged', filename, seconds * 1000))
+
+def _command_batch(args):
+    begin = time.perf_counter()
+    results = export_batch(args.sources, args.formats or ['owb'], args.output_dir, _start_date_from_arguments(args),
+                           args.reduce_dependencies, args.summary_milestones, args.cache,
+                           max_workers=args.jobs, max_tasks_per_child=args.max_tasks_per_child,
+                           callback=_report_batch_result, selection=_selection_from_arguments(args), strict=args.strict)
+    failed_count = sum(1 for result in results if result.error)
+    sys.stderr.write('exported {0} of {1} sources in {2:.0f} ms\n'.format(
+        len(results) - failed_count, len(results), (time.perf_counter() - begin) * 1000))
+    return 1 if failed_count else 0
+
+def _command_compile(args):
+    begin = time.perf_counter()
+    compiled = compile_plan(load_plan(args.source), summary_milestones=args.summary_milestones)
+    output = args.output or source_stem(args.source) + PLAN_IMAGE_SUFFIX
+    save_plan_image(compiled, output, source_key=args.source)
+    sys.stderr.write('wrote     {0} ({1} tasks) in {2:.0f} ms\n'.format(
+        output, len(compiled.ids), (time.perf_counter() - begin) * 1000))
+    return 0
+
+def _command_risk(args):
+    begin = time.perf_counter()
+    compiled = PlanExporter(args.source, [], summary_milestones=args.summary_milestones).compile()
+    analysis = simulate_schedule(compiled, iterations=args.iterations, seed=args.seed)
+    sys.stderr.write('simulated {0} iterations of {1} tasks in {2:.0f} ms\n'.format(
+        analysis.iterations, len(compiled.ids), (time.perf_counter() - begin) * 1000))
+    start_date = _start_date_from_arguments(args)
+    for percent, finish in finish_percentile_dates(analysis, start_date):
+        sys.stdout.write('P{0:<3} {1:%Y-%m-%d %H:%M}\n'.format(percent, finish))
+    for index in most_critical_tasks(analysis, args.top):
+        sys.stdout.write('{0:6.1%} {1} {2}\n'.format(analysis.criticality[index], compiled.ids[index], get_name(compiled.store, index)))
+    return 0
+
+
+def make_argument_parser():
+    parser = argparse.ArgumentParser(prog='python -m pyowb', description='Export python plans to project management formats.')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    export_parser = subparsers.add_parser('export', help='export a plan')
+    export_parser.add_argument('source', help='plan source: FILE.py[:NAME], FILE.json, FILE.yaml, FILE.toml, FILE.xml (OWB or MSPDI), FILE{0} or MODULE:NAME'.format(PLAN_IMAGE_SUFFIX))
+    _add_export_arguments(export_parser)
+    export_parser.add_argument('--watch', action='store_true', help='re-export whenever the plan source changes')
+    export_parser.add_argument('--interval', type=float, default=_default_poll_interval,
+                               help='seconds between checks for changes with --watch (default: %(default)s)')
+    export_parser.set_defaults(command_function=_command_export)
+
+    batch_parser = subparsers.add_parser('batch', help='export many plans in parallel')
+    batch_parser.add_argument('sources', nargs='+', help='plan sources, as for export')
+    _add_export_arguments(batch_parser)
+    batch_parser.add_argument('-j', '--jobs', type=int, help='number of worker processes (default: number of CPUs)')
+    batch_parser.add_argument('--max-tasks-per-child', type=int,
+                              help='replace a worker process after exporting this many plans (python 3.11+)')
+    batch_parser.set_defaults(command_function=_command_batch)
+
+    compile_parser = subparsers.add_parser('compile', help='save a compiled plan image, for fast exports')
+    compile_parser.add_argument('source', help='plan source, as for export')
+    compile_parser.add_argument('-o', '--output', help='plan image file (default: SOURCE NAME{0})'.format(PLAN_IMAGE_SUFFIX))
+    compile_parser.add_argument('--summary-milestones', action='store_true', help='route summary dependencies through milestones')
+    compile_parser.set_defaults(command_function=_command_compile)
+
+    risk_parser = subparsers.add_parser('risk', help='simulate the finish dates of three-point estimates')
+    risk_parser.add_argument('source', help='plan source, as for export')
+    risk_parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS, help='number of simulated schedules (default: %(default)s)')
+    risk_parser.add_argument('--seed', type=int, help='random seed, for reproducible results')
+    risk_parser.add_argument('--start-date', type=_parse_date, help='project start date, YYYY-MM-DD (default: today)')
+    risk_parser.add_argument('--top', type=int, default=10, help='number of most critical tasks to list (default: %(default)s)')
+    risk_parser.add_argument('--summary-milestones', action='store_true', help='route summary dependencies through milestones')
+    risk_parser.set_defaults(command_function=_command_risk)
+    return parser
+
+def main(argv=None):
+    args = make_argument_parser().parse_args(argv)
+    try:
+        return args.command_function(args)
+    except (PlanSourceError, PlanImageError, DependencyCycleError) as error:
+        sys.stderr.write('ERROR: {0}\n'.format(error))
+        return 1
@@ -0,0 +1,344 @@
+# Compiled plan: format-neutral intermediate representation of a plan.
+#
+#   compile_plan() performs the analysis that every exporter needs
+#   (ID assignment, dependency validation including cycle detection,
+#   integer IDs, dependency adjacency in both directions, leaf closures
+#   and the critical-path schedule, leveled if the plan assigns resources)
+#   exactly once.
+#   The result can be handed to any number of plan_to_* writers.
+#   The plan itself is never modified.
+#
+#   Tasks are numbered in pre-order; index 0 is the plan root.  All
+#   per-task data is stored in columns indexed by that number (see
+#   task_store.py): arrays, CSR adjacency lists and a TaskStore.
+#
+#   The pre-order index of a task and the end of its subtree are the entry
+#   and exit of an Euler tour of the tree: every subtree is a contiguous
+#   range of indices, which makes ancestor checks O(1) (is_ancestor) and
+#   subtree filters a slice (subtree_indices), with no walk of the children.
+
+import array
+import sys
+from collections import namedtuple
+from types import MappingProxyType
+from .keywords import *
+from .tasks import *
+from .graph import *
+from .schedule import *
+from .resources import *
+from .profiling import *
+from .export_cache import *
+from .task_store import *
+
+CompiledPlan = namedtuple('CompiledPlan', [
+    'tasks',                    # TaskRows: read-only task mappings, in pre-order
+    'store',                    # TaskStore: names, categories, descriptions, efforts, ...
+    'ids',                      # task ID strings
+    'parents',                  # parent index; -1 for the root
+    'levels',                   # depth; 0 for the root
+    'subtree_ends',             # index after the last task of the subtree; the subtree of i is [i, subtree_ends[i])
+    'children',                 # Csr of child indices
+    'milestones',               # 1 for synthetic summary milestones
+    'intids',                   # integer IDs, numbered in sorted ID order
+    'id_to_index',              # read-only mapping of task ID -> index
+    'predecessors',             # Csr of predecessor indices (DEPS + SEQUENCE)
+    'sequence_predecessors',    # predecessor index implied by SEQUENCE; -1 if none
+    'successors',               # Csr of successor indices; reverse of predecessors
+    'leaf_order',               # leaf indices, in pre-order
+    'leaf_ranges',              # (begin, end) into leaf_order, per task
+    'schedule',                 # Schedule, in working days from the project start
+])
+
+
+# Walks the plan in pre-order.  Returns (tasks, parents, levels,
+# sequence_predecessors) lists.
+#
+# The plan is not modified: a task without an ID is represented by a
+# task_view that holds a generated one.  IDs are numbered per call, by a
+# new function from id_allocator, so every export of the same plan
+# generates the same IDs.
+def _flatten_plan(plan, id_allocator):
+    next_auto_id = id_allocator()
+    tasks = []
+    parents = []
+    levels = []
+    sequence_predecessors = []
+
+    for task, parent_index, level, sequence_predecessor_index in iter_preorder(plan):
+        if ID not in task:
+            task = task_view(task, **{ID : next_auto_id()})
+        tasks.append(task)
+        parents.append(parent_index)
+        levels.append(level)
+        sequence_predecessors.append(sequence_predecessor_index)
+    return (tasks, parents, levels, sequence_predecessors)
+
+# key = ID string, value = index; the last task wins if an ID is repeated
+def _index_ids(tasks):
+    id_to_index = {}
+    for index, task in enumerate(tasks):
+        id_to_index[task[ID]] = index
+    return id_to_index
+
+# Returns predecessors: list of tuples of predecessor indices (DEPS, then SEQUENCE).
+def _resolve_dependencies(tasks, sequence_predecessors, id_to_index):
+    predecessors = []
+    for index, task in enumerate(tasks):
+        predecessor_indices = {} # index:True, in insertion order
+        for predecessor_id in task.get(DEPS, ()):
+            predecessor_index = id_to_index.get(predecessor_id, None)
+            if predecessor_index is None:
+                task_id = task[ID]
+                task_name = task[NAME]
+                sys.stderr.write('WARNING: ID={task_id} NAME={task_name} : unknown dependency "{predecessor_id}"\n'.format(**locals()))
+                continue
+            predecessor_indices[predecessor_index] = True
+        if sequence_predecessors[index] != -1:
+            predecessor_indices[sequence_predecessors[index]] = True
+        predecessors.append(tuple(predecessor_indices.keys()))
+    return predecessors
+
+def _create_milestone(summary, suffix):
+    return {
+        ID : '{0}#{1}'.format(summary[ID], suffix),
+        NAME : '{0} ({1})'.format(summary[NAME], suffix),
+        EFFORT : 0,
+    }
+
+# Summary-milestone mode.
+#
+# A dependency between two summaries with m and n leaves expands into m*n
+# leaf dependencies.  Instead, every summary that is depended upon gets a
+# zero-effort "finish" milestone (its last child) that depends on the
+# summary's children, and every summary with predecessors gets a "start"
+# milestone (its first child) that takes over those predecessors and that
+# the summary's children depend on.  A summary-to-summary dependency then
+# costs m+n+1 dependencies.
+#
+# Returns new (tasks, parents, levels, sequence_predecessors, predecessors,
+# milestones) lists, renumbered in pre-order.
+def _insert_summary_milestones(tasks, parents, levels, children, sequence_predecessors, predecessors):
+    task_count = len(tasks)
+    is_predecessor = [False] * task_count
+    for predecessor_indices in predecessors:
+        for predecessor_index in predecessor_indices:
+            is_predecessor[predecessor_index] = True
+    # A finish milestone depends on the finish milestones of its summary
+    # children, and a start milestone is depended upon by the start
+    # milestones of its summary children.  Parents precede their children
+    # in pre-order, so one forward pass propagates both.
+    needs_finish = [False] * task_count
+    needs_start = [False] * task_count
+    for index in range(task_count):
+        if children[index]:
+            parent_index = parents[index]
+            needs_finish[index] = is_predecessor[index] or (parent_index != -1 and needs_finish[parent_index])
+            needs_start[index] = bool(predecessors[index]) or (parent_index != -1 and needs_start[parent_index])
+
+    new_tasks = []
+    new_parents = []
+    new_levels = []
+    new_milestones = []
+    old_to_new = [-1] * task_count
+    start_milestone = {} # old summary index:new milestone index
+    finish_milestone = {} # old summary index:new milestone index
+
+    def _append(task, parent_index, level, is_milestone):
+        new_index = len(new_tasks)
+        new_tasks.append(task)
+        new_parents.append(parent_index)
+        new_levels.append(level)
+        new_milestones.append(is_milestone)
+        return new_index
+
+    # explicit stack of (index, new_parent_index); a negative index -1-i
+    # marks the point where summary i has appended all of its children
+    stack = [(0, -1)]
+    while stack:
+        index, new_parent_index = stack.pop()
+        if index < 0:
+            index = -1 - index
+            finish_milestone[index] = _append(_create_milestone(tasks[index], 'finish'), old_to_new[index], levels[index]+1, True)
+            continue
+        new_index = _append(tasks[index], new_parent_index, levels[index], False)
+        old_to_new[index] = new_index
+        if needs_start[index]:
+            start_milestone[index] = _append(_create_milestone(tasks[index], 'start'), new_index, levels[index]+1, True)
+        if needs_finish[index]:
+            stack.append((-1 - index, -1))
+        stack.extend((child_index, new_index) for child_index in reversed(children[index]))
+
+    # a dependency on a summary becomes a dependency on its finish milestone
+    def _as_new_predecessor(index):
+        if index in finish_milestone:
+            return finish_milestone[index]
+        return old_to_new[index]
+
+    new_count = len(new_tasks)
+    new_predecessors = [()] * new_count
+    new_sequence_predecessors = [-1] * new_count
+    for index in range(task_count):
+        new_index = old_to_new[index]
+        mapped_predecessors = tuple(_as_new_predecessor(predecessor_index) for predecessor_index in predecessors[index])
+        if index in start_milestone:
+            new_predecessors[start_milestone[index]] = mapped_predecessors
+        elif not children[index]:
+            new_predecessors[new_index] = mapped_predecessors
+            if sequence_predecessors[index] != -1:
+                new_sequence_predecessors[new_index] = _as_new_predecessor(sequence_predecessors[index])
+        if index in finish_milestone:
+            new_predecessors[finish_milestone[index]] = tuple(_as_new_predecessor(child_index) for child_index in children[index])
+    for index in start_milestone.keys():
+        for child_index in children[index]:
+            target_index = start_milestone.get(child_index, old_to_new[child_index])
+            new_predecessors[target_index] = (start_milestone[index],) + new_predecessors[target_index]
+
+    return (new_tasks, new_parents, new_levels, new_sequence_predecessors, new_predecessors, new_milestones)
+
+# Returns the subtree_ends column: a subtree ends where that of its last
+# child does, and the post-order walk visits every child before its parent.
+def _compute_subtree_ends(children):
+    task_count = len(children)
+    child_offsets = children.offsets
+    child_values = children.values
+    subtree_ends = index_array(range(1, task_count+1))
+    if not task_count:
+        return subtree_ends
+    for index, level in iter_postorder(0, children.__getitem__):
+        if child_offsets[index+1] != child_offsets[index]:
+            subtree_ends[index] = subtree_ends[child_values[child_offsets[index+1] - 1]]
+    return subtree_ends
+
+# Returns (leaf_order, leaf_ranges).
+#
+# The leaves of any subtree are contiguous in pre-order, so each task's
+# leaf closure is a [begin, end) range into a single array of leaf indices.
+def _compute_leaf_closures(summaries, subtree_ends):
+    task_count = len(summaries)
+    leaf_order = index_array()
+    leaf_position = index_array([0]) * (task_count+1) # number of leaves before each index
+    for index in range(task_count):
+        leaf_position[index] = len(leaf_order)
+        if not summaries[index]:
+            leaf_order.append(index)
+    leaf_position[task_count] = len(leaf_order)
+    leaf_ranges = PairColumns(leaf_position[:task_count], index_array(leaf_position[end] for end in subtree_ends))
+    return (leaf_order, leaf_ranges)
+
+
+# With strict=True, a dependency cycle raises DependencyCycleError;
+# otherwise every cycle is reported on stderr and the export goes ahead.
+#
+# With summary_milestones=True, dependencies on and of summaries are
+# routed through synthetic start/finish milestones (see above).
+#
+# With an ExportCache, the cycle check and schedule are reused from an
+# earlier compile with the same dependency graph and efforts.
+#
+# id_allocator returns the function that numbers the auto IDs of this
+# compile (see auto_id_allocator).
+def compile_plan(plan, strict=False, summary_milestones=False, cache=None, id_allocator=auto_id_allocator):
+    with profile_export('compile_plan', None), profile_phase('compile_plan'):
+        return _compile_plan(plan, strict, summary_milestones, cache, id_allocator)
+
+def _compile_plan(plan, strict, summary_milestones, cache, id_allocator):
+    with profile_phase('flatten'):
+        tasks, parents, levels, sequence_predecessors = _flatten_plan(plan, id_allocator)
+        children = csr_from_parents(parents)
+    with profile_phase('resolve_dependencies'):
+        predecessors = _resolve_dependencies(tasks, sequence_predecessors, _index_ids(tasks))
+    milestones = [0] * len(tasks)
+    if summary_milestones:
+        with profile_phase('summary_milestones'):
+            tasks, parents, levels, sequence_predecessors, predecessors, milestones = \
+                _insert_summary_milestones(tasks, parents, levels, children, sequence_predecessors, predecessors)
+            children = csr_from_parents(parents)
+
+    with profile_phase('task_store'):
+        ids = tuple(task[ID] for task in tasks)
+        store = build_task_store(tasks)
+        # the plan's dicts are not referenced from here on
+        del tasks
+    with profile_phase('integer_ids'):
+        id_to_index = {}
+        for index, task_id in enumerate(ids):
+            id_to_index[task_id] = index
+        id_to_intid = {}
+        for intid, task_id in enumerate(sorted(id_to_index.keys())):
+            id_to_intid[task_id] = intid
+    with profile_phase('successors'):
+        predecessors = csr_from_lists(predecessors)
+        successors = csr_transpose(predecessors)
+    with profile_phase('leaf_closures'):
+        subtree_ends = _compute_subtree_ends(children)
+        leaf_order, leaf_ranges = _compute_leaf_closures(store.summaries, subtree_ends)
+
+    compiled = CompiledPlan(
+        tasks=TaskRows(store, ids, children),
+        store=store,
+        ids=ids,
+        parents=index_array(parents),
+        levels=index_array(levels),
+        subtree_ends=subtree_ends,
+        children=children,
+        milestones=array.array('b', milestones),
+        intids=index_array(id_to_intid[task_id] for task_id in ids),
+        id_to_index=MappingProxyType(id_to_index),
+        predecessors=predecessors,
+        sequence_predecessors=index_array(sequence_predecessors),
+        successors=successors,
+        leaf_order=leaf_order,
+        leaf_ranges=leaf_ranges,
+        schedule=None,
+    )
+    profile_count('tasks', len(compiled.tasks))
+    profile_count('leaves', len(compiled.leaf_order))
+    profile_count('dependencies', len(compiled.predecessors.values))
+    analysis = None
+    if cache:
+        with profile_phase('analysis_cache'):
+            analysis_key = analysis_cache_key(compiled)
+            analysis = cache.get_object(analysis_key)
+    if analysis:
+        cycles, schedule = analysis
+        report_dependency_cycles(compiled, cycles, strict)
+    else:
+        with profile_phase('dependency_cycles'):
+            cycles = check_dependency_cycles(compiled, strict)
+        with profile_phase('schedule'):
+            schedule = compute_schedule(compiled)
+        if cache:
+            cache.put_object(analysis_key, (cycles, schedule))
+    compiled = compiled._replace(schedule=schedule)
+
+    # not cached: the analysis key does not cover the resources
+    with profile_phase('resource_assignments'):
+        assignments = resource_assignments(compiled)
+    if has_assignments(assignments):
+        with profile_phase('level_resources'):
+            compiled = compiled._replace(schedule=level_schedule(compiled, assignments))
+    return compiled
+
+# Accepts either a plan or a CompiledPlan, so that callers exporting several
+# formats can compile once and pass the result to every writer.
+# options are passed to compile_plan, and ignored for a CompiledPlan.
+def as_compiled_plan(plan, **options):
+    if isinstance(plan, CompiledPlan):
+        return plan
+    return compile_plan(plan, **options)
+
+# Returns the indices of all leaf tasks at or below index (index itself if it is a leaf).
+def get_leaf_indices(compiled, index):
+    begin, end = compiled.leaf_ranges[index]
+    return compiled.leaf_order[begin:end]
+
+# True if ancestor_index is index or one of its ancestors; O(1).
+def is_ancestor(compiled, ancestor_index, index):
+    return ancestor_index <= index < compiled.subtree_ends[ancestor_index]
+
+# The indices of index and all tasks below it, in pre-order.
+def subtree_indices(compiled, index):
+    return range(index, compiled.subtree_ends[index])
+
+def is_summary(compiled, index):
+    return bool(compiled.store.summaries[index])
@@ -0,0 +1,270 @@
+# On-disk cache for incremental re-export.
+#
+#   Most edits to a plan touch a handful of tasks.  With an ExportCache,
+#   exports reuse what an earlier export of a similar plan computed:
+#
+#   *   The analysis (cycle check and critical-path schedule) is keyed by a
+#       hash of the dependency graph and the efforts, so edits to names,
+#       descriptions and the like reuse it outright.
+#   *   Rendered XML is cached per unit: a maximal subtree of at most
+#       max_unit_size tasks (or a single summary row above such subtrees).
+#       A unit's key combines the content hash of its subtree (a merkle
+#       hash over the tasks and their children) with every value the
+#       writer takes from the analysis for its rows (dates, slack, IDs,
+#       dependencies, ...), so a unit is re-rendered exactly when its
+#       tasks or their schedule or dependencies change.
+#
+#   The store is a directory of files, one per entry, evicted in least
+#   recently used order (by file modification time) once it grows beyond
+#   max_bytes.  Entries are written atomically, so several processes may
+#   share a cache directory, and an ExportCache may be used by several
+#   threads at once.  Analysis entries are pickled: only point a
+#   cache at a directory you trust.
+
+import hashlib
+import io
+import os
+import pickle
+import tempfile
+import threading
+from .keywords import *
+from .tasks import *
+from .task_store import *
+
+# Bumped whenever the layout of cached entries or rendered fragments changes.
+_cache_format_version = 2
+
+_default_max_bytes = 256 << 20
+_default_max_unit_size = 256
+
+# On average one dependency chunk per this many successors (see _dependency_chunks).
+_dependency_chunk_spread = 64
+
+
+def _digest(*parts):
+    hasher = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = repr(part).encode('utf-8')
+        hasher.update(part)
+        hasher.update(b'\0')
+    return hasher.digest()
+
+
+class ExportCache:
+    def __init__(self, directory, max_bytes=_default_max_bytes, max_unit_size=_default_max_unit_size):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_unit_size = max_unit_size
+        self.hits = 0
+        self.misses = 0
+        # guards the counters and eviction
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._total_bytes = sum(size for path, mtime, size in self._entries())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _entries(self):
+        for bucket in os.scandir(self.directory):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    # removed by another thread or process
+                    continue
+                yield (entry.path, stat.st_mtime, stat.st_size)
+
+    def _read(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as infile:
+                data = infile.read()
+            # marks the entry as recently used
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def _write(self, key, data):
+        def _write_data(temp_path):
+            with open(temp_path, 'wb') as outfile:
+                outfile.write(data)
+        self.put_file(key, _write_data)
+
+    def get_text(self, key):
+        data = self._read(key)
+        return None if data is None else data.decode('utf-8')
+
+    def put_text(self, key, text):
+        self._write(key, text.encode('utf-8'))
+
+    def get_object(self, key):
+        data = self._read(key)
+        return None if data is None else pickle.loads(data)
+
+    def put_object(self, key, value):
+        self._write(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    # Returns the path of the entry for key, for entries that are read in
+    # place (e.g. memory-mapped), or None if there is none.  The entry may
+    # be evicted at any time; on POSIX systems an open or mapped entry
+    # stays readable when it is.
+    def get_path(self, key):
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    # Stores the entry for key as the file written by write_file(path).
+    def put_file(self, key, write_file):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        descriptor, temp_path = tempfile.mkstemp(prefix='.', dir=os.path.dirname(path))
+        os.close(descriptor)
+        try:
+            write_file(temp_path)
+            size = os.path.getsize(temp_path)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        with self._lock:
+            self._total_bytes += size
+            must_evict = self._total_bytes > self.max_bytes
+        if must_evict:
+            self.evict()
+
+    # Removes least recently used entries until the cache holds at most
+    # max_bytes (three quarters of it, so that eviction is not run on every write).
+    def evict(self, max_bytes=None):
+        if max_bytes is None:
+            max_bytes = self.max_bytes * 3 // 4
+        with self._lock:
+            self._evict(max_bytes)
+
+    def _evict(self, max_bytes):
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total_bytes = sum(size for path, mtime, size in entries)
+        for path, mtime, size in entries:
+            if total_bytes <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_bytes -= size
+        self._total_bytes = total_bytes
+
+    def clear(self):
+        self.evict(0)
+
+
+def make_cache_key(namespace, *parts):
+    return _digest(_cache_format_version, namespace, *parts).hex()
+
+
+# Analysis key: everything the cycle check and the schedule depend on.
+def analysis_cache_key(compiled):
+    store = compiled.store
+    durations = [0 if store.summaries[index] else get_effort(store, index)
+                 for index in range(len(compiled.ids))]
+    return make_cache_key('analysis', compiled.parents, compiled.predecessors, durations)
+
+
+# A task's own content, including its dependencies (by ID, so that tasks
+# inserted elsewhere leave it unchanged).
+def _task_content(compiled, index):
+    store = compiled.store
+    return (compiled.ids[index], get_name(store, index), get_desc(store, index), get_effort(store, index, None),
+            store.summaries[index], sorted(store.extras.get(index, {}).items()),
+            [compiled.ids[predecessor_index] for predecessor_index in compiled.predecessors[index]])
+
+# Returns the merkle hash of every subtree: the hash of a task's own content
+# combined with the hashes of its children.
+def subtree_hashes(compiled):
+    hashes = [None] * len(compiled.ids)
+    for index in reversed(range(len(compiled.ids))):
+        child_hashes = [hashes[child_index] for child_index in compiled.children[index]]
+        hashes[index] = _digest(_task_content(compiled, index), *child_hashes)
+    return hashes
+
+# Splits the pre-order indices into contiguous [begin, end) units: maximal
+# subtrees of at most max_unit_size tasks, and the rows of the summaries
+# above them, one unit each.
+def partition_units(compiled, max_unit_size):
+    task_count = len(compiled.tasks)
+    subtree_ends = compiled.subtree_ends
+    units = []
+    index = 0
+    while index < task_count:
+        if subtree_ends[index] - index <= max_unit_size:
+            units.append((index, subtree_ends[index]))
+            index = subtree_ends[index]
+        else:
+            units.append((index, index+1))
+            index += 1
+    return units
+
+
+# Yields the rendered text of compiled.tasks in pre-order, one unit at a time.
+#
+# row_values(index) returns everything, other than the task's own content,
+# that render_task(outfile, index) writes for the task.
+def render_units_cached(cache, namespace, compiled, row_values, render_task):
+    hashes = subtree_hashes(compiled)
+    for begin, end in partition_units(compiled, cache.max_unit_size):
+        if end - begin == 1 and compiled.children[begin]:
+            # a lone summary row; its children are rendered elsewhere
+            content_hash = _digest(_task_content(compiled, begin))
+        else:
+            content_hash = hashes[begin]
+        key = make_cache_key(namespace, content_hash, [row_values(index) for index in range(begin, end)])
+        text = cache.get_text(key)
+        if text is None:
+            outfile = io.StringIO()
+            for index in range(begin, end):
+                render_task(outfile, index)
+            text = outfile.getvalue()
+            cache.put_text(key, text)
+        yield text
+
+
+# Splits sorted items into chunks whose boundaries depend only on the items
+# around them, so inserting or removing an item changes a single chunk.
+def _dependency_chunks(items, boundary_key):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if _digest(boundary_key(item))[0] % _dependency_chunk_spread == 0:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# Yields the rendered text of items (already in output order), chunk by chunk.
+# render_chunk(chunk) returns the text for a list of items; items must have a
+# stable repr, as they are the cache key.
+def render_chunks_cached(cache, namespace, items, boundary_key, render_chunk):
+    for chunk in _dependency_chunks(items, boundary_key):
+        key = make_cache_key(namespace, chunk)
+        text = cache.get_text(key)
+        if text is None:
+            text = render_chunk(chunk)
+            cache.put_text(key, text)
+        yield text
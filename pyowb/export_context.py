@@ -0,0 +1,51 @@
+# Export context: everything an export needs besides the plan.
+#
+#   Every plan_to_* writer builds an ExportContext from its arguments (or
+#   is given one) and passes it to each function that writes part of the
+#   file.  No module keeps state between exports, so exports may run at the
+#   same time from a thread pool or an asyncio executor, and the same plan
+#   and context always produce the same output.
+#
+#   A context may be shared by any number of exports, including concurrent
+#   ones: it is immutable, its WorkCalendar and ExportCache are thread-safe,
+#   and id_allocator creates a fresh auto ID numbering for every compile.
+
+from collections import namedtuple
+from .tasks import *
+from .compiled_plan import *
+from .selection import *
+from .plan_image import *
+from .work_calendar import *
+
+ExportContext = namedtuple('ExportContext', [
+    'start_date',               # datetime of working day 0; None for the writer's default
+    'calendar',                 # WorkCalendar
+    'id_allocator',             # returns a new next_auto_id function, see auto_id_allocator
+    'reduce_dependencies',      # drop dependencies implied by others
+    'summary_milestones',       # route summary dependencies through milestones
+    'cache',                    # ExportCache, or None
+    'selection',                # Selection of the tasks to export; None for all
+    'strict',                   # raise DependencyCycleError on a dependency cycle instead of reporting it
+])
+
+
+# calendar defaults to monday-friday without holidays.
+def make_export_context(start_date=None, calendar=None, id_allocator=auto_id_allocator, reduce_dependencies=False,
+                        summary_milestones=False, cache=None, selection=None, strict=False):
+    if calendar is None:
+        calendar = WorkCalendar()
+    return ExportContext(start_date, calendar, id_allocator, reduce_dependencies, summary_milestones, cache, selection, strict)
+
+# Compiles plan as configured by context; a CompiledPlan is returned as is,
+# and a file name is loaded as a plan image.  With a selection, the
+# selected part is then cut out of it (see select_plan): only a plan dict
+# is compiled whole first.
+def compile_for_context(plan, context):
+    if isinstance(plan, str):
+        compiled = load_plan_image(plan, strict=context.strict)
+    else:
+        compiled = as_compiled_plan(plan, strict=context.strict, summary_milestones=context.summary_milestones,
+                                    cache=context.cache, id_allocator=context.id_allocator)
+    if context.selection is not None:
+        compiled = select_plan(compiled, context.selection)
+    return compiled
@@ -0,0 +1,155 @@
+# Exports plan sources to files, shared by the command line and batch exports.
+
+import os
+import tempfile
+import time
+from .keywords import *
+from .compiled_plan import *
+from .graph import *
+from .export_cache import *
+from .loaders import *
+from .plan_image import *
+from .open_work_bench import *
+from .ganttproject import *
+from .project_libre import *
+
+# format name: (export function, file name suffix)
+EXPORT_FORMATS = {
+    'owb' : (plan_to_owb_xml, '.owb.xml'),
+    'project_libre' : (plan_to_project_libre_xml, '.project_libre.xml'),
+    'ganttproject' : (plan_to_ganttproject, '.gan'),
+}
+
+
+def source_stem(source):
+    location, name = parse_plan_source(source)
+    stem = os.path.splitext(os.path.basename(location))[0]
+    if name:
+        stem += '.' + name
+    return stem
+
+def _is_plan_image(source):
+    return source.endswith(PLAN_IMAGE_SUFFIX)
+
+# (path, size, modification time) of every file
+def _file_signatures(filenames):
+    signatures = []
+    for filename in filenames:
+        stat = os.stat(filename)
+        signatures.append((os.path.abspath(filename), stat.st_size, stat.st_mtime_ns))
+    return signatures
+
+def output_filename(source, export_format, output_directory):
+    return os.path.join(output_directory, source_stem(source) + EXPORT_FORMATS[export_format][1])
+
+# Options of the export function for export_format.
+def export_options(export_format, start_date=None, reduce_dependencies=False, selection=None):
+    options = {'start_date' : start_date}
+    if selection:
+        options['selection'] = selection
+    if export_format in ('owb', 'project_libre'):
+        options['reduce_dependencies'] = reduce_dependencies
+    return options
+
+
+# Exports into filename + a temporary suffix, and only replaces filename if
+# the content differs, so that tools watching the outputs see no change.
+# Returns True if filename was written.
+def _export_if_changed(function, filename, compiled, options):
+    directory = os.path.dirname(os.path.abspath(filename))
+    descriptor, temp_filename = tempfile.mkstemp(prefix='.' + os.path.basename(filename), dir=directory)
+    os.close(descriptor)
+    try:
+        function(temp_filename, compiled, **options)
+        if os.path.exists(filename) and _same_content(temp_filename, filename):
+            return False
+        os.replace(temp_filename, filename)
+        return True
+    finally:
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
+
+def _same_content(filename_a, filename_b):
+    if os.path.getsize(filename_a) != os.path.getsize(filename_b):
+        return False
+    with open(filename_a, 'rb') as file_a, open(filename_b, 'rb') as file_b:
+        return file_a.read() == file_b.read()
+
+
+# Exports one plan source to several formats, remembering what it wrote so
+# that unchanged outputs are skipped when it is run again.
+class PlanExporter:
+    def __init__(self, source, formats, output_directory='.', start_date=None, reduce_dependencies=False,
+                 summary_milestones=False, cache=None, selection=None, strict=False):
+        self.source = source
+        self.formats = list(formats)
+        self.output_directory = output_directory
+        self.start_date = start_date
+        self.reduce_dependencies = reduce_dependencies
+        self.summary_milestones = summary_milestones
+        self.cache = cache
+        self.selection = selection
+        self.strict = strict
+        # filename: key of the plan and options it was last written from
+        self._written_keys = {}
+
+    def source_files(self):
+        return plan_source_files(self.source)
+
+    # Returns the CompiledPlan of the source.  A plan image is loaded as is.
+    # With a cache, the compiled plan is saved there as a plan image, which
+    # later exports load as long as the source files are unchanged.
+    #
+    # With strict, a dependency cycle raises DependencyCycleError, also in a
+    # plan image (which was saved without checking).
+    def compile(self, reload=False):
+        if _is_plan_image(self.source):
+            return self._checked(load_plan_image(self.source))
+        if not self.cache:
+            return compile_plan(load_plan(self.source, reload=reload), strict=self.strict,
+                                summary_milestones=self.summary_milestones)
+        key = make_cache_key('plan_image', self.source, _file_signatures(self.source_files()), self.summary_milestones)
+        path = self.cache.get_path(key)
+        if path:
+            try:
+                compiled = load_plan_image(path)
+            except (OSError, PlanImageError):
+                # evicted or damaged since
+                pass
+            else:
+                return self._checked(compiled)
+        compiled = compile_plan(load_plan(self.source, reload=reload), strict=self.strict,
+                                summary_milestones=self.summary_milestones, cache=self.cache)
+        try:
+            self.cache.put_file(key, lambda temp_path: save_plan_image(compiled, temp_path))
+        except PlanImageError:
+            # extra keys that a plan image cannot hold: compiled every time
+            pass
+        return compiled
+
+    def _checked(self, compiled):
+        if self.strict:
+            check_dependency_cycles(compiled, strict=True)
+        return compiled
+
+    # Returns a list of (filename, written, seconds), seconds being the time
+    # spent writing filename (0 if it was skipped).
+    def export(self, reload=False):
+        compiled = self.compile(reload)
+        plan_hash = subtree_hashes(compiled)[0]
+        results = []
+        for export_format in self.formats:
+            function = EXPORT_FORMATS[export_format][0]
+            filename = output_filename(self.source, export_format, self.output_directory)
+            options = export_options(export_format, self.start_date, self.reduce_dependencies, self.selection)
+            key = make_cache_key('cli', export_format, plan_hash, sorted(options.items()), self.summary_milestones)
+            if self._written_keys.get(filename) == key and os.path.exists(filename):
+                results.append((filename, False, 0.0))
+                continue
+            if self.cache:
+                options['cache'] = self.cache
+            begin = time.perf_counter()
+            written = _export_if_changed(function, filename, compiled, options)
+            self._written_keys[filename] = key
+            results.append((filename, written, time.perf_counter() - begin))
+        return results
@@ -1,4 +1,4 @@
-# Python plan -> Open Workbench XML converter.
+# Python plan -> GanttProject (.gan) converter.
 #
 #   Python plan defines a Work Breakdown Structure where
 #   tasks are dictionaries and children are defined in a list.
@@ -7,73 +7,93 @@
 
 import sys
 import math
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from .keywords import *
 from .tasks import *
-
-# NOTE: arbitrarily chosen start date
-_global_start_date = datetime(year=2016, month=10, day=10)
-
-
-def _date_as_gp_string(date):
-    return date.strftime('%Y-%m-%d')
-
-def _insert_dependency(deps, successor, predecessor):
-    if predecessor not in deps:
-        deps[predecessor] = {}
-    deps[predecessor][successor] = True
-
-def _validate_tasks(id_to_task, deps):
-    for task in id_to_task.values():
-        for predecessor_id in task[DEPS]:
-            if predecessor_id not in id_to_task:
-                sys.stderr.write('WARNING: ID={task[ID]} NAME={task[NAME]} : unknown dependency "{predecessor_id}"\n'.format(**locals()))
-            _insert_dependency(deps, task[ID], predecessor_id)
-
-# Returns id_to_intid: dict(task_id, int_id)
-def _generate_integer_ids(id_to_task):
-    intid = 0
-    id_to_intid = {}
-    for task_id in sorted(id_to_task.keys()):
-        id_to_intid[task_id] = intid
-        intid += 1
-    return id_to_intid
-
-    
-def _output_tasks_recursive(outfile, id_to_intid, deps, task, level):
-    _effort_in_days = task.get(EFFORT, 0)
-    _duration = 1 if has_children(task) else _effort_in_days
-
-    _indent = '    '*level
-    _category = parse_category(task[NAME])
-    _name = xml_escape_attr(task[NAME])
-    _intid = id_to_intid[task[ID]]
-    _desc = task.get(DESC, None)
-    _start_date = _date_as_gp_string(_global_start_date)
+from .compiled_plan import *
+from .work_calendar import *
+from .templates import *
+from .profiling import *
+from .export_context import *
+from .task_store import *
+from .resources import *
+from .rollup import *
+
+# NOTE: arbitrarily chosen start date (a monday), used unless one is given
+_default_start_date = datetime(year=2016, month=10, day=10)
+
+
+_gp_date_format = '%Y-%m-%d'
+
+# GP marks non-working weekdays with 1.
+def _default_week_as_gp_attrs(calendar):
+    day_names = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+    flags = ['0' if is_working else '1' for is_working in calendar.weekmask]
+    # GP lists sunday first
+    order = [6, 0, 1, 2, 3, 4, 5]
+    return ' '.join('{0}="{1}"'.format(day_names[day], flags[day]) for day in order)
+
+def _holidays_as_gp_xml(calendar):
+    holidays_xml = ''
+    for ordinal in sorted(calendar.holidays):
+        holiday = date.fromordinal(ordinal)
+        holidays_xml += '        <date year="{0}" month="{1}" date="{2}" type="HOLIDAY"/>\n'.format(holiday.year, holiday.month, holiday.day)
+    return holidays_xml
+
+
+_task_template = Template('        {_indent}<task id="{_intid}" name={_name} color="#8cb6ce" meeting="{_meeting}" start="{_start_date}" duration="{_duration}" complete="0" expand="{_expand}">\n')
+_notes_template = Template('            {_indent}<notes><![CDATA[{_desc}]]></notes>\n')
+_depend_template = Template('            {_indent}<depend id="{successor_intid}" type="2" difference="0" hardness="Strong"/>\n')
+_task_close_template = Template('        {_indent}</task>\n')
+
+
+# Whole numbers of days are written as ints, like EFFORT usually is.
+def _gp_days(days):
+    return int(days) if days == int(days) else days
+
+def _output_task_open(outfile, compiled, dates, rollup, index):
+    store = compiled.store
+    _effort_in_days = get_effort(store, index)
+    if store.summaries[index]:
+        # from its first leaf's start to its last leaf's finish
+        _duration = _gp_days(rollup.finishes[index] - rollup.starts[index])
+    else:
+        _duration = _effort_in_days
+
+    _indent = '    '*compiled.levels[index]
+    _category = get_category(store, index)
+    _name = xml_escape_attr(get_name(store, index))
+    _intid = compiled.intids[index]
+    _desc = get_desc(store, index)
+    _start_date = dates.early_start[index]
     _expand = 'true'
+    _meeting = 'true' if compiled.milestones[index] else 'false'
 
-    successor_ids = deps.get(task[ID], None)
-        
-    task_tag = '        {_indent}<task id="{_intid}" name={_name} color="#8cb6ce" meeting="false" start="{_start_date}" duration="{_duration}" complete="0" expand="{_expand}">\n'.format(**locals())
-    outfile.write(task_tag)
+    outfile.write(_task_template.render(_indent, _intid, _name, _meeting, _start_date, _duration, _expand))
     if _desc:
-        outfile.write('            {_indent}<notes><![CDATA[{_desc}]]></notes>\n'.format(**locals()))
-    if successor_ids:
-        for successor_id in successor_ids.keys():
-            successor_intid = id_to_intid[successor_id]
-            outfile.write('            {_indent}<depend id="{successor_intid}" type="2" difference="0" hardness="Strong"/>\n'.format(**locals()))
-
-    children = task.get(CHILDREN, None)
-    if children:
-        for child in children:
-            if isinstance(child, str):
-                continue
-            else:
-                _output_tasks_recursive(outfile, id_to_intid, deps, child, level+1)
-
-    outfile.write('        {_indent}</task>\n'.format(**locals()))
-
-def _output_tasks(outfile, id_to_intid, deps, plan):
+        outfile.write(_notes_template.render(_indent, _desc))
+    for successor_index in compiled.successors[index]:
+        successor_intid = compiled.intids[successor_index]
+        outfile.write(_depend_template.render(_indent, successor_intid))
+
+def _output_task_close(outfile, compiled, index):
+    _indent = '    '*compiled.levels[index]
+    outfile.write(_task_close_template.render(_indent))
+
+# Tasks are nested; walking them in pre-order, every task that is still open
+# at the same or a deeper level is closed before the next one is opened.
+def _output_nested_tasks(outfile, compiled, dates, rollup):
+    open_indices = []
+    for index in range(len(compiled.tasks)):
+        level = compiled.levels[index]
+        while len(open_indices) > level:
+            _output_task_close(outfile, compiled, open_indices.pop())
+        _output_task_open(outfile, compiled, dates, rollup, index)
+        open_indices.append(index)
+    while open_indices:
+        _output_task_close(outfile, compiled, open_indices.pop())
+
+def _output_tasks(outfile, compiled, dates, rollup):
     prefix = '''
     <tasks empty-milestones="true">
         <taskproperties>
@@ -94,11 +114,24 @@ def _output_tasks(outfile, id_to_intid, deps, plan):
 '''
 
     outfile.write(prefix.lstrip('\n'))
-    _output_tasks_recursive(outfile, id_to_intid, deps, plan, 0)
+    _output_nested_tasks(outfile, compiled, dates, rollup)
     outfile.write(suffix.lstrip('\n'))
     
-    
-def _output_main_file(outfile, plan):
+
+_resource_template = Template('        <resource id="{_resource}" name={_name} function="Default:0" contacts="" phone=""/>\n')
+_allocation_template = Template('        <allocation task-id="{_intid}" resource-id="{_resource}" function="Default:0" responsible="true" load="100.0"/>\n')
+
+def _output_resources(outfile, compiled, assignments):
+    outfile.write('    <resources>\n')
+    outfile.write(_resource_template.render_rows((resource, xml_escape_attr(name)) for resource, name in enumerate(assignments.names)))
+    outfile.write('    </resources>\n')
+    outfile.write('    <allocations>\n')
+    outfile.write(_allocation_template.render_rows((compiled.intids[index], resource)
+                                                   for index in compiled.leaf_order for resource in assignments.tasks[index]))
+    outfile.write('    </allocations>\n')
+
+
+def _output_main_file(outfile, compiled, context):
     prefix = '''
 <?xml version="1.0" encoding="UTF-8"?>
 <project name="Untitled" company="" webLink="http://" view-date="2017-01-15" view-index="0" gantt-divider-location="353" resource-divider-location="300" version="2.8.1" locale="en_US">
@@ -117,18 +150,14 @@ def _output_main_file(outfile, plan):
         <day-types>
             <day-type id="0"/>
             <day-type id="1"/>
-            <default-week id="1" name="default" sun="1" mon="0" tue="0" wed="0" thu="0" fri="0" sat="1"/>
+            <default-week id="1" name="default" {_default_week}/>
             <only-show-weekends value="false"/>
             <overriden-day-types/>
             <days/>
         </day-types>
-    </calendars>
+{_holidays}    </calendars>
 '''
     suffix = '''
-    <resources>
-    </resources>
-    <allocations>
-    </allocations>
     <vacations/>
     <previous/>
     <roles roleset-name="Default"/>
@@ -136,20 +165,33 @@ def _output_main_file(outfile, plan):
 </project>
 </WORKBENCH_PROJECT>'''
 
-    # key = ID string, value = task dict
-    id_to_task = {}
-    sanitize_tasks(plan, id_to_task, add_child_dependencies=False)
-    # key = predecessor, value = {sucessor:True}
-    deps = {}
-    _validate_tasks(id_to_task, deps)
-    # key = task_id, value = intid
-    id_to_intid = _generate_integer_ids(id_to_task)
-
-    outfile.write(prefix.lstrip('\n'))
-    _output_tasks(outfile, id_to_intid, deps, plan)
-    outfile.write(suffix.lstrip('\n'))
-
-
-def plan_to_ganttproject(filename, plan):
-    with open(filename, 'wt') as outfile:
-        _output_main_file(outfile, plan)
+    calendar = context.calendar
+    _default_week = _default_week_as_gp_attrs(calendar)
+    _holidays = _holidays_as_gp_xml(calendar)
+    start_date = context.start_date or _default_start_date
+    with profile_phase('dates'):
+        dates = format_schedule_dates(schedule_to_dates(compiled.schedule, calendar, start_date), _gp_date_format)
+
+    with profile_phase('write'):
+        outfile.write(prefix.lstrip('\n').format(**locals()))
+        _output_tasks(outfile, compiled, dates, compute_rollup(compiled))
+        _output_resources(outfile, compiled, resource_assignments(compiled))
+        outfile.write(suffix.lstrip('\n'))
+
+
+# plan may be a plan dict, the result of compile_plan(plan), or the file name
+# of a plan image (see save_plan_image).
+# start_date defaults to 2016-10-10 (a monday).
+# calendar is a WorkCalendar; defaults to monday-friday without holidays.
+# cache is an ExportCache; GanttProject output reuses the cached schedule.
+# selection, a Selection (see make_selection), exports only part of the plan.
+# strict raises DependencyCycleError on a dependency cycle instead of reporting it.
+# context, an ExportContext, replaces all of the above.
+def plan_to_ganttproject(filename, plan, start_date=None, calendar=None, cache=None, selection=None, strict=False, context=None):
+    if context is None:
+        context = make_export_context(start_date, calendar, cache=cache, selection=selection, strict=strict)
+
+    with profile_export('plan_to_ganttproject', filename):
+        compiled = compile_for_context(plan, context)
+        with open(filename, 'wt') as outfile, ChunkedWriter(outfile) as writer:
+            _output_main_file(writer, compiled, context)
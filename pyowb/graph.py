@@ -0,0 +1,217 @@
+# Dependency graph of a compiled plan.
+#
+#   Every task is split into a start event and a finish event, which
+#   turns the work breakdown structure plus its dependencies into one
+#   graph with 2 events per task:
+#
+#       start(parent)       -> start(child)
+#       finish(child)       -> finish(parent)
+#       finish(predecessor) -> start(task)
+#       start(task)         -> finish(task)
+#
+#   A dependency on a summary is a dependency on all of its leaves, and a
+#   summary's dependencies apply to all of its leaves, so this graph has
+#   the same reachability as the expanded leaf graph while staying linear
+#   in the size of the plan.
+
+import sys
+from .keywords import *
+from .tasks import *
+from .task_store import *
+
+
+class DependencyCycleError(ValueError):
+    def __init__(self, message, cycles):
+        ValueError.__init__(self, message)
+        self.cycles = cycles
+
+
+def start_event(index):
+    return 2*index
+
+def finish_event(index):
+    return 2*index + 1
+
+def event_task(event):
+    return event >> 1
+
+def is_finish_event(event):
+    return event & 1
+
+# (This is the inner loop of every graph walk, so it slices the CSR arrays
+# directly rather than going through Csr.__getitem__.)
+def event_successors(compiled, event):
+    index = event >> 1
+    if event & 1:
+        parent_index = compiled.parents[index]
+        if parent_index != -1:
+            yield finish_event(parent_index)
+        successors = compiled.successors
+        for successor_index in successors.values[successors.offsets[index]:successors.offsets[index+1]]:
+            yield start_event(successor_index)
+    else:
+        yield finish_event(index)
+        children = compiled.children
+        for child_index in children.values[children.offsets[index]:children.offsets[index+1]]:
+            yield start_event(child_index)
+
+
+# Returns the events in topological order.  Events that are part of a
+# dependency cycle cannot be ordered; they are appended in index order
+# (compile_plan reports the cycles).
+def topological_event_order(compiled):
+    task_count = len(compiled.tasks)
+    in_degree = [0] * (2*task_count)
+    predecessor_offsets = compiled.predecessors.offsets
+    child_offsets = compiled.children.offsets
+    for index in range(task_count):
+        in_degree[start_event(index)] = predecessor_offsets[index+1] - predecessor_offsets[index] + (compiled.parents[index] != -1)
+        in_degree[finish_event(index)] = 1 + child_offsets[index+1] - child_offsets[index]
+
+    order = []
+    ready = [event for event in range(2*task_count) if in_degree[event] == 0]
+    while ready:
+        event = ready.pop()
+        order.append(event)
+        for target in event_successors(compiled, event):
+            in_degree[target] -= 1
+            if in_degree[target] == 0:
+                ready.append(target)
+
+    if len(order) != len(in_degree):
+        ordered = set(order)
+        order.extend(event for event in range(2*task_count) if event not in ordered)
+    return order
+
+
+# Returns a list of cycles; each cycle is a sorted list of the task indices
+# in one strongly connected component of the event graph.
+#
+# Iterative Tarjan, O(V+E).
+def find_dependency_cycles(compiled):
+    event_count = 2*len(compiled.tasks)
+    unvisited = -1
+    order = [unvisited] * event_count
+    low_link = [0] * event_count
+    on_stack = [False] * event_count
+    stack = []
+    cycles = []
+    next_order = 0
+
+    for root in range(event_count):
+        if order[root] != unvisited:
+            continue
+        order[root] = low_link[root] = next_order
+        next_order += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, event_successors(compiled, root))]
+        while work:
+            event, targets = work[-1]
+            descended = False
+            for target in targets:
+                if order[target] == unvisited:
+                    order[target] = low_link[target] = next_order
+                    next_order += 1
+                    stack.append(target)
+                    on_stack[target] = True
+                    work.append((target, event_successors(compiled, target)))
+                    descended = True
+                    break
+                elif on_stack[target] and order[target] < low_link[event]:
+                    low_link[event] = order[target]
+            if descended:
+                continue
+
+            work.pop()
+            if work:
+                parent_event = work[-1][0]
+                if low_link[event] < low_link[parent_event]:
+                    low_link[parent_event] = low_link[event]
+            if low_link[event] == order[event]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                    if member == event:
+                        break
+                # a lone event cannot depend on itself
+                if len(component) > 1:
+                    cycles.append(sorted(set(event_task(member) for member in component)))
+
+    cycles.sort()
+    return cycles
+
+def _format_cycle(compiled, cycle):
+    return ', '.join('ID={0} NAME={1}'.format(compiled.ids[index], get_name(compiled.store, index))
+                     for index in cycle)
+
+# Reports every dependency cycle on stderr.  With strict=True, raises
+# DependencyCycleError instead.  Returns the cycles found.
+def check_dependency_cycles(compiled, strict=False):
+    return report_dependency_cycles(compiled, find_dependency_cycles(compiled), strict)
+
+# Reports cycles previously returned by find_dependency_cycles(compiled).
+def report_dependency_cycles(compiled, cycles, strict=False):
+    if not cycles:
+        return cycles
+    messages = ['dependency cycle between {0}'.format(_format_cycle(compiled, cycle)) for cycle in cycles]
+    if strict:
+        raise DependencyCycleError('\n'.join(messages), cycles)
+    for message in messages:
+        sys.stderr.write('ERROR: {0}\n'.format(message))
+    return cycles
+
+
+# dependencies: dict(successor, iterable of predecessors), over any hashable nodes.
+#
+# Returns dict(successor, list of predecessors) without the dependencies that
+# are implied by a longer path, e.g. a->c is dropped when a->b->c exists.
+# A predecessor listed twice is kept once, in the place it first appears.
+# Reachability is tracked as one bitset (a python int) per node, indexed by
+# topological position.  A graph with a cycle is returned unreduced (but
+# without repeated predecessors).
+def transitive_reduction(dependencies):
+    dependencies = dict((successor, list(dict.fromkeys(predecessors))) for successor, predecessors in dependencies.items())
+    successors = {} # predecessor:[successor]
+    in_degree = {}
+    for successor, predecessors in dependencies.items():
+        in_degree.setdefault(successor, 0)
+        for predecessor in predecessors:
+            in_degree.setdefault(predecessor, 0)
+            in_degree[successor] += 1
+            successors.setdefault(predecessor, []).append(successor)
+
+    order = []
+    remaining = dict(in_degree)
+    ready = [node for node, degree in in_degree.items() if degree == 0]
+    while ready:
+        node = ready.pop()
+        order.append(node)
+        for successor in successors.get(node, ()):
+            remaining[successor] -= 1
+            if remaining[successor] == 0:
+                ready.append(successor)
+    if len(order) != len(in_degree):
+        return dependencies
+
+    position = dict((node, index) for index, node in enumerate(order))
+    # number of predecessors that still need a node's reachability
+    unprocessed_predecessors = in_degree
+    reachable = {}
+    redundant = set() # (predecessor, successor)
+    for node in reversed(order):
+        node_reachable = 0
+        for successor in sorted(successors.get(node, ()), key=position.__getitem__):
+            if (node_reachable >> position[successor]) & 1:
+                redundant.add((node, successor))
+            else:
+                node_reachable |= reachable[successor] | (1 << position[successor])
+            unprocessed_predecessors[successor] -= 1
+            if unprocessed_predecessors[successor] == 0:
+                del reachable[successor]
+        reachable[node] = node_reachable
+
+    return dict((successor, [predecessor for predecessor in predecessors if (predecessor, successor) not in redundant])
+                for successor, predecessors in dependencies.items())
@@ -3,6 +3,15 @@ NAME = 'name'
 DESC = 'desc'
 DEPS = 'deps'
 EFFORT = 'effort'
+# three-point estimates of EFFORT, for risk.simulate_schedule
+OPTIMISTIC = 'optimistic'
+LIKELY = 'likely'
+PESSIMISTIC = 'pessimistic'
+# resource name(s) of a task; capacities of the plan's resources, on its root
+RESOURCE = 'resource'
+RESOURCES = 'resources'
+# WBS code of a task; its children's codes extend it
+WBS = 'wbs'
 CHILDREN = 'children'
 SEQUENCE = 'sequence'
 PARALLEL = 'parallel'
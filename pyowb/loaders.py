@@ -0,0 +1,712 @@
+# Plan loaders.
+#
+#   A plan source names where a plan comes from:
+#
+#       plans/team.py            the variable 'plan' of a python file
+#       plans/team.py:make_plan  another variable of it; a callable is called
+#       mypackage.plans:team     an attribute of an importable module
+#       plans/team.json          a JSON document holding the plan dict
+#       plans/team.yaml          the same as YAML (.yml too; needs PyYAML)
+#       plans/team.toml          the same as TOML (needs python 3.11, or tomli)
+#       plans/team.xml           an Open Workbench or MSPDI (ProjectLibre) file
+#
+#   Python files are run with runpy, so their "if __name__ == '__main__'"
+#   blocks do not run.
+#
+#   Data files are parsed straight into the plan: JSON is read in chunks of
+#   _json_chunk_size characters and YAML as a stream of parser events, so
+#   that no copy of the file and no intermediate document tree is held next
+#   to the plan.  Dict keys are interned, and every DEPS entry shares the
+#   string of the ID it names.  Streaming JSON is several times slower than
+#   json.load, which needs the whole file in memory first.
+#
+#   XML files, as written by the OWB and ProjectLibre exporters (and the
+#   tools themselves), are read with iterparse, one task element at a time.
+#   The hierarchy is rebuilt from outline levels, and DEPS from the
+#   dependencies, which are between leaves in these formats.  Dependency
+#   types and lags other than finish-to-start without lag are read as that.
+
+import importlib
+import json
+import json.scanner
+import os
+import re
+import runpy
+import sys
+import xml.etree.ElementTree as ElementTree
+from datetime import datetime
+from .keywords import *
+from .work_calendar import *
+
+DEFAULT_PLAN_NAME = 'plan'
+
+_json_chunk_size = 1 << 20
+
+_json_number_characters = '0123456789+-.eE'
+_json_whitespace = re.compile(r'[ \t\n\r]*')
+# an object without nested objects, whose arrays hold no arrays or objects
+# (a leaf task, typically); one character or string at a time, so that
+# failing to match takes linear time
+_json_flat_string = r'"(?:[^"\\]|\\.)*"'
+_json_flat_object = re.compile(r'\{(?:[^{}\[\]"]|' + _json_flat_string +
+                               r'|\[(?:[^{}\[\]"]|' + _json_flat_string + r')*\])*\}')
+# decodes one JSON value (in C where available)
+_json_scan = json.scanner.make_scanner(json.JSONDecoder())
+
+
+class PlanSourceError(ValueError):
+    pass
+
+
+# Returns (location, name), where location is a file path or a module name.
+def parse_plan_source(source):
+    location, separator, name = source.rpartition(':')
+    # keeps windows drive letters ('C:\plans\team.py') together
+    if not separator or not name.isidentifier() or len(location) < 2:
+        return (source, None)
+    return (location, name)
+
+def _is_file_source(location):
+    return os.path.splitext(location)[1] in ('.py',) + _data_suffixes or os.path.exists(location)
+
+def _plan_from_namespace(namespace, name, source):
+    name = name or DEFAULT_PLAN_NAME
+    if name not in namespace:
+        raise PlanSourceError('{0}: no "{1}" defined'.format(source, name))
+    plan = namespace[name]
+    if callable(plan):
+        plan = plan()
+    if not isinstance(plan, dict):
+        raise PlanSourceError('{0}: "{1}" is not a plan dict'.format(source, name))
+    return plan
+
+# Shares one string between the ID of a task and every DEPS entry naming
+# it, through ids, a dict that lives while a plan is read.
+def _intern_member(key, value, ids):
+    if key == ID and isinstance(value, str):
+        return ids.setdefault(value, value)
+    if key == DEPS and isinstance(value, list):
+        return [ids.setdefault(dependency, dependency) if isinstance(dependency, str) else dependency
+                for dependency in value]
+    return value
+
+def _as_keyword(value):
+    if value == SEQUENCE:
+        return SEQUENCE
+    if value == PARALLEL:
+        return PARALLEL
+    return value
+
+
+# Reads a JSON plan a chunk at a time.  Summary task objects and CHILDREN
+# lists are parsed here, with an explicit stack, so any depth of nesting is
+# fine; leaf tasks and any other values are decoded whole by the json
+# module's scanner.
+class _JsonPlanReader:
+    def __init__(self, infile, source, chunk_size):
+        self.infile = infile
+        self.source = source
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.position = 0
+        # file offset of buffer[0], for error messages
+        self.offset = 0
+        self.eof = False
+        self.ids = {}
+
+    def _error(self, message):
+        return PlanSourceError('{0}: {1} at character {2}'.format(self.source, message, self.offset + self.position))
+
+    # Appends a chunk to the unread part of the buffer; returns False at the end of the file.
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.infile.read(self.chunk_size)
+        self.offset += self.position
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        self.eof = not chunk
+        return not self.eof
+
+    # Skips whitespace; returns the next character, or '' at the end of the file.
+    def _peek(self):
+        while True:
+            self.position = _json_whitespace.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._fill():
+                return ''
+
+    def _expect(self, characters):
+        character = self._peek()
+        if not character or character not in characters:
+            raise self._error('expected {0}'.format(' or '.join(repr(c) for c in characters)))
+        self.position += 1
+        return character
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = _json_scan(self.buffer, self.position)
+            except (StopIteration, ValueError):
+                end = None
+            # a value that ends with the buffer may continue in the next
+            # chunk, and so may a number followed by what can continue it
+            if end is not None and (self.eof or (end < len(self.buffer) and
+                                                 self.buffer[end] not in _json_number_characters)):
+                self.position = end
+                return value
+            if not self._fill():
+                raise self._error('invalid JSON value')
+
+    # Decodes the next task in one go if it has no CHILDREN and ends within
+    # the buffer; returns None otherwise.
+    def _flat_task(self):
+        match = _json_flat_object.match(self.buffer, self.position)
+        if match is None or (match.end() == len(self.buffer) and not self.eof):
+            return None
+        try:
+            value, end = _json_scan(self.buffer, self.position)
+        except (StopIteration, ValueError):
+            # reported by the caller
+            return None
+        if CHILDREN in value:
+            return None
+        task = {}
+        for key, member in value.items():
+            key = sys.intern(key)
+            task[key] = _intern_member(key, member, self.ids)
+        self.position = end
+        return task
+
+    def _key(self):
+        if self._peek() != '"':
+            raise self._error('expected a key')
+        return sys.intern(self._value())
+
+    def read(self):
+        self._expect('{')
+        plan = {}
+        # task dicts and CHILDREN lists being read
+        stack = [plan]
+        is_first = True
+        while stack:
+            container = stack[-1]
+            closing = '}' if isinstance(container, dict) else ']'
+            if is_first:
+                if self._peek() == closing:
+                    self.position += 1
+                    stack.pop()
+                    is_first = False
+                    continue
+            elif self._expect(',' + closing) == closing:
+                stack.pop()
+                continue
+            is_first = False
+
+            if isinstance(container, dict):
+                key = self._key()
+                self._expect(':')
+                if key == CHILDREN:
+                    self._expect('[')
+                    children = container[CHILDREN] = []
+                    stack.append(children)
+                    is_first = True
+                else:
+                    container[key] = _intern_member(key, self._value(), self.ids)
+            elif self._peek() == '{':
+                task = self._flat_task()
+                if task is not None:
+                    container.append(task)
+                    continue
+                self.position += 1
+                task = {}
+                container.append(task)
+                stack.append(task)
+                is_first = True
+            else:
+                marker = self._value()
+                if marker != SEQUENCE and marker != PARALLEL:
+                    raise self._error('expected a task, "{0}" or "{1}"'.format(SEQUENCE, PARALLEL))
+                container.append(_as_keyword(marker))
+
+        if self._peek():
+            raise self._error('extra data after the plan')
+        return plan
+
+# Reads a plan from a JSON text file object.
+def read_json_plan(infile, source='<json>', chunk_size=_json_chunk_size):
+    return _JsonPlanReader(infile, source, chunk_size).read()
+
+
+_no_key = object()
+
+def _import_yaml(source):
+    try:
+        import yaml
+    except ImportError:
+        raise PlanSourceError('{0}: reading YAML needs PyYAML (pip install pyyaml)'.format(source))
+    return yaml
+
+# Reads a plan from a YAML file object, building it from parser events.
+def read_yaml_plan(infile, source='<yaml>'):
+    yaml = _import_yaml(source)
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    resolver = yaml.resolver.Resolver()
+    constructor = yaml.constructor.SafeConstructor()
+    anchors = {}
+    ids = {}
+    # [container, pending key or _no_key] of the mappings and sequences being read
+    stack = []
+    documents = []
+
+    def _add(value):
+        if not stack:
+            documents.append(value)
+            return
+        frame = stack[-1]
+        container, key = frame
+        if isinstance(container, list):
+            container.append(_as_keyword(value))
+        elif key is _no_key:
+            if isinstance(value, (dict, list)):
+                raise PlanSourceError('{0}: a mapping key must be a scalar'.format(source))
+            frame[1] = sys.intern(value) if isinstance(value, str) else value
+        else:
+            container[key] = _intern_member(key, value, ids)
+            frame[1] = _no_key
+
+    try:
+        for event in yaml.parse(infile, Loader=loader):
+            if isinstance(event, yaml.ScalarEvent):
+                tag = event.tag
+                if tag is None or tag == '!':
+                    tag = resolver.resolve(yaml.ScalarNode, event.value, event.implicit)
+                node = yaml.ScalarNode(tag, event.value, event.start_mark, event.end_mark, event.style)
+                construct = constructor.yaml_constructors.get(tag, type(constructor).construct_undefined)
+                value = construct(constructor, node)
+                if event.anchor:
+                    anchors[event.anchor] = value
+                _add(value)
+            elif isinstance(event, (yaml.MappingStartEvent, yaml.SequenceStartEvent)):
+                container = {} if isinstance(event, yaml.MappingStartEvent) else []
+                if event.anchor:
+                    anchors[event.anchor] = container
+                stack.append([container, _no_key])
+            elif isinstance(event, (yaml.MappingEndEvent, yaml.SequenceEndEvent)):
+                _add(stack.pop()[0])
+            elif isinstance(event, yaml.AliasEvent):
+                _add(anchors[event.anchor])
+            elif isinstance(event, yaml.DocumentEndEvent):
+                break
+    except yaml.YAMLError as error:
+        raise PlanSourceError('{0}: {1}'.format(source, error))
+    if not documents or not isinstance(documents[0], dict):
+        raise PlanSourceError('{0}: the document is not a plan mapping'.format(source))
+    return documents[0]
+
+
+def _import_tomllib(source):
+    try:
+        import tomllib
+    except ImportError:
+        try:
+            import tomli as tomllib
+        except ImportError:
+            raise PlanSourceError('{0}: reading TOML needs python 3.11 or tomli (pip install tomli)'.format(source))
+    return tomllib
+
+# Reads a plan from a binary TOML file object.  TOML parsers have no
+# streaming interface, so the document is parsed whole and then interned.
+def read_toml_plan(infile, source='<toml>'):
+    tomllib = _import_tomllib(source)
+    try:
+        plan = tomllib.load(infile)
+    except tomllib.TOMLDecodeError as error:
+        raise PlanSourceError('{0}: {1}'.format(source, error))
+    ids = {}
+    stack = [plan]
+    while stack:
+        task = stack.pop()
+        for key in list(task.keys()):
+            task[sys.intern(key)] = _intern_member(key, task.pop(key), ids)
+        children = task.get(CHILDREN, ())
+        for child_index, child in enumerate(children):
+            if isinstance(child, str):
+                children[child_index] = _as_keyword(child)
+            elif isinstance(child, dict):
+                stack.append(child)
+    return plan
+
+
+# Yields (event, tag, element, depth) while parsing an XML file object with
+# iterparse, tag being without its namespace:
+#   ('start', ...) for the root element and for tags in start_tags, whose
+#       attributes are then read but not their content;
+#   ('end', ...) for every complete element with a tag in record_tags,
+#       unless it is inside another such element.
+# Every element outside a record is cleared and dropped from its parent as
+# soon as it is complete, and every record once it has been yielded, so
+# memory stays flat however large the file.
+def _iter_xml(infile, source, start_tags, record_tags):
+    # open elements outside records; records are not added
+    stack = []
+    # open elements of the current record, 0 outside records
+    record_depth = 0
+    try:
+        for event, element in ElementTree.iterparse(infile, ('start', 'end')):
+            if record_depth:
+                if event == 'start':
+                    record_depth += 1
+                    continue
+                record_depth -= 1
+                if record_depth:
+                    continue
+                yield ('end', element.tag.rpartition('}')[2], element, len(stack))
+            elif event == 'start':
+                tag = element.tag.rpartition('}')[2]
+                if not stack or tag in start_tags:
+                    yield ('start', tag, element, len(stack))
+                if tag in record_tags:
+                    record_depth = 1
+                else:
+                    stack.append(element)
+                continue
+            else:
+                stack.pop()
+            element.clear()
+            if stack:
+                # the only child left: earlier ones were dropped already
+                stack[-1].remove(element)
+    except ElementTree.ParseError as error:
+        raise PlanSourceError('{0}: {1}'.format(source, error))
+
+_xml_start_tags = frozenset(('Project',))
+_xml_record_tags = frozenset(('Task', 'Dependency', 'Resource', 'Assignment', 'Name', 'Title', 'MinutesPerDay'))
+
+
+# Rebuilds the task tree from outline levels (1 for the top), as OWB and
+# MSPDI files store it.  A task that gets children loses its EFFORT, which
+# these formats roll up from the children.
+class _OutlineBuilder:
+    def __init__(self):
+        self.roots = []
+        # (level, task) of the last task at each depth
+        self._stack = []
+
+    def add(self, level, task):
+        stack = self._stack
+        while stack and stack[-1][0] >= level:
+            stack.pop()
+        if stack:
+            parent = stack[-1][1]
+            if CHILDREN not in parent:
+                parent.pop(EFFORT, None)
+                parent[CHILDREN] = []
+            parent[CHILDREN].append(task)
+        else:
+            self.roots.append(task)
+        stack.append((level, task))
+
+    # A file with several top-level tasks gets a root named name.
+    def plan(self, name, source):
+        if not self.roots:
+            raise PlanSourceError('{0}: no tasks'.format(source))
+        if len(self.roots) == 1:
+            return self.roots[0]
+        return {NAME : name or os.path.basename(source), CHILDREN : self.roots}
+
+def _outline_level(text, source, task_name):
+    try:
+        return int(text)
+    except (TypeError, ValueError):
+        raise PlanSourceError('{0}: task "{1}" has no valid outline level'.format(source, task_name))
+
+def _effort_value(minutes, minutes_per_day):
+    if minutes % minutes_per_day == 0:
+        return int(minutes // minutes_per_day)
+    return minutes / minutes_per_day
+
+def _warn_unsupported_dependency(source, predecessor_id, successor_id):
+    sys.stderr.write('WARNING: {source}: dependency {predecessor_id} -> {successor_id} read as finish-to-start without lag\n'.format(**locals()))
+
+# RESOURCE is a name, or a list of several.
+def _set_resources(task, names):
+    if names:
+        task[RESOURCE] = names[0] if len(names) == 1 else names
+
+def _capacity_value(text):
+    try:
+        capacity = float(text)
+    except (TypeError, ValueError):
+        return 1
+    return int(capacity) if capacity == int(capacity) and capacity >= 1 else 1
+
+# Puts the capacities other than 1 into RESOURCES of the plan root.
+def _set_capacities(plan, capacities):
+    capacities = dict((name, capacity) for name, capacity in capacities.items() if capacity != 1)
+    if capacities:
+        plan[RESOURCES] = capacities
+    return plan
+
+def _attach_dependencies(dependencies, tasks_by_id, source):
+    for successor_id, predecessor_ids in dependencies.items():
+        task = tasks_by_id.get(successor_id, None)
+        if task is None:
+            sys.stderr.write('WARNING: {0}: dependency of unknown task "{1}"\n'.format(source, successor_id))
+            continue
+        task[DEPS] = predecessor_ids
+
+
+def _owb_datetime(text, source):
+    try:
+        return datetime.fromisoformat(text)
+    except (TypeError, ValueError):
+        raise PlanSourceError('{0}: invalid date "{1}"'.format(source, text))
+
+def _day_fraction(moment):
+    return (moment.hour * 3600 + moment.minute * 60 + moment.second) / 86400
+
+# Working days from start to finish, the reverse of WorkCalendar.to_datetimes;
+# to the second, as OWB stores dates.
+def _owb_effort(calendar, start, finish):
+    days = calendar.count_working_days(start.date(), finish.date()) + _day_fraction(finish) - _day_fraction(start)
+    return _effort_value(round(days * 86400), 86400)
+
+def _read_owb_task(element, calendar, ids, source):
+    task = {NAME : element.get('name', '')}
+    task_id = element.get('taskID')
+    if task_id:
+        task[ID] = ids.setdefault(task_id, task_id)
+    notes = [note.get('content', '') for note in element.iter() if note.tag.rpartition('}')[2] == 'Note']
+    # the writer puts ' ' in the note of a task without DESC
+    if any(note.strip() for note in notes):
+        task[DESC] = '\n'.join(notes)
+    if element.get('start') and element.get('finish'):
+        effort = _owb_effort(calendar, _owb_datetime(element.get('start'), source), _owb_datetime(element.get('finish'), source))
+        if effort:
+            task[EFFORT] = effort
+    _set_resources(task, [assignment.get('resourceID') for assignment in element.iter()
+                          if assignment.tag.rpartition('}')[2] == 'Assignment' and assignment.get('resourceID')])
+    return task
+
+def _read_owb_events(events, source, calendar):
+    if calendar is None:
+        calendar = WorkCalendar()
+    outline = _OutlineBuilder()
+    project_name = None
+    ids = {}
+    tasks_by_id = {}
+    dependencies = {} # successor ID:[predecessor ID]
+    capacities = {}
+    for event, tag, element, depth in events:
+        if event == 'start':
+            if tag == 'Project' and project_name is None:
+                project_name = element.get('name')
+        elif tag == 'Resource':
+            if element.get('resourceID'):
+                capacities[element.get('resourceID')] = _capacity_value(element.get('maxUnits'))
+        elif tag == 'Task':
+            task = _read_owb_task(element, calendar, ids, source)
+            outline.add(_outline_level(element.get('outlineLevel'), source, task[NAME]), task)
+            if ID in task:
+                tasks_by_id[task[ID]] = task
+        elif tag == 'Dependency':
+            predecessor_id = element.get('predecessorID')
+            successor_id = element.get('successorID')
+            if element.get('startFinishType', '0') != '0' or float(element.get('lag', '0')) != 0:
+                _warn_unsupported_dependency(source, predecessor_id, successor_id)
+            dependencies.setdefault(ids.setdefault(successor_id, successor_id), []).append(ids.setdefault(predecessor_id, predecessor_id))
+    _attach_dependencies(dependencies, tasks_by_id, source)
+    return _set_capacities(outline.plan(project_name, source), capacities)
+
+
+_mspdi_duration = re.compile(r'^P(?:(\d+(?:\.\d*)?)D)?(?:T(?:(\d+(?:\.\d*)?)H)?(?:(\d+(?:\.\d*)?)M)?(?:(\d+(?:\.\d*)?)S)?)?$')
+
+# Duration in working days, from PnDTnHnMnS (a day being minutes_per_day).
+#
+# The exporter writes whole minutes, but dates to the second, so the
+# effort between Start and Finish (see _owb_effort) is used instead
+# when it agrees with the duration.
+def _mspdi_effort(fields, minutes_per_day, calendar, source):
+    text = fields['Duration']
+    match = _mspdi_duration.match(text.strip())
+    if not match:
+        raise PlanSourceError('{0}: invalid duration "{1}"'.format(source, text))
+    days, hours, minutes, seconds = (float(group) if group else 0 for group in match.groups())
+    minutes = days * minutes_per_day + hours * 60 + minutes + seconds / 60
+    if fields.get('Start') and fields.get('Finish'):
+        effort = _owb_effort(calendar, _owb_datetime(fields['Start'], source), _owb_datetime(fields['Finish'], source))
+        if abs(effort * minutes_per_day - minutes) < 1:
+            return effort
+    return _effort_value(minutes, minutes_per_day)
+
+def _is_mspdi_true(text):
+    return text is not None and text.strip().lower() in ('1', 'true')
+
+# Returns (level, task, UID, [predecessor UID]); level is None for rows to skip.
+def _read_mspdi_task(element, minutes_per_day, calendar, ids, source):
+    # the children of a task share its namespace
+    namespace_length = len(element.tag) - len('Task')
+    fields = dict((child.tag[namespace_length:], child.text) for child in element)
+    predecessor_uids = []
+    if 'PredecessorLink' in fields:
+        for child in element:
+            if child.tag[namespace_length:] != 'PredecessorLink':
+                continue
+            link = dict((link_child.tag[namespace_length:], link_child.text) for link_child in child)
+            predecessor_uid = link.get('PredecessorUID')
+            if predecessor_uid is None:
+                continue
+            predecessor_uids.append(predecessor_uid)
+            if (link.get('Type') or '1') != '1' or float(link.get('LinkLag') or 0) != 0:
+                _warn_unsupported_dependency(source, predecessor_uid, fields.get('UID'))
+    uid = fields.get('UID')
+    # OutlineLevel 0 is the project summary row of files saved by other tools
+    if _is_mspdi_true(fields.get('IsNull')) or fields.get('OutlineLevel') == '0':
+        return (None, None, uid, [])
+    task = {NAME : fields.get('Name') or ''}
+    task_id = fields.get('ID') or ('_uid' + uid if uid else None)
+    if task_id:
+        task[ID] = ids.setdefault(task_id, task_id)
+    if fields.get('Notes'):
+        task[DESC] = fields['Notes']
+    # a WBS code other than the outline number was given by the plan
+    if fields.get('WBS') and fields['WBS'] != fields.get('OutlineNumber'):
+        task[WBS] = fields['WBS']
+    if fields.get('Duration'):
+        effort = _mspdi_effort(fields, minutes_per_day, calendar, source)
+        # the writer marks tasks with an EFFORT, even one of 0, as Estimated
+        if effort or _is_mspdi_true(fields.get('Estimated')):
+            task[EFFORT] = effort
+    return (_outline_level(fields.get('OutlineLevel'), source, task[NAME]), task, uid, predecessor_uids)
+
+def _read_mspdi_events(events, source, calendar):
+    if calendar is None:
+        calendar = WorkCalendar()
+    outline = _OutlineBuilder()
+    project_name = None
+    minutes_per_day = 480
+    ids = {}
+    uid_to_task = {}
+    links = [] # (task, [predecessor UID])
+    resource_names = {} # resource UID:name
+    capacities = {}
+    assignments = [] # (task UID, resource UID)
+    for event, tag, element, depth in events:
+        if event == 'start':
+            continue
+        if tag in ('Resource', 'Assignment'):
+            namespace_length = len(element.tag) - len(tag)
+            fields = dict((child.tag[namespace_length:], child.text) for child in element)
+            if tag == 'Assignment':
+                assignments.append((fields.get('TaskUID'), fields.get('ResourceUID')))
+            # UID 0 is the "Unassigned" resource
+            elif fields.get('UID') not in (None, '0') and fields.get('Name') and not _is_mspdi_true(fields.get('IsNull')):
+                resource_names[fields['UID']] = fields['Name']
+                capacities[fields['Name']] = _capacity_value(fields.get('MaxUnits'))
+        elif depth == 1 and tag in ('Title', 'Name'):
+            project_name = project_name or element.text
+        elif depth == 1 and tag == 'MinutesPerDay':
+            minutes_per_day = int(element.text or 480) or 480
+        elif tag == 'Task':
+            level, task, uid, predecessor_uids = _read_mspdi_task(element, minutes_per_day, calendar, ids, source)
+            if level is None:
+                continue
+            outline.add(level, task)
+            if uid is not None:
+                uid_to_task[uid] = task
+            if predecessor_uids:
+                links.append((task, predecessor_uids))
+    for task, predecessor_uids in links:
+        predecessor_ids = []
+        for predecessor_uid in predecessor_uids:
+            predecessor = uid_to_task.get(predecessor_uid, None)
+            if predecessor is None or ID not in predecessor:
+                sys.stderr.write('WARNING: {0}: task "{1}" depends on unknown task UID {2}\n'.format(source, task[NAME], predecessor_uid))
+                continue
+            predecessor_ids.append(predecessor[ID])
+        if predecessor_ids:
+            task[DEPS] = predecessor_ids
+    task_resources = {} # task UID:[resource name]
+    for task_uid, resource_uid in assignments:
+        if task_uid in uid_to_task and resource_uid in resource_names:
+            task_resources.setdefault(task_uid, []).append(resource_names[resource_uid])
+    for task_uid, names in task_resources.items():
+        _set_resources(uid_to_task[task_uid], names)
+    return _set_capacities(outline.plan(project_name, source), capacities)
+
+
+def _xml_events_for_root(infile, source, root_tags):
+    events = _iter_xml(infile, source, _xml_start_tags, _xml_record_tags)
+    for event, tag, element, depth in events:
+        if tag not in root_tags:
+            raise PlanSourceError('{0}: <{1}> is not the root of a plan file'.format(source, tag))
+        return (tag, events)
+    raise PlanSourceError('{0}: empty XML document'.format(source))
+
+# Reads a plan from an Open Workbench XML file object, as written by
+# plan_to_owb_xml.  EFFORT is recovered from the start and finish dates of
+# each leaf, counting working days of calendar (default: monday-friday).
+# Assignments become RESOURCE, and resource capacities RESOURCES.
+def read_owb_plan(infile, source='<owb>', calendar=None):
+    tag, events = _xml_events_for_root(infile, source, ('WORKBENCH_PROJECT',))
+    return _read_owb_events(events, source, calendar)
+
+# Reads a plan from an MSPDI (Microsoft Project XML) file object, as written
+# by plan_to_project_libre_xml.  EFFORT is taken from the Duration of
+# leaves, refined by their dates (counting working days of calendar).
+# Assignments and resources are read as by read_owb_plan.
+def read_mspdi_plan(infile, source='<mspdi>', calendar=None):
+    tag, events = _xml_events_for_root(infile, source, ('Project',))
+    return _read_mspdi_events(events, source, calendar)
+
+# Reads either of the above, by the root element of the file.
+def read_xml_plan(infile, source='<xml>', calendar=None):
+    tag, events = _xml_events_for_root(infile, source, ('WORKBENCH_PROJECT', 'Project'))
+    if tag == 'WORKBENCH_PROJECT':
+        return _read_owb_events(events, source, calendar)
+    return _read_mspdi_events(events, source, calendar)
+
+
+# suffix: (reader, file mode)
+_data_readers = {
+    '.json' : (read_json_plan, 'rt'),
+    '.yaml' : (read_yaml_plan, 'rt'),
+    '.yml' : (read_yaml_plan, 'rt'),
+    '.toml' : (read_toml_plan, 'rb'),
+    '.xml' : (read_xml_plan, 'rb'),
+}
+_data_suffixes = tuple(_data_readers.keys())
+
+def _load_data_file(path):
+    reader, mode = _data_readers[os.path.splitext(path)[1]]
+    with open(path, mode, encoding=None if 'b' in mode else 'utf-8') as infile:
+        return reader(infile, path)
+
+
+# Loads the plan named by source.  With reload=True an already imported
+# module is re-executed, so that edits to it are picked up.
+def load_plan(source, reload=False):
+    location, name = parse_plan_source(source)
+    if _is_file_source(location):
+        if os.path.splitext(location)[1] in _data_suffixes:
+            if name:
+                raise PlanSourceError('{0}: a data file holds a single plan; remove ":{1}"'.format(source, name))
+            return _load_data_file(location)
+        return _plan_from_namespace(runpy.run_path(location, run_name='__pyowb_plan__'), name, source)
+
+    module = importlib.import_module(location)
+    if reload:
+        module = importlib.reload(module)
+    return _plan_from_namespace(vars(module), name, source)
+
+# Returns the files whose modification means that source has to be reloaded.
+def plan_source_files(source):
+    location, name = parse_plan_source(source)
+    if _is_file_source(location):
+        return [location]
+    module = sys.modules.get(location) or importlib.import_module(location)
+    module_file = getattr(module, '__file__', None)
+    return [module_file] if module_file else []
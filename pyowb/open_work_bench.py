@@ -10,66 +10,96 @@ import math
 from datetime import datetime, timedelta
 from .keywords import *
 from .tasks import *
+from .compiled_plan import *
+from .work_calendar import *
+from .templates import *
+from .profiling import *
+from .export_cache import *
+from .export_context import *
+from .task_store import *
+from .resources import *
 
-# Start date is a monday.  End-date calculation needs to add 2 days per 5 (for weekends);
-# starting on a monday simplifies calculation of the extra.
-_global_start_date = datetime(year=2016, month=10, day=10)
+# NOTE: arbitrarily chosen start date (a monday), used unless one is given
+_default_start_date = datetime(year=2016, month=10, day=10)
 
-def _insert_dependency(deps, successor, predecessor):
-    if successor not in deps:
-        deps[successor] = {}
-    deps[successor][predecessor] = True
+_owb_date_format = '%Y-%m-%dT%H:%M:%S'
 
-def _validate_tasks(id_to_task, deps):
-    for task in id_to_task.values():
-        for predecessor_id in task[DEPS]:
-            if predecessor_id not in id_to_task:
-                sys.stderr.write('WARNING: ID={task[ID]} NAME={task[NAME]} : unknown dependency "{predecessor_id}"\n'.format(**locals()))
-            _insert_dependency(deps, task[ID], predecessor_id)
 
-def _date_as_owb_string(date):
-    return date.strftime('%Y-%m-%dT%H:%M:%S')
-
-
-def _output_tasks_recursive(outfile, task, level):
-    _effort_in_days = task.get(EFFORT, 0)
-    _effort_in_calendar_days = _effort_in_days + math.floor((_effort_in_days - 1) / 5) * 2
-
-    _category = parse_category(task[NAME])
-    _name = xml_escape_attr(task[NAME])
-    _id = xml_escape_attr(task[ID])
-    _desc = xml_escape_attr(task.get(DESC, ' '))
-    _level = level
-    _summary = 'true' if has_children(task) else 'false'
-    _start_date = _date_as_owb_string(_global_start_date)
-    _end_date = _date_as_owb_string(_global_start_date + timedelta(days=_effort_in_calendar_days))
-
-    task_xml = '''
+_task_template = block_template('''
         <Task
           category="{_category}" start="{_start_date}" finish="{_end_date}"
           proxy="false"
-          critical="false" status="0" outlineLevel="{_level}" summary="{_summary}"
-          milestone="false" name={_name} taskID={_id} fixed="false"
-          locked="false" key="false" percComp="0.0" totalSlack="9.0" unplanned="false">
+          critical="{_critical}" status="0" outlineLevel="{_level}" summary="{_summary}"
+          milestone="{_milestone}" name={_name} taskID={_id} fixed="false"
+          locked="false" key="false" percComp="0.0" totalSlack="{_total_slack}" unplanned="false">
           <Notes>
             <Note
               createdBy="Unknown" createdDate="2016-10-09T05:45:21" content={_desc}/>
-          </Notes>
+          </Notes>{_assignments}
         </Task>
-'''
-    formatted_task = task_xml.lstrip('\n').format(**locals())
-    outfile.write(formatted_task)
+''')
+
+_assignment_template = block_template('''
+            <Assignment
+              resourceID={_resource_id} start="{_start_date}" finish="{_end_date}" status="0" estMax="1.0"
+              remainingWork="{_work}"/>
+''')
+
+_resource_template = block_template('''
+        <Resource
+          resourceID={_resource_id} fullName={_resource_id} resourceType="0" employmentType="0"
+          isActive="true" isRole="false" openForTimeEntry="true" maxUnits="{_capacity}"/>
+''')
+
+_dependency_template = block_template('''
+        <Dependency
+          predecessorID="{leaf_predecessor_id}" startFinishType="0" lag="0.0" lagType="0" successorID="{successor_id}"/>
+''')
+
+
+# Hours of work, on an 8-hour day.
+def _work_hours(effort_in_days):
+    return '{0:.1f}'.format(effort_in_days * 8)
+
+def _render_assignments(compiled, dates, assignments, index):
+    resources = assignments.tasks[index]
+    if not resources:
+        return ''
+    _start_date = dates.early_start[index]
+    _end_date = dates.early_finish[index]
+    _work = _work_hours(get_effort(compiled.store, index))
+    rows = ((xml_escape_attr(assignments.names[resource]), _start_date, _end_date, _work) for resource in resources)
+    return '\n          <Assignments>\n' + _assignment_template.render_rows(rows) + '          </Assignments>'
+
+def _output_task(outfile, compiled, dates, assignments, index):
+    store = compiled.store
+    schedule = compiled.schedule
+
+    _category = get_category(store, index)
+    _name = xml_escape_attr(get_name(store, index))
+    _id = xml_escape_attr(compiled.ids[index])
+    _desc = xml_escape_attr(get_desc(store, index, ' '))
+    _level = compiled.levels[index] + 1
+    _summary = 'true' if store.summaries[index] else 'false'
+    _milestone = 'true' if compiled.milestones[index] else 'false'
+    _start_date = dates.early_start[index]
+    _end_date = dates.early_finish[index]
+    _critical = 'true' if schedule.critical[index] else 'false'
+    _total_slack = '{0:.1f}'.format(schedule.total_slack[index])
+    _assignments = _render_assignments(compiled, dates, assignments, index)
+
+    outfile.write(_task_template.render(_category, _start_date, _end_date, _critical, _level, _summary,
+                                        _milestone, _name, _id, _total_slack, _desc, _assignments))
 
-    children = task.get(CHILDREN, None)
-    if children:
-        for child in children:
-            if isinstance(child, str):
-                continue
-            else:
-                _output_tasks_recursive(outfile, child, level+1)
 
+# Everything _output_task writes, other than the task's own content.
+def _task_row_values(compiled, dates, assignments, index):
+    schedule = compiled.schedule
+    return (compiled.ids[index], compiled.levels[index], compiled.milestones[index],
+            dates.early_start[index], dates.early_finish[index], schedule.critical[index], schedule.total_slack[index],
+            [assignments.names[resource] for resource in assignments.tasks[index]])
 
-def _output_tasks(outfile, plan):
+def _output_tasks(outfile, compiled, dates, assignments, cache):
     prefix = '''
       <Tasks>
 '''
@@ -77,28 +107,125 @@ def _output_tasks(outfile, plan):
       </Tasks>
 '''
     outfile.write(prefix.lstrip('\n'))
-    _output_tasks_recursive(outfile, plan, 1)
+    if cache:
+        for text in render_units_cached(cache, 'owb.tasks', compiled,
+                                        lambda index: _task_row_values(compiled, dates, assignments, index),
+                                        lambda unit_outfile, index: _output_task(unit_outfile, compiled, dates, assignments, index)):
+            outfile.write(text)
+    else:
+        for index in range(len(compiled.tasks)):
+            _output_task(outfile, compiled, dates, assignments, index)
     outfile.write(suffix.lstrip('\n'))
 
 
-# returns dict(leaf predecessor_id, True) to be used as a set
-#
 # OWB ignores dependencies on non-leaf tasks; therefore we must
-# recursively resolve the dependencies down to leaf nodes.
-def _get_leaf_predecessor_ids(id_to_task, predecessor_id, leaf_predecessor_ids):
-    def _recursive_resolve(id):
-        task = id_to_task[id]
-        if has_children(task):
-            for child in task[CHILDREN]:
-                if isinstance(child, str):
-                    continue
-                _recursive_resolve(child[ID])
+# resolve the dependencies down to leaf nodes, via the leaf closures.
+#
+# OWB also does not propagate the predecessors of a summary (its DEPS and
+# SEQUENCE predecessor) to its children, so the leaves must inherit them,
+# as the schedule does.
+#
+# Linking every leaf of a predecessor to every leaf of a successor says
+# more than needed: a leaf that already depends on another leaf of the
+# same summary comes after the first leaves of that summary, and a leaf
+# that another leaf of the same summary depends on comes before its last
+# leaves.  So a summary's predecessors go to its first leaves only, and a
+# summary stands for its last leaves only; the links left still order
+# every pair of leaves as the full cross product does.
+
+# Returns, per task, its nearest proper ancestor with predecessors, or -1.
+# Parents precede their children, so one pass in pre-order sets all of
+# them, and a leaf then walks only the ancestors that add a predecessor,
+# instead of all of them.
+def _dependency_ancestors(compiled, dependencies):
+    parents = compiled.parents
+    dependency_ancestors = [-1] * len(parents)
+    for index in range(1, len(parents)):
+        parent_index = parents[index]
+        if dependencies[parent_index]:
+            dependency_ancestors[index] = parent_index
         else:
-            leaf_predecessor_ids[id] = True
+            dependency_ancestors[index] = dependency_ancestors[parent_index]
+    return dependency_ancestors
+
+# Returns a function that returns the last leaves of a task: those that no
+# task of its subtree depends on, directly or through an ancestor of the
+# leaf below the task.  Results are kept, as many leaves share a
+# predecessor.
+def _last_leaves_getter(compiled):
+    successors = compiled.successors
+    subtree_ends = compiled.subtree_ends
+    successor_ancestors = _dependency_ancestors(compiled, successors)
+    last_leaves = {}
+
+    def _is_last(index, leaf_index):
+        end = subtree_ends[index]
+        ancestor_index = leaf_index if successors[leaf_index] else successor_ancestors[leaf_index]
+        while ancestor_index > index:
+            for successor_index in successors[ancestor_index]:
+                if index <= successor_index < end:
+                    return False
+            ancestor_index = successor_ancestors[ancestor_index]
+        return True
+
+    def _get_last_leaves(index):
+        if index not in last_leaves:
+            last_leaves[index] = [leaf_index for leaf_index in get_leaf_indices(compiled, index) if _is_last(index, leaf_index)]
+        return last_leaves[index]
+    return _get_last_leaves
+
+# Returns the leaf predecessors of the leaf at index, its own and those it
+# inherits.  Walking outwards, an ancestor's subtree holds the previous
+# ones, so once a leaf predecessor lies in it, it does in all the rest too,
+# and the walk stops.  A subtree is a range of the pre-order, so that test
+# only needs the nearest leaf predecessors before and after the leaf.
+def _get_owb_leaf_predecessor_indices(compiled, predecessor_ancestors, get_last_leaves, index):
+    subtree_ends = compiled.subtree_ends
+    leaf_predecessor_indices = {} # index:True
+    nearest_before = -1
+    nearest_after = len(subtree_ends)
+    predecessor_indices = compiled.predecessors[index]
+    ancestor_index = predecessor_ancestors[index]
+    while True:
+        for predecessor_index in predecessor_indices:
+            for leaf_predecessor_index in get_last_leaves(predecessor_index):
+                leaf_predecessor_indices[leaf_predecessor_index] = True
+                if nearest_before < leaf_predecessor_index < index:
+                    nearest_before = leaf_predecessor_index
+                elif index < leaf_predecessor_index < nearest_after:
+                    nearest_after = leaf_predecessor_index
+        if ancestor_index == -1 or nearest_before >= ancestor_index or nearest_after < subtree_ends[ancestor_index]:
+            return leaf_predecessor_indices
+        predecessor_indices = compiled.predecessors[ancestor_index]
+        ancestor_index = predecessor_ancestors[ancestor_index]
 
-    _recursive_resolve(predecessor_id)
+# Returns dict(successor leaf index, [predecessor leaf index])
+def _get_leaf_dependencies(compiled):
+    predecessor_ancestors = _dependency_ancestors(compiled, compiled.predecessors)
+    get_last_leaves = _last_leaves_getter(compiled)
+    leaf_dependencies = {}
+    for successor_index in compiled.leaf_order:
+        leaf_predecessor_indices = _get_owb_leaf_predecessor_indices(compiled, predecessor_ancestors, get_last_leaves, successor_index)
+        if leaf_predecessor_indices:
+            leaf_dependencies[successor_index] = list(leaf_predecessor_indices.keys())
+    return leaf_dependencies
 
-def _output_dependencies(outfile, id_to_task, deps):
+def _output_resources(outfile, assignments):
+    if not assignments.names:
+        return
+    outfile.write('      <Resources>\n')
+    outfile.write(_resource_template.render_rows((xml_escape_attr(name), capacity)
+                                                 for name, capacity in zip(assignments.names, assignments.capacities)))
+    outfile.write('      </Resources>\n')
+
+
+def _render_dependencies(successor_id, leaf_predecessor_ids):
+    return _dependency_template.render_rows((leaf_predecessor_id, successor_id) for leaf_predecessor_id in leaf_predecessor_ids)
+
+def _render_dependency_chunk(chunk):
+    return ''.join([_render_dependencies(successor_id, leaf_predecessor_ids) for successor_id, leaf_predecessor_ids in chunk])
+
+def _output_dependencies(outfile, compiled, leaf_dependencies, cache):
     prefix = '''
       <Dependencies>
 '''
@@ -106,20 +233,20 @@ def _output_dependencies(outfile, id_to_task, deps):
       </Dependencies>
 '''
     outfile.write(prefix.lstrip('\n'))
-    for successor_id,predecessor_ids in sorted(deps.items()):
-        if has_children(id_to_task[successor_id]):
-            continue
-        leaf_predecessor_ids = {} # id:True
-        for predecessor_id in predecessor_ids.keys():
-            _get_leaf_predecessor_ids(id_to_task, predecessor_id, leaf_predecessor_ids)
-        for leaf_predecessor_id in sorted(leaf_predecessor_ids.keys()):
-            outfile.write('''        <Dependency
-          predecessorID="{leaf_predecessor_id}" startFinishType="0" lag="0.0" lagType="0" successorID="{successor_id}"/>
-'''.format(**locals()))
+    ids = compiled.ids
+    # (successor ID, sorted leaf predecessor IDs), sorted by successor ID
+    rows = [(ids[successor_index], sorted(ids[index] for index in leaf_dependencies[successor_index]))
+            for successor_index in sorted(leaf_dependencies.keys(), key=lambda index: ids[index])]
+    if cache:
+        for text in render_chunks_cached(cache, 'owb.dependencies', rows, lambda row: row[0], _render_dependency_chunk):
+            outfile.write(text)
+    else:
+        for successor_id, leaf_predecessor_ids in rows:
+            outfile.write(_render_dependencies(successor_id, leaf_predecessor_ids))
     outfile.write(suffix.lstrip('\n'))
 
 
-def _output_main_file(outfile, plan):
+def _output_main_file(outfile, compiled, context):
     prefix = '''
 <?xml version="1.0"?>
 <WORKBENCH_PROJECT>
@@ -131,7 +258,7 @@ def _output_main_file(outfile, plan):
   <Projects>
     <Project
       UID="AJO44]`-U_```!/5&quot;LU&lt;!```?P```0" closed="false" active="true" approved="false"
-      start="2016-10-10T08:00:00" openForTimeEntry="true" format="0" trackMode="0" finish="2016-10-10T08:00:00"
+      start="{_project_start}" openForTimeEntry="true" format="0" trackMode="0" finish="{_project_start}"
       priority="10" finishImposed="false" cpmType="0" name="Project Plan" startImposed="false"
       program="false">
 '''
@@ -140,20 +267,44 @@ def _output_main_file(outfile, plan):
   </Projects>
 </WORKBENCH_PROJECT>'''
 
-    # key = ID string, value = task dict
-    id_to_task = {}
-    sanitize_tasks(plan, id_to_task, add_child_dependencies=True)
-    # key = successor, value = {predecessor:True}
-    deps = {}
-    _validate_tasks(id_to_task, deps)
+    start_date = context.start_date or _default_start_date
+    _project_start = start_date.strftime('%Y-%m-%dT08:00:00')
+    with profile_phase('dates'):
+        dates = format_schedule_dates(schedule_to_dates(compiled.schedule, context.calendar, start_date), _owb_date_format)
+    with profile_phase('leaf_dependencies'):
+        leaf_dependencies = _get_leaf_dependencies(compiled)
+    if context.reduce_dependencies:
+        with profile_phase('transitive_reduction'):
+            leaf_dependencies = transitive_reduction(leaf_dependencies)
+    profile_count('leaf_dependencies', sum(len(predecessor_indices) for predecessor_indices in leaf_dependencies.values()))
+    with profile_phase('resource_assignments'):
+        assignments = resource_assignments(compiled)
 
-    outfile.write(prefix.lstrip('\n'))
-    _output_tasks(outfile, plan)
-    _output_dependencies(outfile, id_to_task, deps)
-    outfile.write(suffix.lstrip('\n'))
+    with profile_phase('write'):
+        outfile.write(prefix.lstrip('\n').format(**locals()))
+        _output_resources(outfile, assignments)
+        _output_tasks(outfile, compiled, dates, assignments, context.cache)
+        _output_dependencies(outfile, compiled, leaf_dependencies, context.cache)
+        outfile.write(suffix.lstrip('\n'))
 
 
-def plan_to_owb_xml(filename, plan):
-    with open(filename, 'wt') as outfile:
-        _output_main_file(outfile, plan)
+# plan may be a plan dict, the result of compile_plan(plan), or the file name
+# of a plan image (see save_plan_image).
+# start_date defaults to 2016-10-10 (a monday).
+# calendar is a WorkCalendar; defaults to monday-friday without holidays.
+# reduce_dependencies drops dependencies that are implied by others.
+# summary_milestones routes summary dependencies through milestones (see compile_plan).
+# cache is an ExportCache that lets unchanged parts of the plan reuse earlier results.
+# selection, a Selection (see make_selection), exports only part of the plan.
+# strict raises DependencyCycleError on a dependency cycle instead of reporting it.
+# context, an ExportContext, replaces all of the above.
+def plan_to_owb_xml(filename, plan, start_date=None, calendar=None, reduce_dependencies=False, summary_milestones=False, cache=None,
+                    selection=None, strict=False, context=None):
+    if context is None:
+        context = make_export_context(start_date, calendar, reduce_dependencies=reduce_dependencies,
+                                      summary_milestones=summary_milestones, cache=cache, selection=selection, strict=strict)
 
+    with profile_export('plan_to_owb_xml', filename):
+        compiled = compile_for_context(plan, context)
+        with open(filename, 'wt') as outfile, ChunkedWriter(outfile) as writer:
+            _output_main_file(writer, compiled, context)
@@ -0,0 +1,45 @@
+# Outline numbers and WBS codes.
+#
+#   The outline number of a task is its position in the tree: '1' for the
+#   plan root, '1.2' for the root's second child, '1.2.1' for the first
+#   child of that one, and so on.  The WBS code is the same, except that a
+#   task may give its own with WBS, which the codes of the tasks below it
+#   then extend:
+#
+#       {NAME : 'Engineering', WBS : 'ENG', CHILDREN : [...]}
+#       # children: 'ENG.1', 'ENG.2', ...
+#
+#   Both take one pass over the pre-order indices, parents coming first.
+
+from .keywords import *
+
+_root_number = '1'
+
+
+# Returns the outline number of every task, as a list of strings.
+def outline_numbers(compiled):
+    return _numbers(compiled, None)
+
+# Returns the WBS code of every task, as a list of strings.
+def wbs_codes(compiled):
+    return _numbers(compiled, compiled.store.extras)
+
+# With extras, a WBS there replaces the number of its task.
+def _numbers(compiled, extras):
+    task_count = len(compiled.ids)
+    parents = compiled.parents
+    numbers = [None] * task_count
+    child_counts = [0] * task_count
+    for index in range(task_count):
+        parent_index = parents[index]
+        if parent_index == -1:
+            number = _root_number
+        else:
+            child_counts[parent_index] += 1
+            number = '{0}.{1}'.format(numbers[parent_index], child_counts[parent_index])
+        if extras:
+            task_extras = extras.get(index, None)
+            if task_extras and WBS in task_extras:
+                number = str(task_extras[WBS])
+        numbers[index] = number
+    return numbers
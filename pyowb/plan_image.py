@@ -0,0 +1,265 @@
+# Plan images: compiled plans saved to a binary file, for fast reloading.
+#
+#   save_plan_image(compile_plan(plan), 'team.pyowbc')
+#   compiled = load_plan_image('team.pyowbc')
+#
+#   A plan image holds every column of a CompiledPlan (see task_store.py),
+#   including the validated dependencies, integer IDs, leaf closures and
+#   the schedule, so loading one skips loading, sanitizing and compiling
+#   the plan.  The file is memory-mapped and the numeric columns of the
+#   loaded plan are read-only memoryviews into it: nothing is parsed or
+#   copied but the string tables.
+#
+#   Layout: a fixed header (magic, format version, length of the section
+#   table), the section table as JSON (name, typecode, offset and item
+#   count of every column, plus scalars), then the columns, each aligned
+#   to 8 bytes, in native byte order.  An image written by another
+#   version of pyowb, or on a machine of the other byte order, is
+#   rejected with PlanImageError; compile the plan again.
+#
+#   The other keys of tasks (TaskStore.extras, e.g. RESOURCE) are stored as
+#   JSON, so loading an image runs no code from it.  Their values must be
+#   what JSON can hold, as in plans loaded from JSON files; tuples come back
+#   as lists.  save_plan_image raises PlanImageError for any other value.
+
+import array
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from types import MappingProxyType
+from .keywords import *
+from .task_store import *
+from .schedule import *
+from .graph import *
+from .compiled_plan import *
+
+PLAN_IMAGE_SUFFIX = '.pyowbc'
+
+_plan_image_magic = b'PYOWBPC\0'
+# Bumped whenever the layout of plan images changes.
+_plan_image_version = 3
+# magic, version, length of the section table
+_plan_image_header = struct.Struct('<8sIQ')
+_plan_image_alignment = 8
+
+_schedule_columns = ('early_start', 'early_finish', 'late_start', 'late_finish', 'total_slack', 'critical')
+
+
+class PlanImageError(ValueError):
+    pass
+
+
+def _string_columns(strings):
+    offsets = index_array([0])
+    length = 0
+    for string in strings:
+        length += len(string)
+        offsets.append(length)
+    return (''.join(strings).encode('utf-8', 'surrogatepass'), offsets)
+
+def _read_strings(data, offsets):
+    text = str(data, 'utf-8', 'surrogatepass')
+    offsets = offsets.tolist()
+    return tuple(text[begin:end] for begin, end in zip(offsets, offsets[1:]))
+
+# TaskStore.extras as JSON: a list of [index, dict of the task's other keys].
+def _extras_json(compiled):
+    extras = compiled.store.extras
+    try:
+        return json.dumps([[index, extras[index]] for index in sorted(extras)]).encode('utf-8')
+    except (TypeError, ValueError):
+        for index in sorted(extras):
+            try:
+                json.dumps(extras[index])
+            except (TypeError, ValueError) as error:
+                task_id = compiled.ids[index]
+                raise PlanImageError('ID={task_id} : {error}; a plan image only holds JSON values'.format(**locals()))
+        raise
+
+def _read_extras(data):
+    return dict((index, task_extras) for index, task_extras in json.loads(str(data, 'utf-8')))
+
+# Returns [(name, column)]; every column supports the buffer protocol.
+def _image_columns(compiled):
+    store = compiled.store
+    schedule = compiled.schedule
+    strings, string_offsets = _string_columns(store.strings)
+    ids, id_offsets = _string_columns(compiled.ids)
+    columns = [
+        ('strings', strings),
+        ('string_offsets', string_offsets),
+        ('ids', ids),
+        ('id_offsets', id_offsets),
+        ('names', store.names),
+        ('categories', store.categories),
+        ('descs', store.descs),
+        ('efforts', store.efforts),
+        ('int_efforts', store.int_efforts),
+        ('summaries', store.summaries),
+        ('extras', _extras_json(compiled)),
+        ('parents', compiled.parents),
+        ('levels', compiled.levels),
+        ('subtree_ends', compiled.subtree_ends),
+        ('child_offsets', compiled.children.offsets),
+        ('child_values', compiled.children.values),
+        ('milestones', compiled.milestones),
+        ('intids', compiled.intids),
+        ('predecessor_offsets', compiled.predecessors.offsets),
+        ('predecessor_values', compiled.predecessors.values),
+        ('sequence_predecessors', compiled.sequence_predecessors),
+        ('successor_offsets', compiled.successors.offsets),
+        ('successor_values', compiled.successors.values),
+        ('leaf_order', compiled.leaf_order),
+        ('leaf_begins', compiled.leaf_ranges.first),
+        ('leaf_ends', compiled.leaf_ranges.second),
+    ]
+    columns.extend((name, getattr(schedule, name)) for name in _schedule_columns)
+    return columns
+
+def _padding(offset):
+    return -offset % _plan_image_alignment
+
+
+# Writes compiled to filename, atomically.
+#
+# cycles are the dependency cycles of compiled (see find_dependency_cycles),
+# reported again whenever the image is loaded; they are looked up if None.
+# source_key, if given, is any string identifying what compiled was built
+# from; load_plan_image can then reject an image of something else.
+def save_plan_image(compiled, filename, cycles=None, source_key=None):
+    if cycles is None:
+        cycles = find_dependency_cycles(compiled)
+    sections = []
+    data = []
+    offset = 0
+    for name, column in _image_columns(compiled):
+        view = memoryview(column)
+        sections.append((name, view.format, offset, len(view)))
+        view = view.cast('B')
+        data.append(view)
+        offset += len(view)
+        data.append(bytes(_padding(offset)))
+        offset += _padding(offset)
+    table = json.dumps({
+        'byteorder' : sys.byteorder,
+        'source_key' : source_key,
+        'sections' : sections,
+        'project_finish' : compiled.schedule.project_finish,
+        'cycles' : cycles,
+    }).encode('utf-8')
+    table += b' ' * _padding(_plan_image_header.size + len(table))
+
+    directory = os.path.dirname(os.path.abspath(filename))
+    descriptor, temp_filename = tempfile.mkstemp(prefix='.' + os.path.basename(filename), dir=directory)
+    try:
+        with os.fdopen(descriptor, 'wb') as outfile:
+            outfile.write(_plan_image_header.pack(_plan_image_magic, _plan_image_version, len(table)))
+            outfile.write(table)
+            for part in data:
+                outfile.write(part)
+        os.replace(temp_filename, filename)
+    finally:
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
+
+
+def _read_image(filename, mapped):
+    with open(filename, 'rb') as infile:
+        if not mapped:
+            return memoryview(infile.read())
+        try:
+            return memoryview(mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ))
+        except ValueError:
+            # an empty file cannot be mapped
+            return memoryview(b'')
+
+def _read_table(data, filename):
+    if len(data) < _plan_image_header.size:
+        raise PlanImageError('{0}: not a plan image'.format(filename))
+    magic, version, table_size = _plan_image_header.unpack_from(data)
+    if magic != _plan_image_magic:
+        raise PlanImageError('{0}: not a plan image'.format(filename))
+    if version != _plan_image_version:
+        raise PlanImageError('{0}: plan image version {1}, expected {2}'.format(filename, version, _plan_image_version))
+    table = json.loads(str(data[_plan_image_header.size:_plan_image_header.size + table_size], 'utf-8'))
+    if table['byteorder'] != sys.byteorder:
+        raise PlanImageError('{0}: plan image written on a {1}-endian machine'.format(filename, table['byteorder']))
+    return (table, _plan_image_header.size + table_size)
+
+# Returns the source_key that filename was saved with.
+def read_plan_image_source_key(filename):
+    return _read_table(_read_image(filename, True), filename)[0]['source_key']
+
+# Loads a CompiledPlan saved by save_plan_image.  Dependency cycles are
+# reported as by compile_plan (with strict=True, DependencyCycleError).
+#
+# With source_key, an image saved with another source_key raises
+# PlanImageError.  With mapped=False the file is read into memory instead
+# of being mapped, so that it may be replaced or removed while the plan is
+# in use on any platform.
+def load_plan_image(filename, strict=False, source_key=None, mapped=True):
+    data = _read_image(filename, mapped)
+    table, data_offset = _read_table(data, filename)
+    if source_key is not None and table['source_key'] != source_key:
+        raise PlanImageError('{0}: plan image of another source'.format(filename))
+    columns = {}
+    for name, typecode, offset, count in table['sections']:
+        begin = data_offset + offset
+        end = begin + count * array.array(typecode).itemsize
+        if end > len(data):
+            raise PlanImageError('{0}: plan image is truncated'.format(filename))
+        columns[name] = data[begin:end].cast(typecode)
+
+    store = TaskStore(
+        strings=_read_strings(columns['strings'], columns['string_offsets']),
+        names=columns['names'],
+        categories=columns['categories'],
+        descs=columns['descs'],
+        efforts=columns['efforts'],
+        int_efforts=columns['int_efforts'],
+        summaries=columns['summaries'],
+        extras=_read_extras(columns['extras']),
+    )
+    ids = _read_strings(columns['ids'], columns['id_offsets'])
+    children = Csr(columns['child_offsets'], columns['child_values'])
+    schedule = Schedule(project_finish=table['project_finish'],
+                        **dict((name, columns[name]) for name in _schedule_columns))
+    compiled = CompiledPlan(
+        tasks=TaskRows(store, ids, children),
+        store=store,
+        ids=ids,
+        parents=columns['parents'],
+        levels=columns['levels'],
+        subtree_ends=columns['subtree_ends'],
+        children=children,
+        milestones=columns['milestones'],
+        intids=columns['intids'],
+        # the last task wins if an ID is repeated, as in compile_plan
+        id_to_index=MappingProxyType(dict(zip(ids, range(len(ids))))),
+        predecessors=Csr(columns['predecessor_offsets'], columns['predecessor_values']),
+        sequence_predecessors=columns['sequence_predecessors'],
+        successors=Csr(columns['successor_offsets'], columns['successor_values']),
+        leaf_order=columns['leaf_order'],
+        leaf_ranges=PairColumns(columns['leaf_begins'], columns['leaf_ends']),
+        schedule=schedule,
+    )
+    report_dependency_cycles(compiled, table['cycles'], strict)
+    return compiled
+
+
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError('numpy_columns needs numpy (pip install numpy)')
+    return numpy
+
+# Returns a dict of column name: numpy array for every numeric column of
+# compiled (as named in a plan image), without copying them.
+def numpy_columns(compiled):
+    numpy = _import_numpy()
+    return dict((name, numpy.asarray(column)) for name, column in _image_columns(compiled)
+                if not isinstance(column, bytes))
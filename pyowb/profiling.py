@@ -0,0 +1,152 @@
+# Export profiling.
+#
+#   Inside a profile_exports() block, every plan_to_* call produces a report
+#   (a plain dict) with the wall time of each phase, task and dependency
+#   counts, the size of the written file and, optionally, peak memory as
+#   measured by tracemalloc:
+#
+#       with profile_exports(trace_memory=True, log=True) as reports:
+#           plan_to_owb_xml('plan.xml', plan)
+#       reports[0]['phases']    # [{'phase': 'compile_plan/flatten', 'seconds': ...}, ...]
+#
+#   Outside such a block the hooks below cost one context variable lookup.
+
+import contextlib
+import contextvars
+import logging
+import os
+import time
+import tracemalloc
+
+_logger = logging.getLogger('pyowb.profile')
+
+# the active _Profiler, or None
+_active_profiler = contextvars.ContextVar('pyowb_profiler', default=None)
+
+
+class _Profiler:
+    def __init__(self, trace_memory, log, callback):
+        self.trace_memory = trace_memory
+        self.log = log
+        self.callback = callback
+        self.reports = []
+        # report of the plan_to_* call in progress, and its open phases
+        self.report = None
+        self.open_phases = []
+
+
+# tracemalloc has a single peak, which is reset whenever a phase starts;
+# the peak so far is first folded into the report and every open phase.
+def _fold_peak_memory(profiler):
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    for record in [profiler.report] + profiler.open_phases:
+        record['peak_memory'] = max(record['peak_memory'] or 0, peak_memory)
+
+def _format_report(report):
+    lines = ['{0} {1}: {2:.3f}s'.format(report['export'], report['filename'], report['seconds'])]
+    for phase in report['phases']:
+        lines.append('    {0:<40} {1:10.3f}s'.format(phase['phase'], phase['seconds']))
+    for name in sorted(report['counts'].keys()):
+        lines.append('    {0:<40} {1:>11}'.format(name, report['counts'][name]))
+    if report['bytes_written'] is not None:
+        lines.append('    {0:<40} {1:>11}'.format('bytes_written', report['bytes_written']))
+    if report['peak_memory'] is not None:
+        lines.append('    {0:<40} {1:>11}'.format('peak_memory', report['peak_memory']))
+    return '\n'.join(lines)
+
+
+# Collects a report for every plan_to_* call made inside the block; yields
+# the list of reports.
+#
+# trace_memory records peak memory per export and per phase, via tracemalloc
+#   (which slows python down noticeably while it is tracing).
+# log writes every report to the 'pyowb.profile' logger, at INFO level.
+# callback, if given, is called with each report as soon as it is complete.
+@contextlib.contextmanager
+def profile_exports(trace_memory=False, log=False, callback=None):
+    profiler = _Profiler(trace_memory, log, callback)
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    token = _active_profiler.set(profiler)
+    try:
+        yield profiler.reports
+    finally:
+        _active_profiler.reset(token)
+        if started_tracing:
+            tracemalloc.stop()
+
+
+# Wraps one plan_to_* call.  Nested calls (e.g. a writer called by another
+# writer) are folded into the outer report.
+@contextlib.contextmanager
+def profile_export(export_name, filename):
+    profiler = _active_profiler.get()
+    if profiler is None or profiler.report is not None:
+        yield
+        return
+
+    report = {
+        'export' : export_name,
+        'filename' : filename,
+        'seconds' : 0.0,
+        'phases' : [],
+        'counts' : {},
+        'bytes_written' : None,
+        'peak_memory' : None,
+    }
+    profiler.report = report
+    if profiler.trace_memory:
+        tracemalloc.reset_peak()
+    begin = time.perf_counter()
+    try:
+        yield
+    finally:
+        report['seconds'] = time.perf_counter() - begin
+        if profiler.trace_memory:
+            _fold_peak_memory(profiler)
+        profiler.report = None
+        profiler.open_phases = []
+    if filename and os.path.exists(filename):
+        report['bytes_written'] = os.path.getsize(filename)
+    profiler.reports.append(report)
+    if profiler.log:
+        _logger.info('%s', _format_report(report))
+    if profiler.callback:
+        profiler.callback(report)
+
+
+# Times the enclosed block as one phase of the current export.  Phases may
+# nest; a nested phase is reported as 'outer/inner', and the outer phase's
+# time includes it.
+@contextlib.contextmanager
+def profile_phase(name):
+    profiler = _active_profiler.get()
+    if profiler is None or profiler.report is None:
+        yield
+        return
+
+    names = [open_phase['phase'] for open_phase in profiler.open_phases[-1:]] + [name]
+    phase = {'phase' : '/'.join(names), 'seconds' : 0.0}
+    if profiler.trace_memory:
+        phase['peak_memory'] = None
+        _fold_peak_memory(profiler)
+        tracemalloc.reset_peak()
+    profiler.report['phases'].append(phase)
+    profiler.open_phases.append(phase)
+    begin = time.perf_counter()
+    try:
+        yield
+    finally:
+        phase['seconds'] = time.perf_counter() - begin
+        if profiler.trace_memory:
+            _fold_peak_memory(profiler)
+        profiler.open_phases.pop()
+
+
+# Records a count (tasks, dependencies, ...) for the current export.
+def profile_count(name, value):
+    profiler = _active_profiler.get()
+    if profiler is None or profiler.report is None:
+        return
+    profiler.report['counts'][name] = value
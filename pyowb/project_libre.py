@@ -1,4 +1,4 @@
-# Python plan -> Open Workbench XML converter.
+# Python plan -> ProjectLibre (MSPDI, Microsoft Project XML) converter.
 #
 #   Python plan defines a Work Breakdown Structure where
 #   tasks are dictionaries and children are defined in a list.
@@ -7,37 +7,24 @@
 
 import sys
 import math
-from datetime import datetime, timedelta
+from collections import namedtuple
+from datetime import date, datetime, timedelta
 from .keywords import *
 from .tasks import *
+from .compiled_plan import *
+from .work_calendar import *
+from .templates import *
+from .profiling import *
+from .export_cache import *
+from .export_context import *
+from .task_store import *
+from .resources import *
+from .rollup import *
+from .outline import *
 
-# Start date is a monday.  End-date calculation needs to add 2 days per 5 (for weekends);
-# starting on a monday simplifies calculation of the extra.
-_global_start_date = datetime(year=2016, month=10, day=10)
-
-def _insert_dependency(deps, successor, predecessor):
-    if successor not in deps:
-        deps[successor] = {}
-    deps[successor][predecessor] = True
-
-def _validate_tasks(id_to_task, deps):
-    for task in id_to_task.values():
-        for predecessor_id in task[DEPS]:
-            if predecessor_id not in id_to_task:
-                sys.stderr.write('WARNING: ID={task[ID]} NAME={task[NAME]} : unknown dependency "{predecessor_id}"\n'.format(**locals()))
-            _insert_dependency(deps, task[ID], predecessor_id)
-
-# Returns id_to_intid: dict(task_id, int_id)
-def _generate_integer_ids(id_to_task):
-    intid = 0
-    id_to_intid = {}
-    for task_id in sorted(id_to_task.keys()):
-        id_to_intid[task_id] = intid
-        intid += 1
-    return id_to_intid
-
-def _date_as_lp_string(date):
-    return date.strftime('%Y-%m-%dT%H:%M:%S')
+_lp_date_format = '%Y-%m-%dT%H:%M:%S'
+
+_OutlineNumbers = namedtuple('_OutlineNumbers', ['outline_numbers', 'wbs_codes'])
 
 def _effort_as_lp_string(effort_in_days):
     hours = int(effort_in_days * 8)
@@ -45,43 +32,72 @@ def _effort_as_lp_string(effort_in_days):
     seconds = 0
     return 'PT{hours}H{minutes}M{seconds}S'.format(**locals())
 
-# returns dict(leaf predecessor_id, True) to be used as a set
+
+_working_day_template = block_template('''
+                <WeekDay>
+                    <DayType>{_day_type}</DayType>
+                    <DayWorking>1</DayWorking>
+                    <WorkingTimes>
+                        <WorkingTime>
+                            <FromTime>08:00:00</FromTime>
+                            <ToTime>12:00:00</ToTime>
+                        </WorkingTime>
+                        <WorkingTime>
+                            <FromTime>13:00:00</FromTime>
+                            <ToTime>17:00:00</ToTime>
+                        </WorkingTime>
+                    </WorkingTimes>
+                </WeekDay>
+''')
+
+_non_working_day_template = block_template('''
+                <WeekDay>
+                    <DayType>{_day_type}</DayType>
+                    <DayWorking>0</DayWorking>
+                </WeekDay>
+''')
+
+# a holiday is an exception (DayType 0) over one day
+_holiday_template = block_template('''
+                <WeekDay>
+                    <DayType>0</DayType>
+                    <DayWorking>0</DayWorking>
+                    <TimePeriod>
+                        <FromDate>{_holiday}T00:00:00</FromDate>
+                        <ToDate>{_holiday}T23:59:00</ToDate>
+                    </TimePeriod>
+                </WeekDay>
+''')
+
+# The WeekDays of the Standard calendar: the working weekdays and holidays
+# of calendar, so that the file agrees with the dates computed with it.
+def _week_days_as_lp_xml(calendar):
+    week_days_xml = ''
+    # LP numbers the days from 1 = sunday; weekmask starts on monday
+    for day_type, day in enumerate([6, 0, 1, 2, 3, 4, 5], 1):
+        template = _working_day_template if calendar.weekmask[day] else _non_working_day_template
+        week_days_xml += template.render(day_type)
+    for ordinal in sorted(calendar.holidays):
+        week_days_xml += _holiday_template.render(date.fromordinal(ordinal).isoformat())
+    return week_days_xml
+
+# Returns dict(task index, [predecessor leaf index])
 #
 # LP ignores dependencies on non-leaf tasks; therefore we must
-# recursively resolve the dependencies down to leaf nodes.
-def _get_leaf_predecessor_ids(id_to_task, predecessor_id, leaf_predecessor_ids):
-    def _recursive_resolve(id):
-        task = id_to_task[id]
-        if has_children(task):
-            for child in task[CHILDREN]:
-                if isinstance(child, str):
-                    continue
-                _recursive_resolve(child[ID])
-        else:
-            leaf_predecessor_ids[id] = True
-
-    _recursive_resolve(predecessor_id)
-
-
-def _output_tasks_recursive(outfile, deps, id_to_task, id_to_intid, task, level):
-    effort_in_days = task.get(EFFORT, 0)
-
-    _category = parse_category(task[NAME])
-    _name = xml_escape_elem(task[NAME])
-    _id = xml_escape_elem(task[ID])
-    _intid = id_to_intid[task[ID]]
-    if DESC in task:
-        _desc = '            <Notes>{0}</Notes>\n'.format(xml_escape_elem(task.get(DESC, ' ')))
-    else:
-        _desc = ''
-    _level = level
-    _summary = 1 if has_children(task) else 0
-    _start_date = _date_as_lp_string(_global_start_date)
-    _end_date = _date_as_lp_string(_global_start_date + timedelta(days=effort_in_days))
-    _duration = _effort_as_lp_string(effort_in_days)
-    _estimated = EFFORT in task
-
-    task_xml_prefix = '''
+# resolve the dependencies down to leaf nodes.
+def _get_leaf_dependencies(compiled):
+    leaf_dependencies = {}
+    for index in range(len(compiled.tasks)):
+        leaf_predecessor_indices = {} # index:True
+        for predecessor_index in compiled.predecessors[index]:
+            for leaf_predecessor_index in get_leaf_indices(compiled, predecessor_index):
+                leaf_predecessor_indices[leaf_predecessor_index] = True
+        if leaf_predecessor_indices:
+            leaf_dependencies[index] = list(leaf_predecessor_indices.keys())
+    return leaf_dependencies
+
+
+_task_prefix_template = block_template('''
         <Task>
             <UID>{_intid}</UID>
             <ID>{_id}</ID>
@@ -89,25 +105,31 @@ def _output_tasks_recursive(outfile, deps, id_to_task, id_to_intid, task, level)
             <Type>0</Type>
             <IsNull>0</IsNull>
             <CreateDate>2017-01-22T21:35:00</CreateDate>
-            <WBS></WBS>
-            <OutlineNumber>1</OutlineNumber>
+            <WBS>{_wbs}</WBS>
+            <OutlineNumber>{_outline_number}</OutlineNumber>
             <OutlineLevel>{_level}</OutlineLevel>
             <Priority>500</Priority>
             <Start>{_start_date}</Start>
-            <!--Finish>{_end_date}</Finish-->
+            <Finish>{_end_date}</Finish>
             <Duration>{_duration}</Duration>
             <DurationFormat>39</DurationFormat>
+            <Work>{_work}</Work>
             <ResumeValid>0</ResumeValid>
             <EffortDriven>1</EffortDriven>
             <Recurring>0</Recurring>
             <OverAllocated>0</OverAllocated>
             <Estimated>{_estimated}</Estimated>
-            <Milestone>0</Milestone>
+            <Milestone>{_milestone}</Milestone>
             <Summary>{_summary}</Summary>
-            <Critical>0</Critical>
+            <Critical>{_critical}</Critical>
             <IsSubproject>0</IsSubproject>
             <IsSubprojectReadOnly>0</IsSubprojectReadOnly>
             <ExternalTask>0</ExternalTask>
+            <EarlyStart>{_start_date}</EarlyStart>
+            <EarlyFinish>{_end_date}</EarlyFinish>
+            <LateStart>{_late_start_date}</LateStart>
+            <LateFinish>{_late_end_date}</LateFinish>
+            <TotalSlack>{_total_slack}</TotalSlack>
             <FixedCostAccrual>2</FixedCostAccrual>
             <RemainingDuration>{_duration}</RemainingDuration>
             <ConstraintType>0</ConstraintType>
@@ -121,41 +143,75 @@ def _output_tasks_recursive(outfile, deps, id_to_task, id_to_intid, task, level)
             <HideBar>0</HideBar>
             <Rollup>0</Rollup>
             <EarnedValueMethod>0</EarnedValueMethod>
-'''
-    task_xml_suffix = '''
+''')
+
+_task_suffix = '''
             <Active>1</Active>
             <Manual>0</Manual>
         </Task>
-'''
-    predecessor_xml = '''
+'''.lstrip('\n')
+
+_predecessor_template = block_template('''
             <PredecessorLink>
                 <PredecessorUID>{_predecessor_intid}</PredecessorUID>
                 <Type>1</Type>
                 <CrossProject>0</CrossProject>
             </PredecessorLink>
-'''
+''')
 
-    predecessor_ids = deps.get(task[ID], {})
-    leaf_predecessor_ids = {} # id:True
-    for predecessor_id in predecessor_ids.keys():
-        _get_leaf_predecessor_ids(id_to_task, predecessor_id, leaf_predecessor_ids)    
 
-    outfile.write(task_xml_prefix.lstrip('\n').format(**locals()))
-    for leaf_predecessor_id in sorted(leaf_predecessor_ids.keys()):
-        _predecessor_intid = id_to_intid[leaf_predecessor_id]
-        outfile.write(predecessor_xml.lstrip('\n').format(**locals()))
-    outfile.write(task_xml_suffix.lstrip('\n'))
+def _output_task(outfile, compiled, dates, rollup, numbers, leaf_dependencies, index):
+    store = compiled.store
+    schedule = compiled.schedule
+
+    _category = get_category(store, index)
+    _name = xml_escape_elem(get_name(store, index))
+    _id = xml_escape_elem(compiled.ids[index])
+    _intid = compiled.intids[index]
+    if store.descs[index] != NO_STRING:
+        _desc = '            <Notes>{0}</Notes>\n'.format(xml_escape_elem(get_desc(store, index)))
+    else:
+        _desc = ''
+    _wbs = xml_escape_elem(numbers.wbs_codes[index])
+    _outline_number = numbers.outline_numbers[index]
+    _level = compiled.levels[index] + 1
+    _summary = 1 if store.summaries[index] else 0
+    _milestone = 1 if compiled.milestones[index] else 0
+    _start_date = dates.early_start[index]
+    _end_date = dates.early_finish[index]
+    _late_start_date = dates.late_start[index]
+    _late_end_date = dates.late_finish[index]
+    # tenths of a minute, on an 8-hour day
+    _total_slack = int(round(schedule.total_slack[index] * 8 * 60 * 10))
+    _critical = 1 if schedule.critical[index] else 0
+    # a summary lasts from its first leaf's start to its last leaf's finish,
+    # and its work is that of all of its leaves
+    if store.summaries[index]:
+        _duration = _effort_as_lp_string(rollup.finishes[index] - rollup.starts[index])
+    else:
+        _duration = _effort_as_lp_string(get_effort(store, index))
+    _work = _effort_as_lp_string(rollup.efforts[index])
+    _estimated = has_effort(store, index)
+
+    outfile.write(_task_prefix_template.render(_intid, _id, _name, _wbs, _outline_number, _level, _start_date, _end_date, _duration, _work, _estimated,
+                                               _milestone, _summary, _critical, _late_start_date, _late_end_date,
+                                               _total_slack, _desc))
+    leaf_predecessor_indices = sorted(leaf_dependencies.get(index, ()), key=lambda i: compiled.ids[i])
+    outfile.write(_predecessor_template.render_rows((compiled.intids[i],) for i in leaf_predecessor_indices))
+    outfile.write(_task_suffix)
 
-    children = task.get(CHILDREN, None)
-    if children:
-        for child in children:
-            if isinstance(child, str):
-                continue
-            else:
-                _output_tasks_recursive(outfile, deps, id_to_task, id_to_intid, child, level+1)
 
+# Everything _output_task writes, other than the task's own content.
+def _task_row_values(compiled, dates, rollup, numbers, leaf_dependencies, index):
+    schedule = compiled.schedule
+    leaf_predecessor_indices = sorted(leaf_dependencies.get(index, ()), key=lambda i: compiled.ids[i])
+    return (compiled.intids[index], compiled.ids[index], compiled.levels[index], compiled.milestones[index],
+            dates.early_start[index], dates.early_finish[index], dates.late_start[index], dates.late_finish[index],
+            schedule.critical[index], schedule.total_slack[index], [compiled.intids[i] for i in leaf_predecessor_indices],
+            rollup.starts[index], rollup.finishes[index], rollup.efforts[index],
+            numbers.outline_numbers[index], numbers.wbs_codes[index])
 
-def _output_tasks(outfile, deps, id_to_task, id_to_intid, plan):
+def _output_tasks(outfile, compiled, dates, rollup, numbers, leaf_dependencies, cache):
     prefix = '''
       <Tasks>
 '''
@@ -163,11 +219,96 @@ def _output_tasks(outfile, deps, id_to_task, id_to_intid, plan):
       </Tasks>
 '''
     outfile.write(prefix.lstrip('\n'))
-    _output_tasks_recursive(outfile, deps, id_to_task, id_to_intid, plan, 1)
+    if cache:
+        for text in render_units_cached(cache, 'project_libre.tasks', compiled,
+                                        lambda index: _task_row_values(compiled, dates, rollup, numbers, leaf_dependencies, index),
+                                        lambda unit_outfile, index: _output_task(unit_outfile, compiled, dates, rollup, numbers, leaf_dependencies, index)):
+            outfile.write(text)
+    else:
+        for index in range(len(compiled.tasks)):
+            _output_task(outfile, compiled, dates, rollup, numbers, leaf_dependencies, index)
     outfile.write(suffix.lstrip('\n'))
 
 
-def _output_main_file(outfile, plan):
+# UID 0 is the "Unassigned" resource; the plan's resources follow from 1.
+_unassigned_resource = '''
+        <Resource>
+            <UID>0</UID>
+            <ID>0</ID>
+            <Name>Unassigned</Name>
+            <Type>1</Type>
+            <IsNull>0</IsNull>
+            <Initials>U</Initials>
+            <Group></Group>
+            <EmailAddress></EmailAddress>
+            <MaxUnits>1</MaxUnits>
+            <PeakUnits>1</PeakUnits>
+            <OverAllocated>0</OverAllocated>
+            <Start>2017-01-23T08:00:00</Start>
+            <Finish>2017-02-08T17:00:00</Finish>
+            <CanLevel>0</CanLevel>
+            <AccrueAt>3</AccrueAt>
+            <StandardRateFormat>3</StandardRateFormat>
+            <OvertimeRateFormat>3</OvertimeRateFormat>
+            <IsGeneric>0</IsGeneric>
+            <IsInactive>0</IsInactive>
+            <IsEnterprise>0</IsEnterprise>
+            <IsBudget>0</IsBudget>
+            <AvailabilityPeriods/>
+        </Resource>
+'''.lstrip('\n')
+
+_resource_template = block_template('''
+        <Resource>
+            <UID>{_uid}</UID>
+            <ID>{_uid}</ID>
+            <Name>{_name}</Name>
+            <Type>1</Type>
+            <IsNull>0</IsNull>
+            <MaxUnits>{_capacity}</MaxUnits>
+            <PeakUnits>{_capacity}</PeakUnits>
+            <OverAllocated>0</OverAllocated>
+            <CanLevel>1</CanLevel>
+            <AccrueAt>3</AccrueAt>
+            <IsGeneric>0</IsGeneric>
+            <IsInactive>0</IsInactive>
+            <IsEnterprise>0</IsEnterprise>
+            <IsBudget>0</IsBudget>
+            <AvailabilityPeriods/>
+        </Resource>
+''')
+
+_assignment_template = block_template('''
+        <Assignment>
+            <UID>{_uid}</UID>
+            <TaskUID>{_task_uid}</TaskUID>
+            <ResourceUID>{_resource_uid}</ResourceUID>
+            <Units>1</Units>
+            <Work>{_work}</Work>
+            <Start>{_start_date}</Start>
+            <Finish>{_end_date}</Finish>
+        </Assignment>
+''')
+
+# Resources, and one assignment per resource of every leaf, on the leaf's
+# (leveled) dates.
+def _output_resources(outfile, compiled, dates, assignments):
+    outfile.write('    <Resources>\n')
+    outfile.write(_unassigned_resource)
+    outfile.write(_resource_template.render_rows((resource + 1, xml_escape_elem(name), capacity)
+                                                 for resource, (name, capacity) in enumerate(zip(assignments.names, assignments.capacities))))
+    outfile.write('    </Resources>\n')
+    outfile.write('    <Assignments>\n')
+    rows = []
+    for index in compiled.leaf_order:
+        work = _effort_as_lp_string(get_effort(compiled.store, index))
+        for resource in assignments.tasks[index]:
+            rows.append((len(rows) + 1, compiled.intids[index], resource + 1, work, dates.early_start[index], dates.early_finish[index]))
+    outfile.write(_assignment_template.render_rows(rows))
+    outfile.write('    </Assignments>\n')
+
+
+def _output_main_file(outfile, compiled, context):
     prefix = '''
 <?xml version="1.0" encoding="UTF-8" standalone="yes"?>
 <Project xmlns="http://schemas.microsoft.com/project">
@@ -230,85 +371,7 @@ def _output_main_file(outfile, plan):
             <Name>Standard</Name>
             <IsBaseCalendar>1</IsBaseCalendar>
             <WeekDays>
-                <WeekDay>
-                    <DayType>1</DayType>
-                    <DayWorking>0</DayWorking>
-                </WeekDay>
-                <WeekDay>
-                    <DayType>2</DayType>
-                    <DayWorking>1</DayWorking>
-                    <WorkingTimes>
-                        <WorkingTime>
-                            <FromTime>08:00:00</FromTime>
-                            <ToTime>12:00:00</ToTime>
-                        </WorkingTime>
-                        <WorkingTime>
-                            <FromTime>13:00:00</FromTime>
-                            <ToTime>17:00:00</ToTime>
-                        </WorkingTime>
-                    </WorkingTimes>
-                </WeekDay>
-                <WeekDay>
-                    <DayType>3</DayType>
-                    <DayWorking>1</DayWorking>
-                    <WorkingTimes>
-                        <WorkingTime>
-                            <FromTime>08:00:00</FromTime>
-                            <ToTime>12:00:00</ToTime>
-                        </WorkingTime>
-                        <WorkingTime>
-                            <FromTime>13:00:00</FromTime>
-                            <ToTime>17:00:00</ToTime>
-                        </WorkingTime>
-                    </WorkingTimes>
-                </WeekDay>
-                <WeekDay>
-                    <DayType>4</DayType>
-                    <DayWorking>1</DayWorking>
-                    <WorkingTimes>
-                        <WorkingTime>
-                            <FromTime>08:00:00</FromTime>
-                            <ToTime>12:00:00</ToTime>
-                        </WorkingTime>
-                        <WorkingTime>
-                            <FromTime>13:00:00</FromTime>
-                            <ToTime>17:00:00</ToTime>
-                        </WorkingTime>
-                    </WorkingTimes>
-                </WeekDay>
-                <WeekDay>
-                    <DayType>5</DayType>
-                    <DayWorking>1</DayWorking>
-                    <WorkingTimes>
-                        <WorkingTime>
-                            <FromTime>08:00:00</FromTime>
-                            <ToTime>12:00:00</ToTime>
-                        </WorkingTime>
-                        <WorkingTime>
-                            <FromTime>13:00:00</FromTime>
-                            <ToTime>17:00:00</ToTime>
-                        </WorkingTime>
-                    </WorkingTimes>
-                </WeekDay>
-                <WeekDay>
-                    <DayType>6</DayType>
-                    <DayWorking>1</DayWorking>
-                    <WorkingTimes>
-                        <WorkingTime>
-                            <FromTime>08:00:00</FromTime>
-                            <ToTime>12:00:00</ToTime>
-                        </WorkingTime>
-                        <WorkingTime>
-                            <FromTime>13:00:00</FromTime>
-                            <ToTime>17:00:00</ToTime>
-                        </WorkingTime>
-                    </WorkingTimes>
-                </WeekDay>
-                <WeekDay>
-                    <DayType>7</DayType>
-                    <DayWorking>0</DayWorking>
-                </WeekDay>
-            </WeekDays>
+{_week_days}            </WeekDays>
         </Calendar>
         <Calendar>
             <UID>2</UID>
@@ -497,58 +560,51 @@ def _output_main_file(outfile, plan):
     </Calendars>
 '''
     suffix = '''
-    <Resources>
-        <Resource>
-            <UID>0</UID>
-            <ID>0</ID>
-            <Name>Unassigned</Name>
-            <Type>1</Type>
-            <IsNull>0</IsNull>
-            <Initials>U</Initials>
-            <Group></Group>
-            <EmailAddress></EmailAddress>
-            <MaxUnits>1</MaxUnits>
-            <PeakUnits>1</PeakUnits>
-            <OverAllocated>0</OverAllocated>
-            <Start>2017-01-23T08:00:00</Start>
-            <Finish>2017-02-08T17:00:00</Finish>
-            <CanLevel>0</CanLevel>
-            <AccrueAt>3</AccrueAt>
-            <StandardRateFormat>3</StandardRateFormat>
-            <OvertimeRateFormat>3</OvertimeRateFormat>
-            <IsGeneric>0</IsGeneric>
-            <IsInactive>0</IsInactive>
-            <IsEnterprise>0</IsEnterprise>
-            <IsBudget>0</IsBudget>
-            <AvailabilityPeriods/>
-        </Resource>
-    </Resources>
-    <Assignments>
-    </Assignments>
 </Project>
 '''
 
-    # key = ID string, value = task dict
-    id_to_task = {}
-    sanitize_tasks(plan, id_to_task, add_child_dependencies=False)
-    # key = successor, value = {predecessor:True}
-    deps = {}
-    _validate_tasks(id_to_task, deps)
-    # key = task_id, value = intid
-    id_to_intid = _generate_integer_ids(id_to_task)
+    start_date = context.start_date or datetime.now()
+    with profile_phase('dates'):
+        dates = format_schedule_dates(schedule_to_dates(compiled.schedule, context.calendar, start_date), _lp_date_format)
+    with profile_phase('leaf_dependencies'):
+        leaf_dependencies = _get_leaf_dependencies(compiled)
+    if context.reduce_dependencies:
+        with profile_phase('transitive_reduction'):
+            leaf_dependencies = transitive_reduction(leaf_dependencies)
+    profile_count('leaf_dependencies', sum(len(predecessor_indices) for predecessor_indices in leaf_dependencies.values()))
+    with profile_phase('resource_assignments'):
+        assignments = resource_assignments(compiled)
+    with profile_phase('rollup'):
+        rollup = compute_rollup(compiled)
+    with profile_phase('outline_numbers'):
+        numbers = _OutlineNumbers(outline_numbers(compiled), wbs_codes(compiled))
 
-    outfile.write(prefix.lstrip('\n'))
-    _output_tasks(outfile, deps, id_to_task, id_to_intid, plan)
-    outfile.write(suffix.lstrip('\n'))
+    _week_days = _week_days_as_lp_xml(context.calendar)
 
+    with profile_phase('write'):
+        outfile.write(prefix.lstrip('\n').format(**locals()))
+        _output_tasks(outfile, compiled, dates, rollup, numbers, leaf_dependencies, context.cache)
+        _output_resources(outfile, compiled, dates, assignments)
+        outfile.write(suffix.lstrip('\n'))
 
-def plan_to_project_libre_xml(filename, plan, start_date=None):
-    global _global_start_date
-    if start_date:
-        _global_start_date = start_date
-    else:
-        _global_start_date = datetime.now()
 
-    with open(filename, 'wt') as outfile:
-        _output_main_file(outfile, plan)
+# plan may be a plan dict, the result of compile_plan(plan), or the file name
+# of a plan image (see save_plan_image).
+# start_date defaults to now.
+# calendar is a WorkCalendar; defaults to monday-friday without holidays.
+# reduce_dependencies drops dependencies that are implied by others.
+# summary_milestones routes summary dependencies through milestones (see compile_plan).
+# cache is an ExportCache that lets unchanged parts of the plan reuse earlier results.
+# selection, a Selection (see make_selection), exports only part of the plan.
+# strict raises DependencyCycleError on a dependency cycle instead of reporting it.
+# context, an ExportContext, replaces all of the above.
+def plan_to_project_libre_xml(filename, plan, start_date=None, calendar=None, reduce_dependencies=False, summary_milestones=False, cache=None,
+                              selection=None, strict=False, context=None):
+    if context is None:
+        context = make_export_context(start_date, calendar, reduce_dependencies=reduce_dependencies,
+                                      summary_milestones=summary_milestones, cache=cache, selection=selection, strict=strict)
 
+    with profile_export('plan_to_project_libre_xml', filename):
+        compiled = compile_for_context(plan, context)
+        with open(filename, 'wt') as outfile, ChunkedWriter(outfile) as writer:
+            _output_main_file(writer, compiled, context)
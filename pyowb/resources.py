@@ -0,0 +1,225 @@
+# Resources: who does each task, and resource leveling.
+#
+#   A task names the resource(s) that work on it with RESOURCE, a name or
+#   a list of names; RESOURCE on a summary applies to every leaf below it
+#   that names none.  RESOURCES on the plan root gives the capacity of a
+#   resource, i.e. how many of its tasks may run at once (default 1):
+#
+#       plan = {NAME : 'Team', RESOURCES : {'testers' : 2}, CHILDREN : [
+#           {NAME : 'Spec', EFFORT : 3, RESOURCE : 'alice'},
+#           {NAME : 'Test', EFFORT : 5, RESOURCE : ['alice', 'testers']},
+#       ]}
+#
+#   compile_plan levels the schedule of every plan that assigns resources
+#   (see level_schedule), so exports carry dates that no resource is
+#   overbooked on, and list the resources and assignments.
+
+import heapq
+import sys
+from collections import deque, namedtuple
+from .keywords import *
+from .task_store import *
+from .graph import *
+from .schedule import *
+
+DEFAULT_CAPACITY = 1
+
+ResourceAssignments = namedtuple('ResourceAssignments', [
+    'names',        # resource names, sorted
+    'capacities',   # tasks each resource may work on at once
+    'tasks',        # Csr of resource indices per task; empty for summaries
+])
+
+
+def _resource_names(value, compiled, index):
+    if isinstance(value, str):
+        return (value,)
+    if isinstance(value, (list, tuple)) and all(isinstance(name, str) for name in value):
+        return tuple(value)
+    task_id = compiled.ids[index]
+    task_name = get_name(compiled.store, index)
+    sys.stderr.write('WARNING: ID={task_id} NAME={task_name} : RESOURCE {value!r} is neither a name nor a list of names\n'.format(**locals()))
+    return ()
+
+def _capacity(name, capacity):
+    if isinstance(capacity, int) and not isinstance(capacity, bool) and capacity >= 1:
+        return capacity
+    sys.stderr.write('WARNING: resource "{name}" : capacity {capacity!r} is not a positive integer; using {0}\n'.format(DEFAULT_CAPACITY, **locals()))
+    return DEFAULT_CAPACITY
+
+# Returns the ResourceAssignments of compiled.  capacities (a dict of
+# resource name: capacity) overrides RESOURCES of the plan root.
+def resource_assignments(compiled, capacities=None):
+    store = compiled.store
+    task_count = len(compiled.ids)
+    if not capacities and not any(RESOURCE in extras or RESOURCES in extras for extras in store.extras.values()):
+        return ResourceAssignments(names=(), capacities=index_array(),
+                                   tasks=Csr(index_array([0]) * (task_count+1), index_array()))
+    # resource names of every task, inherited by leaves; synthetic
+    # milestones (see compile_plan) do no work
+    task_names = [()] * task_count
+    for index in range(task_count):
+        extras = store.extras.get(index, None)
+        if extras and RESOURCE in extras:
+            task_names[index] = _resource_names(extras[RESOURCE], compiled, index)
+        elif compiled.parents[index] != -1 and not compiled.milestones[index]:
+            task_names[index] = task_names[compiled.parents[index]]
+
+    all_capacities = dict(store.extras.get(0, {}).get(RESOURCES, None) or {})
+    all_capacities.update(capacities or {})
+    names = set(all_capacities.keys())
+    for index in compiled.leaf_order:
+        names.update(task_names[index])
+    names = tuple(sorted(names))
+    name_to_resource = dict((name, resource) for resource, name in enumerate(names))
+
+    rows = []
+    for index in range(task_count):
+        if store.summaries[index]:
+            rows.append(())
+        else:
+            # each resource once, in the order given
+            rows.append(tuple(dict.fromkeys(name_to_resource[name] for name in task_names[index])))
+    return ResourceAssignments(
+        names=names,
+        capacities=index_array(_capacity(name, all_capacities.get(name, DEFAULT_CAPACITY)) for name in names),
+        tasks=csr_from_lists(rows),
+    )
+
+def has_assignments(assignments):
+    return len(assignments.tasks.values) != 0
+
+
+# Returns the Schedule of compiled with resources leveled: a list scheduler
+# walks the event graph (see graph.py) in time order, starting each leaf
+# once its predecessors are done and a unit of each of its resources is
+# free.  Leaves waiting for a resource get it in order of their late start
+# in compiled.schedule, i.e. the most critical first.
+#
+# Slack and the critical flag account for the resources as well: each unit
+# of a resource passes from one task to the next like a dependency.
+#
+# A heap of pending events and one heap of waiting leaves per resource
+# keep it O((V+E) log V).
+def level_schedule(compiled, assignments=None):
+    if assignments is None:
+        assignments = resource_assignments(compiled)
+    durations = task_durations(compiled)
+    priorities = compiled.schedule.late_start
+    resource_offsets = assignments.tasks.offsets
+    resource_values = assignments.tasks.values
+
+    # Events on a dependency cycle keep the edges that agree with
+    # topological_event_order, so that every event gets ready.
+    order = topological_event_order(compiled)
+    position = [0] * len(order)
+    for event_position, event in enumerate(order):
+        position[event] = event_position
+    successors = [None] * len(order)
+    forward_successors = [None] * len(order)
+    pending = [0] * len(order)
+    for event in order:
+        successors[event] = targets = list(event_successors(compiled, event))
+        forward_successors[event] = forward_targets = [target for target in targets if position[target] > position[event]]
+        for target in forward_targets:
+            pending[target] += 1
+
+    # Units are numbered as they are first used; a freed unit goes to the
+    # back of its resource's queue, so that the unit taken is the one idle
+    # the longest, and no task is chained to another needlessly.
+    unused_units = list(assignments.capacities)
+    free_units = [deque() for name in assignments.names]
+    unit_resources = []
+    last_finish = [] # finish event of the last task on each unit
+    held_units = {} # index: [unit]
+    resource_successors = {} # finish event: [start event of the next task on the same unit]
+    waiting = [[] for name in assignments.names] # heaps of (priority, index)
+
+    times = [0] * len(order)
+    fired = [] # events in the order they fire: a topological order, resource edges included
+    heap = [(0, position[event], event) for event in order if pending[event] == 0]
+    heapq.heapify(heap)
+    touched = set() # resources that may have a waiting leaf to start
+
+    def _is_leveled(index):
+        return resource_offsets[index+1] != resource_offsets[index] and durations[index] > 0
+
+    def _fire(event, time):
+        times[event] = time
+        fired.append(event)
+        index = event >> 1
+        if event & 1:
+            for unit in held_units.pop(index, ()):
+                resource = unit_resources[unit]
+                free_units[resource].append(unit)
+                last_finish[unit] = event
+                touched.add(resource)
+        else:
+            time += durations[index]
+        for target in forward_successors[event]:
+            if times[target] < time:
+                times[target] = time
+            pending[target] -= 1
+            if pending[target] == 0:
+                heapq.heappush(heap, (times[target], position[target], target))
+
+    def _is_free(resource):
+        return unused_units[resource] or free_units[resource]
+
+    def _start(index, time):
+        units = []
+        for resource in resource_values[resource_offsets[index]:resource_offsets[index+1]]:
+            if unused_units[resource]:
+                unused_units[resource] -= 1
+                unit = len(unit_resources)
+                unit_resources.append(resource)
+                last_finish.append(-1)
+            else:
+                unit = free_units[resource].popleft()
+                resource_successors.setdefault(last_finish[unit], []).append(start_event(index))
+            units.append(unit)
+        held_units[index] = units
+        _fire(start_event(index), time)
+
+    def _dispatch(resource, time):
+        queue = waiting[resource]
+        while queue and _is_free(resource):
+            priority, index = heapq.heappop(queue)
+            busy = [other for other in resource_values[resource_offsets[index]:resource_offsets[index+1]] if not _is_free(other)]
+            if busy:
+                # waits for the next one to free up
+                heapq.heappush(waiting[busy[0]], (priority, index))
+            else:
+                _start(index, time)
+
+    while heap:
+        time = heap[0][0]
+        # every event at this time, then the waiting leaves
+        while heap and heap[0][0] == time:
+            event = heapq.heappop(heap)[2]
+            index = event >> 1
+            if not (event & 1) and _is_leveled(index):
+                resource = resource_values[resource_offsets[index]]
+                heapq.heappush(waiting[resource], (priorities[index], index))
+                touched.add(resource)
+            else:
+                _fire(event, time)
+        while touched:
+            for resource in sorted(touched):
+                touched.discard(resource)
+                _dispatch(resource, time)
+
+    project_finish = max(times) if times else 0
+    late = [project_finish] * len(order)
+    for event in reversed(fired):
+        value = late[event]
+        for target in successors[event]:
+            if late[target] < value:
+                value = late[target]
+        for target in resource_successors.get(event, ()):
+            if late[target] < value:
+                value = late[target]
+        if not (event & 1):
+            value -= durations[event >> 1]
+        late[event] = value
+    return schedule_from_event_times(compiled, times, late, project_finish)
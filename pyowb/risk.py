@@ -0,0 +1,264 @@
+# Schedule risk: Monte Carlo simulation of three-point (PERT) estimates.
+#
+#   A task may give OPTIMISTIC, LIKELY and PESSIMISTIC efforts next to (or
+#   instead of) EFFORT.  Every iteration draws each such effort from the
+#   PERT distribution (a beta distribution over [OPTIMISTIC, PESSIMISTIC]
+#   with its mode at LIKELY) and schedules the plan as compute_schedule
+#   does; the spread of the project finish and how often each task is
+#   critical measure the risk of the plan:
+#
+#       analysis = simulate_schedule(plan, iterations=2000, seed=1)
+#       finish_percentile_dates(analysis, datetime(2024, 1, 8))
+#       # [(50, datetime(...)), (80, datetime(...)), (95, datetime(...))]
+#
+#   Resources are not leveled (see resources.py): the simulation follows
+#   the dependencies only.
+#
+#   Needs numpy.  Iterations are simulated in batches: the event graph
+#   (see graph.py) is sorted into levels, so that each level is one
+#   gather and one max-reduce over a (events x batch) array, forward for
+#   the early times and backward for the late times.
+
+import sys
+from collections import namedtuple
+from .keywords import *
+from .tasks import *
+from .task_store import *
+from .graph import *
+from .compiled_plan import *
+from .schedule import _critical_slack_limit
+from .work_calendar import *
+from .profiling import *
+
+DEFAULT_ITERATIONS = 2000
+DEFAULT_PERCENTS = (50, 80, 95)
+
+# Iterations are simulated in batches that keep the working arrays within
+# about this many bytes.
+_batch_bytes = 64 << 20
+_max_batch_size = 4096
+
+RiskAnalysis = namedtuple('RiskAnalysis', [
+    'iterations',
+    'finishes',         # numpy array: sorted project finish of every iteration, in working days
+    'criticality',      # numpy array: fraction of iterations in which each task is critical
+])
+
+
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError('simulate_schedule needs numpy (pip install numpy)')
+    return numpy
+
+# Returns (optimistic, likely, pessimistic) of a leaf, or None if it has
+# neither of them.  Missing values default to LIKELY, then to EFFORT.
+def three_point_estimate(compiled, index):
+    store = compiled.store
+    extras = store.extras.get(index, None)
+    if not extras or store.summaries[index]:
+        return None
+    if OPTIMISTIC not in extras and LIKELY not in extras and PESSIMISTIC not in extras:
+        return None
+    likely = extras.get(LIKELY, get_effort(store, index))
+    estimate = (extras.get(OPTIMISTIC, likely), likely, extras.get(PESSIMISTIC, likely))
+    if not estimate[0] <= estimate[1] <= estimate[2]:
+        task_id = compiled.ids[index]
+        task_name = get_name(store, index)
+        sys.stderr.write('WARNING: ID={task_id} NAME={task_name} : three-point estimate {estimate} is not in increasing order\n'.format(**locals()))
+        estimate = tuple(sorted(estimate))
+    return estimate
+
+
+# The event graph in the form the batched passes use.
+_EventLevels = namedtuple('_EventLevels', [
+    'forward',      # per level: _LevelEdges keyed by target
+    'backward',     # per level: _LevelEdges keyed by source
+])
+
+# The edges of one level, keyed by the event they update.  Keys with one
+# edge (most of them) are updated by a plain gather; the others by a
+# reduce over their grouped values.
+_LevelEdges = namedtuple('_LevelEdges', [
+    'single_keys',
+    'single_values',
+    'keys',             # unique
+    'values',           # grouped by key
+    'group_starts',
+])
+
+# Sorts the events into levels, the level of an event being the length of
+# the longest path that leads to it.  Events on a dependency cycle keep the
+# edges that agree with topological_event_order and lose the others.
+def _event_levels(compiled, numpy):
+    order = topological_event_order(compiled)
+    position = [0] * len(order)
+    for event_position, event in enumerate(order):
+        position[event] = event_position
+    level = [0] * len(order)
+    sources = []
+    targets = []
+    for event in order:
+        for target in event_successors(compiled, event):
+            if position[target] > position[event]:
+                sources.append(event)
+                targets.append(target)
+                if level[target] <= level[event]:
+                    level[target] = level[event] + 1
+    sources = numpy.array(sources, dtype=numpy.int64)
+    targets = numpy.array(targets, dtype=numpy.int64)
+    level = numpy.array(level, dtype=numpy.int64)
+
+    def _grouped(keys, values, key_levels):
+        # edges sorted by (level, key); one _LevelEdges per level
+        edge_order = numpy.lexsort((keys, key_levels))
+        keys = keys[edge_order]
+        values = values[edge_order]
+        key_levels = key_levels[edge_order]
+        level_starts = numpy.flatnonzero(numpy.diff(key_levels, prepend=-1))
+        groups = []
+        for begin, end in zip(level_starts, list(level_starts[1:]) + [len(keys)]):
+            level_keys = keys[begin:end]
+            level_values = values[begin:end]
+            group_starts = numpy.flatnonzero(numpy.diff(level_keys, prepend=-1))
+            group_sizes = numpy.diff(group_starts, append=len(level_keys))
+            single = numpy.repeat(group_sizes == 1, group_sizes)
+            multi_keys = level_keys[~single]
+            multi_starts = numpy.flatnonzero(numpy.diff(multi_keys, prepend=-1))
+            groups.append(_LevelEdges(single_keys=level_keys[single], single_values=level_values[single],
+                                      keys=multi_keys[multi_starts], values=level_values[~single],
+                                      group_starts=multi_starts))
+        return groups
+
+    return _EventLevels(forward=_grouped(targets, sources, level[targets]),
+                        backward=_grouped(sources, targets, level[sources])[::-1])
+
+
+# Returns (durations, indices of the uncertain ones, optimistic, pessimistic, alpha, beta).
+def _effort_model(compiled, numpy):
+    store = compiled.store
+    task_count = len(compiled.ids)
+    base = numpy.zeros(task_count)
+    uncertain = []
+    estimates = []
+    for index in range(task_count):
+        if store.summaries[index]:
+            continue
+        estimate = three_point_estimate(compiled, index)
+        if estimate is None:
+            base[index] = get_effort(store, index)
+            continue
+        base[index] = estimate[1]
+        if estimate[0] != estimate[2]:
+            uncertain.append(index)
+            estimates.append(estimate)
+    uncertain = numpy.array(uncertain, dtype=numpy.int64)
+    optimistic, likely, pessimistic = (numpy.array(column, dtype=float).reshape(-1) for column in
+                                       (zip(*estimates) if estimates else ((), (), ())))
+    spread = pessimistic - optimistic
+    alpha = 1 + 4 * (likely - optimistic) / spread
+    beta = 1 + 4 * (pessimistic - likely) / spread
+    return (base, uncertain, optimistic, pessimistic, alpha, beta)
+
+# Simulates one batch.  Returns (project finish per iteration, critical
+# iteration count per task).
+def _simulate_batch(compiled, levels, model, batch_size, rng, numpy):
+    base, uncertain, optimistic, pessimistic, alpha, beta = model
+    task_count = len(base)
+    durations = numpy.repeat(base[:, None], batch_size, axis=1)
+    if len(uncertain):
+        samples = rng.beta(alpha, beta, size=(batch_size, len(uncertain))).T
+        durations[uncertain] = optimistic[:, None] + (pessimistic - optimistic)[:, None] * samples
+    # weight of every event: the duration of its task for a start event
+    weights = numpy.zeros((2*task_count, batch_size))
+    weights[0::2] = durations
+    del durations
+
+    # forward: times[e] = early time of e plus its weight, i.e. what e passes on
+    times = weights.copy()
+    for edges in levels.forward:
+        times[edges.single_keys] += times[edges.single_values]
+        if len(edges.keys):
+            times[edges.keys] += numpy.maximum.reduceat(times[edges.values], edges.group_starts, axis=0)
+    project_finish = times.max(axis=0)
+
+    # backward: late[e] = latest time of e
+    late = numpy.empty_like(times)
+    late[:] = project_finish
+    late -= weights
+    for edges in levels.backward:
+        late[edges.single_keys] = numpy.minimum(project_finish, late[edges.single_values]) - weights[edges.single_keys]
+        if len(edges.keys):
+            late[edges.keys] = (numpy.minimum(project_finish, numpy.minimum.reduceat(late[edges.values], edges.group_starts, axis=0))
+                                - weights[edges.keys])
+
+    # a summary is as slack as its most critical leaf, so it is critical in
+    # every iteration in which any leaf of its leaf range is
+    leaf_finishes = 2 * numpy.asarray(compiled.leaf_order, dtype=numpy.int64) + 1
+    leaf_critical = late[leaf_finishes] - times[leaf_finishes] <= _critical_slack_limit
+    critical_before = numpy.zeros((len(leaf_finishes) + 1, batch_size), dtype=numpy.int32)
+    numpy.cumsum(leaf_critical, axis=0, out=critical_before[1:])
+    begins = numpy.asarray(compiled.leaf_ranges.first, dtype=numpy.int64)
+    ends = numpy.asarray(compiled.leaf_ranges.second, dtype=numpy.int64)
+    critical_counts = numpy.zeros(task_count, dtype=numpy.int64)
+    for begin in range(0, task_count, max(1, (_batch_bytes // 8) // batch_size)):
+        end = min(begin + max(1, (_batch_bytes // 8) // batch_size), task_count)
+        critical_counts[begin:end] = (critical_before[ends[begin:end]] > critical_before[begins[begin:end]]).sum(axis=1)
+    return (project_finish, critical_counts)
+
+
+# Simulates iterations schedules of plan (a plan or a CompiledPlan), with
+# efforts drawn from the three-point estimates of its leaves.  Leaves
+# without one keep their EFFORT.  seed makes the result reproducible.
+def simulate_schedule(plan, iterations=DEFAULT_ITERATIONS, seed=None, batch_size=None):
+    numpy = _import_numpy()
+    compiled = as_compiled_plan(plan)
+    task_count = len(compiled.ids)
+    if batch_size is None:
+        # times, late, weights and a few temporaries per event
+        batch_size = _batch_bytes // (8 * 8 * max(task_count, 1))
+    batch_size = max(1, min(batch_size, _max_batch_size, iterations))
+
+    with profile_phase('risk/event_levels'):
+        levels = _event_levels(compiled, numpy)
+    with profile_phase('risk/effort_model'):
+        model = _effort_model(compiled, numpy)
+    rng = numpy.random.default_rng(seed)
+    finishes = []
+    critical_counts = numpy.zeros(task_count, dtype=numpy.int64)
+    with profile_phase('risk/simulate'):
+        if not len(model[1]):
+            # nothing is uncertain: every iteration is the same
+            batch_finishes, batch_critical_counts = _simulate_batch(compiled, levels, model, 1, rng, numpy)
+            finishes.append(numpy.repeat(batch_finishes, iterations))
+            critical_counts += batch_critical_counts * iterations
+        else:
+            for begin in range(0, iterations, batch_size):
+                batch_finishes, batch_critical_counts = _simulate_batch(compiled, levels, model, min(batch_size, iterations - begin),
+                                                                        rng, numpy)
+                finishes.append(batch_finishes)
+                critical_counts += batch_critical_counts
+    profile_count('iterations', iterations)
+    return RiskAnalysis(iterations=iterations, finishes=numpy.sort(numpy.concatenate(finishes + [numpy.zeros(0)])),
+                        criticality=critical_counts / max(iterations, 1))
+
+# Returns the project finish, in working days, at each of percents.
+def finish_percentiles(analysis, percents=DEFAULT_PERCENTS):
+    numpy = _import_numpy()
+    return [float(days) for days in numpy.percentile(analysis.finishes, percents)]
+
+# Returns [(percent, finish date)], counting working days of calendar
+# (default: monday-friday) from start_date.
+def finish_percentile_dates(analysis, start_date, calendar=None, percents=DEFAULT_PERCENTS):
+    if calendar is None:
+        calendar = WorkCalendar()
+    return list(zip(percents, calendar.to_datetimes(start_date, finish_percentiles(analysis, percents), is_finish=True)))
+
+# Returns the indices of the count tasks that are most often critical,
+# most critical first.
+def most_critical_tasks(analysis, count=10):
+    numpy = _import_numpy()
+    # stable, so that ties keep pre-order
+    order = numpy.argsort(-analysis.criticality, kind='stable')
+    return [int(index) for index in order[:count]]
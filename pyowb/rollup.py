@@ -0,0 +1,68 @@
+# Rollups: the totals of every summary over the leaves below it.
+#
+#   compute_rollup makes one post-order pass over a compiled plan and
+#   returns columns indexed like the tasks: total effort, number of leaves,
+#   earliest start and latest finish (in working days from the project
+#   start, as in the schedule).  A leaf is its own rollup.  The writers put
+#   them into the summary rows, so a file opens with its totals filled in:
+#
+#       rollup = compute_rollup(compiled)
+#       rollup.efforts[0]                       # effort of the whole plan
+#       rollup_by_id(compiled, rollup)['t12']   # RollupRow of task t12
+
+import array
+import math
+from collections import namedtuple
+from .keywords import *
+from .tasks import *
+from .task_store import *
+
+Rollup = namedtuple('Rollup', [
+    'efforts',      # total EFFORT of the leaves
+    'leaf_counts',  # number of leaves, synthetic milestones (see compile_plan) excluded
+    'starts',       # earliest early start of the leaves
+    'finishes',     # latest early finish of the leaves
+])
+
+RollupRow = namedtuple('RollupRow', ['effort', 'leaf_count', 'start', 'finish'])
+
+
+# The post-order walk visits every child before its parent: O(N).
+def compute_rollup(compiled):
+    store = compiled.store
+    schedule = compiled.schedule
+    task_count = len(compiled.ids)
+    efforts = array.array('d', bytes(8 * task_count))
+    leaf_counts = index_array([0]) * task_count
+    # summaries start out empty, and take the span of their children
+    starts = array.array('d', (math.inf if is_summary else start for is_summary, start in zip(store.summaries, schedule.early_start)))
+    finishes = array.array('d', (-math.inf if is_summary else finish for is_summary, finish in zip(store.summaries, schedule.early_finish)))
+    parents = compiled.parents
+    for index, level in iter_postorder(0, compiled.children.__getitem__):
+        if not store.summaries[index]:
+            efforts[index] = get_effort(store, index)
+            leaf_counts[index] = 0 if compiled.milestones[index] else 1
+        elif starts[index] == math.inf:
+            # CHILDREN holds only SEQUENCE/PARALLEL markers: its own dates
+            starts[index] = schedule.early_start[index]
+            finishes[index] = schedule.early_finish[index]
+        parent_index = parents[index]
+        if parent_index != -1:
+            efforts[parent_index] += efforts[index]
+            leaf_counts[parent_index] += leaf_counts[index]
+            if starts[index] < starts[parent_index]:
+                starts[parent_index] = starts[index]
+            if finishes[index] > finishes[parent_index]:
+                finishes[parent_index] = finishes[index]
+    return Rollup(efforts, leaf_counts, starts, finishes)
+
+# Returns a dict of task ID: RollupRow.
+def rollup_by_id(compiled, rollup=None):
+    if rollup is None:
+        rollup = compute_rollup(compiled)
+    return dict((task_id, RollupRow(rollup.efforts[index], rollup.leaf_counts[index], rollup.starts[index], rollup.finishes[index]))
+                for index, task_id in enumerate(compiled.ids))
+
+# Working days from the start to the finish of every task.
+def rollup_spans(rollup):
+    return [finish - start for start, finish in zip(rollup.starts, rollup.finishes)]
@@ -0,0 +1,104 @@
+# Critical-path scheduling of a compiled plan.
+#
+#   A forward and a backward pass over a topological order of the event
+#   graph (see graph.py), where start(task) -> finish(task) is weighted by
+#   the EFFORT of leaves, yield early/late start and finish for every task
+#   in O(V+E).
+#   All values are offsets in working days from the project start.
+
+import array
+from collections import namedtuple
+from .keywords import *
+from .tasks import *
+from .task_store import *
+from .graph import *
+
+Schedule = namedtuple('Schedule', [
+    'early_start',
+    'early_finish',
+    'late_start',
+    'late_finish',
+    'total_slack',
+    'critical',
+    'project_finish',
+])
+
+# Slack at or below this many days marks a task as critical.
+_critical_slack_limit = 1e-9
+
+
+# EFFORT of every leaf; 0 for summaries and tasks without one.
+def task_durations(compiled):
+    store = compiled.store
+    return [0 if is_summary or effort != effort else effort # effort != effort: NaN, no EFFORT
+            for is_summary, effort in zip(store.summaries, store.efforts)]
+
+
+def compute_schedule(compiled):
+    task_count = len(compiled.tasks)
+    durations = task_durations(compiled)
+    order = topological_event_order(compiled)
+
+    # forward pass: earliest time of every event
+    early = [0] * (2*task_count)
+    for event in order:
+        value = early[event]
+        if not (event & 1):
+            value += durations[event >> 1]
+        for target in event_successors(compiled, event):
+            if early[target] < value:
+                early[target] = value
+
+    project_finish = max(early) if early else 0
+
+    # backward pass: latest time of every event
+    late = [project_finish] * (2*task_count)
+    for event in reversed(order):
+        value = late[event]
+        for target in event_successors(compiled, event):
+            if late[target] < value:
+                value = late[target]
+        if not (event & 1):
+            value -= durations[event >> 1]
+        late[event] = value
+
+    return schedule_from_event_times(compiled, early, late, project_finish)
+
+# Builds the Schedule of compiled from the early and late time of every
+# event.
+def schedule_from_event_times(compiled, early, late, project_finish):
+    task_count = len(compiled.tasks)
+    early_start = [early[start_event(index)] for index in range(task_count)]
+    early_finish = [early[finish_event(index)] for index in range(task_count)]
+    late_start = [late[start_event(index)] for index in range(task_count)]
+    late_finish = [late[finish_event(index)] for index in range(task_count)]
+
+    total_slack = [late_finish[index] - early_finish[index] for index in range(task_count)]
+
+    # Summaries are rolled up from their children: a summary starts when its
+    # first child starts (rather than when it is first allowed to), and is
+    # only as slack as its most critical child.  Children always follow their
+    # parent in pre-order, so walking the indices backwards visits every
+    # child before its parent.
+    child_offsets = compiled.children.offsets
+    child_values = compiled.children.values
+    for index in reversed(range(task_count)):
+        if child_offsets[index+1] != child_offsets[index]:
+            child_indices = child_values[child_offsets[index]:child_offsets[index+1]]
+            early_start[index] = min(early_start[child_index] for child_index in child_indices)
+            late_start[index] = min(late_start[child_index] for child_index in child_indices)
+            late_finish[index] = max(late_finish[child_index] for child_index in child_indices)
+            total_slack[index] = min(total_slack[child_index] for child_index in child_indices)
+
+    critical = [slack <= _critical_slack_limit for slack in total_slack]
+
+    return Schedule(
+        early_start=array.array('d', early_start),
+        early_finish=array.array('d', early_finish),
+        late_start=array.array('d', late_start),
+        late_finish=array.array('d', late_finish),
+        total_slack=array.array('d', total_slack),
+        critical=array.array('b', critical),
+        project_finish=project_finish,
+    )
+
@@ -0,0 +1,239 @@
+# Selection: export one part of a plan.
+#
+#   A Selection names the tasks to keep, by ID or by category (see
+#   parse_category); a selected task brings its whole subtree, and the
+#   summaries above it are kept to hold the structure.  Dependencies
+#   between kept tasks are kept; a dependency on any other task is
+#   dropped, or with stubs=True replaced by a stub leaf that lasts from the
+#   project start until that task finishes in the full plan:
+#
+#       selection = make_selection(ids=['backend'], categories=['QA'], stubs=True)
+#       plan_to_owb_xml('backend.owb.xml', plan, selection=selection)
+#
+#   select_plan cuts the part out of the compiled full plan: its columns
+#   and schedule are gathered for the kept tasks, not computed again, so
+#   the kept tasks keep the dates of the full plan.  Subtrees are ranges of
+#   the pre-order (see subtree_indices), so the cost is that of the kept
+#   tasks and their dependencies, except for a scan of the category column
+#   when selecting by category, and a copy of the string table when there
+#   are stubs.  The full plan itself must be compiled first: pass the
+#   writers a CompiledPlan, or the file name of a plan image (see
+#   save_plan_image), to skip that.
+
+import array
+import bisect
+import math
+import sys
+from collections import namedtuple
+from types import MappingProxyType
+from .keywords import *
+from .tasks import *
+from .task_store import *
+from .schedule import *
+from .schedule import _critical_slack_limit
+from .compiled_plan import *
+from .compiled_plan import _compute_subtree_ends, _compute_leaf_closures
+
+Selection = namedtuple('Selection', [
+    'ids',          # IDs of the tasks to keep, with their subtrees
+    'categories',   # categories of the tasks to keep, with their subtrees
+    'stubs',        # replace dependencies on other tasks with stub leaves
+])
+
+EXTERNAL_NAME = 'External predecessors'
+
+
+def make_selection(ids=(), categories=(), stubs=False):
+    return Selection(tuple(ids), tuple(categories), bool(stubs))
+
+
+# Returns the roots of the selected subtrees, sorted, none below another.
+def _selected_roots(compiled, selection):
+    roots = []
+    for task_id in selection.ids:
+        index = compiled.id_to_index.get(task_id, None)
+        if index is None:
+            sys.stderr.write('WARNING: selected ID={task_id} is not in the plan\n'.format(**locals()))
+        else:
+            roots.append(index)
+    if selection.categories:
+        wanted = set(selection.categories)
+        codes = set(code for code, string in enumerate(compiled.store.strings) if string in wanted)
+        categories = compiled.store.categories
+        index = 0
+        while index < len(categories):
+            if categories[index] in codes:
+                roots.append(index)
+                # the rest of the subtree is selected already
+                index = compiled.subtree_ends[index]
+            else:
+                index += 1
+    roots.sort()
+    outermost = []
+    for index in roots:
+        if not outermost or not is_ancestor(compiled, outermost[-1], index):
+            outermost.append(index)
+    return outermost
+
+# The start milestone of a summary compiled with summary_milestones, or -1.
+def _start_milestone(compiled, index):
+    children = compiled.children[index]
+    if children and compiled.milestones[children[0]] and compiled.ids[children[0]] == compiled.ids[index] + '#start':
+        return children[0]
+    return -1
+
+# Summaries kept only to hold the structure are as long as their kept
+# children, and as slack as the most critical one; the others keep their
+# rows.  Children follow their parent, so walking backwards visits every
+# child before its parent.
+def _roll_up_structure(schedule, children, is_structure):
+    early_start, early_finish, late_start, late_finish, total_slack, critical = schedule
+    for index in reversed(range(len(early_start))):
+        child_indices = children[index]
+        if not is_structure[index] or not child_indices:
+            continue
+        early_start[index] = min(early_start[child_index] for child_index in child_indices)
+        early_finish[index] = max(early_finish[child_index] for child_index in child_indices)
+        late_start[index] = min(late_start[child_index] for child_index in child_indices)
+        late_finish[index] = max(late_finish[child_index] for child_index in child_indices)
+        total_slack[index] = min(total_slack[child_index] for child_index in child_indices)
+        critical[index] = 1 if total_slack[index] <= _critical_slack_limit else 0
+
+# Returns the CompiledPlan of the tasks of compiled that selection keeps,
+# with the schedule of compiled.
+def select_plan(compiled, selection):
+    roots = _selected_roots(compiled, selection)
+    if not roots:
+        sys.stderr.write('WARNING: the selection keeps no task of the plan\n')
+    subtree_ends = compiled.subtree_ends
+    parents = compiled.parents
+
+    def _is_selected(index):
+        position = bisect.bisect_right(roots, index)
+        return position != 0 and index < subtree_ends[roots[position - 1]]
+
+    # the root of the plan is above every selected task
+    ancestors = set([0])
+    for root in roots:
+        index = parents[root]
+        while index != -1 and index not in ancestors:
+            ancestors.add(index)
+            index = parents[index]
+    ancestors.difference_update(roots)
+    # the start milestones of kept summaries hold the summaries' predecessors
+    ancestor_milestones = set(_start_milestone(compiled, index) for index in ancestors)
+    ancestor_milestones.discard(-1)
+    internal = ancestor_milestones.union(roots)
+
+    # Roots are outermost, so no ancestor lies in a selected subtree, and
+    # this is pre-order: parents come before their children.
+    kept = []
+    for index in sorted(ancestors | internal):
+        if index in ancestors or index in ancestor_milestones:
+            kept.append(index)
+        else:
+            kept.extend(subtree_indices(compiled, index))
+    old_to_new = dict((index, new_index) for new_index, index in enumerate(kept))
+
+    def _is_internal(index):
+        return index in internal or _is_selected(index)
+
+    stubs = {} # external predecessor index: new index
+    predecessors = []
+    for index in kept:
+        new_predecessors = []
+        for predecessor_index in compiled.predecessors[index]:
+            if _is_internal(predecessor_index):
+                new_predecessors.append(old_to_new[predecessor_index])
+            elif selection.stubs:
+                if predecessor_index not in stubs:
+                    # after the kept tasks and their summary
+                    stubs[predecessor_index] = len(kept) + 1 + len(stubs)
+                new_predecessors.append(stubs[predecessor_index])
+        predecessors.append(new_predecessors)
+    sequence_predecessors = index_array(old_to_new[predecessor_index] if predecessor_index != -1 and _is_internal(predecessor_index) else -1
+                                        for predecessor_index in (compiled.sequence_predecessors[index] for index in kept))
+    new_parents = index_array(old_to_new[parents[index]] if parents[index] != -1 else -1 for index in kept)
+    new_levels = index_array(compiled.levels[index] for index in kept)
+    ids = [compiled.ids[index] for index in kept]
+    milestones = array.array('b', (compiled.milestones[index] for index in kept))
+
+    store = compiled.store
+    strings = store.strings
+    names = index_array(store.names[index] for index in kept)
+    categories = index_array(store.categories[index] for index in kept)
+    descs = index_array(store.descs[index] for index in kept)
+    efforts = array.array('d', (store.efforts[index] for index in kept))
+    int_efforts = array.array('b', (store.int_efforts[index] for index in kept))
+    summaries = array.array('b', (store.summaries[index] for index in kept))
+    extras = dict((new_index, store.extras[index]) for new_index, index in enumerate(kept) if index in store.extras)
+
+    schedule = compiled.schedule
+    columns = (schedule.early_start, schedule.early_finish, schedule.late_start, schedule.late_finish, schedule.total_slack)
+    new_schedule = [array.array('d', (column[index] for index in kept)) for column in columns]
+    new_schedule.append(array.array('b', (schedule.critical[index] for index in kept)))
+
+    if stubs:
+        # a summary of stubs under the root, then the stubs, each from day 0
+        # until its predecessor finishes
+        strings = tuple(strings) + (EXTERNAL_NAME, parse_category(EXTERNAL_NAME))
+        stub_indices = sorted(stubs, key=stubs.__getitem__)
+        ids.append(compiled.ids[0] + '#external')
+        ids.extend(compiled.ids[index] + '#external' for index in stub_indices)
+        new_parents.append(0)
+        new_parents.extend([len(kept)] * len(stub_indices))
+        new_levels.append(1)
+        new_levels.extend([2] * len(stub_indices))
+        milestones.extend([0] * (len(stub_indices) + 1))
+        predecessors.extend([] for index in range(len(stub_indices) + 1))
+        sequence_predecessors.extend([-1] * (len(stub_indices) + 1))
+        names.append(len(strings) - 2)
+        names.extend(store.names[index] for index in stub_indices)
+        categories.append(len(strings) - 1)
+        categories.extend(store.categories[index] for index in stub_indices)
+        descs.extend([NO_STRING] * (len(stub_indices) + 1))
+        stub_efforts = [schedule.early_finish[index] for index in stub_indices]
+        efforts.append(math.nan)
+        efforts.extend(stub_efforts)
+        int_efforts.append(0)
+        int_efforts.extend(1 if float(effort).is_integer() else 0 for effort in stub_efforts)
+        summaries.append(1)
+        summaries.extend([0] * len(stub_indices))
+        early_start, early_finish, late_start, late_finish, total_slack, critical = new_schedule
+        for row in [0] + stub_indices:
+            # the summary's row is rolled up from its stubs below
+            early_start.append(0)
+            early_finish.append(schedule.early_finish[row])
+            late_start.append(schedule.late_finish[row] - schedule.early_finish[row])
+            late_finish.append(schedule.late_finish[row])
+            total_slack.append(schedule.late_finish[row] - schedule.early_finish[row])
+            critical.append(schedule.critical[row])
+
+    children = csr_from_parents(new_parents)
+    is_structure = [index in ancestors for index in kept] + [bool(stubs)] * (len(ids) - len(kept))
+    _roll_up_structure(new_schedule, children, is_structure)
+    new_store = TaskStore(strings, names, categories, descs, efforts, int_efforts, summaries, extras)
+    new_subtree_ends = _compute_subtree_ends(children)
+    leaf_order, leaf_ranges = _compute_leaf_closures(summaries, new_subtree_ends)
+    ids = tuple(ids)
+    id_to_intid = dict((task_id, intid) for intid, task_id in enumerate(sorted(set(ids))))
+    predecessors = csr_from_lists(predecessors)
+    return CompiledPlan(
+        tasks=TaskRows(new_store, ids, children),
+        store=new_store,
+        ids=ids,
+        parents=new_parents,
+        levels=new_levels,
+        subtree_ends=new_subtree_ends,
+        children=children,
+        milestones=milestones,
+        intids=index_array(id_to_intid[task_id] for task_id in ids),
+        # the last task wins if an ID is repeated, as in compile_plan
+        id_to_index=MappingProxyType(dict(zip(ids, range(len(ids))))),
+        predecessors=predecessors,
+        sequence_predecessors=sequence_predecessors,
+        successors=csr_transpose(predecessors),
+        leaf_order=leaf_order,
+        leaf_ranges=leaf_ranges,
+        schedule=Schedule(*new_schedule, project_finish=schedule.project_finish),
+    )
@@ -0,0 +1,269 @@
+# Columnar task store.
+#
+#   A CompiledPlan keeps its per-task data in columns instead of one dict
+#   (and several tuples) per task: typed arrays for numbers and indices, a
+#   single string table for names, categories and descriptions, and CSR
+#   (compressed sparse row) arrays for children and dependencies.  At a
+#   million tasks this takes a small fraction of the memory of dicts.
+#
+#   compiled.tasks remains a sequence of read-only mappings, one TaskRow per
+#   task, created on access, so code written against task dicts keeps
+#   working; the writers read the columns directly.
+
+import array
+import math
+from collections import namedtuple
+from collections.abc import Mapping, Sequence
+from .keywords import *
+from .tasks import *
+
+# signed 64-bit task indices
+_index_typecode = 'q'
+
+# string code of a missing string
+NO_STRING = -1
+
+# keys stored in columns; any other key of a task goes into TaskStore.extras
+_column_keys = frozenset((ID, NAME, DESC, EFFORT, DEPS, CHILDREN))
+
+
+def index_array(values=()):
+    return array.array(_index_typecode, values)
+
+
+# Adjacency lists in CSR form: the items of row i are
+# values[offsets[i]:offsets[i+1]].  Rows read as tuples.
+class Csr(Sequence):
+    __slots__ = ('offsets', 'values')
+
+    def __init__(self, offsets, values):
+        self.offsets = offsets
+        self.values = values
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.offsets) - 1
+        if not 0 <= index < len(self.offsets) - 1:
+            raise IndexError('Csr index out of range')
+        return tuple(self.values[self.offsets[index]:self.offsets[index+1]])
+
+    def __iter__(self):
+        offsets = self.offsets
+        values = self.values
+        for index in range(len(offsets) - 1):
+            yield tuple(values[offsets[index]:offsets[index+1]])
+
+    def row_length(self, index):
+        return self.offsets[index+1] - self.offsets[index]
+
+    def __eq__(self, other):
+        return isinstance(other, Csr) and self.offsets == other.offsets and self.values == other.values
+
+    def __repr__(self):
+        return 'Csr({0!r}, {1!r})'.format(self.offsets, self.values)
+
+def _zero_index_array(length):
+    return index_array(bytes(array.array(_index_typecode).itemsize * length))
+
+def csr_from_lists(lists):
+    offsets = index_array([0])
+    values = index_array()
+    for items in lists:
+        values.extend(items)
+        offsets.append(len(values))
+    return Csr(offsets, values)
+
+# Children of every task, from the parent column of a pre-order numbering
+# (children are then in order within each row).
+def csr_from_parents(parents):
+    counts = [0] * (len(parents) + 1)
+    for parent_index in parents:
+        if parent_index != -1:
+            counts[parent_index + 1] += 1
+    offsets = index_array(counts)
+    for index in range(1, len(offsets)):
+        offsets[index] += offsets[index - 1]
+    values = _zero_index_array(offsets[-1])
+    fill = list(offsets[:-1])
+    for index, parent_index in enumerate(parents):
+        if parent_index != -1:
+            values[fill[parent_index]] = index
+            fill[parent_index] += 1
+    return Csr(offsets, values)
+
+# Reverse adjacency: row j of the result lists every i that has j in row i.
+def csr_transpose(csr):
+    row_count = len(csr)
+    counts = [0] * (row_count + 1)
+    for value in csr.values:
+        counts[value + 1] += 1
+    offsets = index_array(counts)
+    for index in range(1, len(offsets)):
+        offsets[index] += offsets[index - 1]
+    values = _zero_index_array(offsets[-1])
+    fill = list(offsets[:-1])
+    source_offsets = csr.offsets
+    source_values = csr.values
+    for index in range(row_count):
+        for position in range(source_offsets[index], source_offsets[index+1]):
+            value = source_values[position]
+            values[fill[value]] = index
+            fill[value] += 1
+    return Csr(offsets, values)
+
+
+# Two parallel columns read as (first[i], second[i]) pairs.
+class PairColumns(Sequence):
+    __slots__ = ('first', 'second')
+
+    def __init__(self, first, second):
+        self.first = first
+        self.second = second
+
+    def __len__(self):
+        return len(self.first)
+
+    def __getitem__(self, index):
+        return (self.first[index], self.second[index])
+
+    def __repr__(self):
+        return 'PairColumns({0!r}, {1!r})'.format(self.first, self.second)
+
+
+TaskStore = namedtuple('TaskStore', [
+    'strings',      # string table: tuple of distinct strings
+    'names',        # string code of NAME
+    'categories',   # string code of parse_category(NAME)
+    'descs',        # string code of DESC; NO_STRING if none
+    'efforts',      # EFFORT (or LIKELY) as a float; NaN if none
+    'int_efforts',  # 1 if EFFORT was an int, so that it reads back as one
+    'summaries',    # 1 if the task has children, else 0
+    'extras',       # dict of index: dict of the task's other keys, for tasks that have any
+])
+
+# Builds the store from task dicts (or mappings) in pre-order.
+def build_task_store(tasks):
+    strings = []
+    string_codes = {}
+    def _code(string):
+        code = string_codes.get(string, None)
+        if code is None:
+            code = string_codes[string] = len(strings)
+            strings.append(string)
+        return code
+
+    names = index_array()
+    categories = index_array()
+    descs = index_array()
+    efforts = array.array('d')
+    int_efforts = array.array('b')
+    summaries = array.array('b')
+    extras = {}
+    for index, task in enumerate(tasks):
+        name = task[NAME]
+        names.append(_code(name))
+        categories.append(_code(parse_category(name)))
+        descs.append(_code(task[DESC]) if DESC in task else NO_STRING)
+        effort = task.get(EFFORT, None)
+        if effort is None:
+            # scheduled by its most likely effort
+            effort = task.get(LIKELY, None)
+        efforts.append(math.nan if effort is None else effort)
+        int_efforts.append(1 if isinstance(effort, int) else 0)
+        summaries.append(1 if has_children(task) else 0)
+        if len(task) > 2:
+            other = dict((key, value) for key, value in task.items() if key not in _column_keys)
+            if other:
+                extras[index] = other
+    return TaskStore(tuple(strings), names, categories, descs, efforts, int_efforts, summaries, extras)
+
+
+def get_name(store, index):
+    return store.strings[store.names[index]]
+
+def get_category(store, index):
+    return store.strings[store.categories[index]]
+
+def get_desc(store, index, default=None):
+    code = store.descs[index]
+    return default if code == NO_STRING else store.strings[code]
+
+def has_effort(store, index):
+    return not math.isnan(store.efforts[index])
+
+def get_effort(store, index, default=0):
+    effort = store.efforts[index]
+    if math.isnan(effort):
+        return default
+    return int(effort) if store.int_efforts[index] else effort
+
+
+# Read-only mapping view of one task of a CompiledPlan.  CHILDREN holds
+# the TaskRows of the children (without SEQUENCE/PARALLEL markers); DEPS
+# is not kept.
+class TaskRow(Mapping):
+    __slots__ = ('_rows', '_index')
+
+    def __init__(self, rows, index):
+        self._rows = rows
+        self._index = index
+
+    def _keys(self):
+        store = self._rows.store
+        index = self._index
+        keys = [ID, NAME]
+        if store.descs[index] != NO_STRING:
+            keys.append(DESC)
+        if has_effort(store, index):
+            keys.append(EFFORT)
+        if store.summaries[index]:
+            keys.append(CHILDREN)
+        keys.extend(store.extras.get(index, ()))
+        return keys
+
+    def __getitem__(self, key):
+        rows = self._rows
+        store = rows.store
+        index = self._index
+        if key == ID:
+            return rows.ids[index]
+        if key == NAME:
+            return get_name(store, index)
+        if key == DESC and store.descs[index] != NO_STRING:
+            return get_desc(store, index)
+        if key == EFFORT and has_effort(store, index):
+            return get_effort(store, index)
+        if key == CHILDREN and store.summaries[index]:
+            return tuple(rows[child_index] for child_index in rows.children[index])
+        return store.extras.get(index, {})[key]
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+    def __repr__(self):
+        return 'TaskRow({0!r})'.format(dict((key, self[key]) for key in self._keys() if key != CHILDREN))
+
+# The tasks of a CompiledPlan, as TaskRows.
+class TaskRows(Sequence):
+    __slots__ = ('store', 'ids', 'children')
+
+    def __init__(self, store, ids, children):
+        self.store = store
+        self.ids = ids
+        self.children = children
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.ids)
+        if not 0 <= index < len(self.ids):
+            raise IndexError('task index out of range')
+        return TaskRow(self, index)
@@ -1,5 +1,7 @@
 import sys
+import itertools
 import xml.sax.saxutils
+from collections import ChainMap
 from .keywords import *
 
 def xml_escape_attr(string):
@@ -8,12 +10,22 @@ def xml_escape_attr(string):
 def xml_escape_elem(string):
     return xml.sax.saxutils.escape(string)
 
-_global_auto_id = 100
-def _next_global_auto_id():
-    global _global_auto_id
-    auto_id = '_auto' + str(_global_auto_id)
-    _global_auto_id += 1
-    return auto_id
+_first_auto_id = 100
+
+def _format_auto_id(number):
+    return '_auto' + str(number)
+
+# Returns a function that returns a new auto ID on every call, numbered from
+# _first_auto_id.  Every export allocates its own, so that exporting the same
+# plan always generates the same IDs, in any process.
+def auto_id_allocator():
+    numbers = itertools.count(_first_auto_id)
+    return lambda: _format_auto_id(next(numbers))
+
+# Returns a copy-on-write view of task: reads fall through to task, writes
+# go to a small overlay dict, so task itself is never modified.
+def task_view(task, **overlay):
+    return ChainMap(overlay, task)
 
 def parse_category(name):
     index_of_dash = name.find('-')
@@ -25,11 +37,104 @@ def has_children(task):
     return (CHILDREN in task) and (len(task[CHILDREN]) != 0)
 
 
-def sanitize_tasks(plan, id_to_task, add_child_dependencies):
-    def _sanitize_recursive(task, auto_predecessor_stack):
+# Tree traversal
+#
+#   The walks below use an explicit stack instead of recursion, so that
+#   plans of any depth can be processed without hitting the recursion limit.
+#   Tasks are numbered by their position in pre-order; the plan root is 0.
+
+# Pre-order walk.  Yields (task, parent_position, level, sequence_predecessor_position)
+# where level is 0 for the root, and sequence_predecessor_position is the
+# position of the previous sibling within a SEQUENCE (-1 if none or for the root).
+#
+# A task is yielded before its children are read, so the caller may modify
+# it (e.g. assign its ID) during the walk.
+def iter_preorder(plan):
+    yield (plan, -1, 0, -1)
+    position = 0
+    # frame = [position, level, children iterator, sequence_predecessor_position, in_sequence]
+    stack = [[0, 0, iter(plan[CHILDREN] if has_children(plan) else ()), -1, False]]
+    while stack:
+        frame = stack[-1]
+        for child in frame[2]:
+            if child == SEQUENCE:
+                frame[3] = -1
+                frame[4] = True
+            elif child == PARALLEL:
+                frame[3] = -1
+                frame[4] = False
+            else:
+                position += 1
+                yield (child, frame[0], frame[1] + 1, frame[3])
+                if frame[4]:
+                    frame[3] = position
+                if has_children(child):
+                    stack.append([position, frame[1] + 1, iter(child[CHILDREN]), -1, False])
+                break
+        else:
+            stack.pop()
+
+# Yields the child tasks of task, skipping the SEQUENCE and PARALLEL markers.
+def iter_child_tasks(task):
+    for child in task.get(CHILDREN, ()):
+        if isinstance(child, str):
+            continue
+        yield child
+
+# Post-order walk.  Yields (task, level) after all of the task's children.
+#
+# get_children returns the children of a node; by default the nodes are
+# the task dicts of a plan.  With compiled.children.__getitem__ they are
+# the task indices of a compiled plan, from root 0.
+def iter_postorder(plan, get_children=iter_child_tasks):
+    stack = [(plan, 0, iter(get_children(plan)))]
+    while stack:
+        task, level, children = stack[-1]
+        for child in children:
+            stack.append((child, level + 1, iter(get_children(child))))
+            break
+        else:
+            stack.pop()
+            yield (task, level)
+
+# Assigns missing IDs and adds the implied dependencies (SEQUENCE, and with
+# add_child_dependencies, parent -> child) to DEPS; fills id_to_task.
+#
+# With in_place=False the plan is left untouched: every task is replaced by
+# a task_view holding its ID, its own copy of DEPS and (for summaries) the
+# views of its children, and the view of the plan root is returned.
+#
+# Auto IDs are numbered per call (or by next_auto_id, from auto_id_allocator,
+# to share the numbering between calls), so repeated calls agree.
+def sanitize_tasks(plan, id_to_task, add_child_dependencies, in_place=True, next_auto_id=None):
+    if next_auto_id is None:
+        next_auto_id = auto_id_allocator()
+    # views and their parents' positions, by position (only with in_place=False)
+    views = []
+    parent_positions = []
+    # tasks along the path to the current task, indexed by level
+    path = []
+    # ID of the SEQUENCE predecessor of each task along the path (None if none)
+    auto_predecessor_stack = []
+    # key = position, value = task ID; only SEQUENCE predecessors are looked up
+    position_to_id = {}
+    for position, (task, parent_position, level, sequence_predecessor_position) in enumerate(iter_preorder(plan)):
+        if not in_place:
+            task = task_view(task)
+            if DEPS in task:
+                task[DEPS] = list(task[DEPS])
+            views.append(task)
+            parent_positions.append(parent_position)
         if ID not in task:
-            task[ID] = _next_global_auto_id()
+            task[ID] = next_auto_id()
         id_to_task[task[ID]] = task
+        position_to_id[position] = task[ID]
+
+        del path[level:]
+        path.append(task)
+        del auto_predecessor_stack[max(level - 1, 0):]
+        if level:
+            auto_predecessor_stack.append(position_to_id.get(sequence_predecessor_position, None))
 
         if DEPS not in task:
             task[DEPS] = []
@@ -37,29 +142,22 @@ def sanitize_tasks(plan, id_to_task, add_child_dependencies):
             for auto_predecessor_id in auto_predecessor_stack:
                 if auto_predecessor_id:
                     task[DEPS].append(auto_predecessor_id)
+            if level:
+                path[level - 1][DEPS].append(task[ID])
         elif len(auto_predecessor_stack):
             auto_predecessor_id = auto_predecessor_stack[-1]
             if auto_predecessor_id:
                 task[DEPS].append(auto_predecessor_id)
 
-        children = task.get(CHILDREN, None)
-        if children:
-            auto_predecessor_stack.append(None)
-            in_sequence = False
-            for child in children:
-                if child == SEQUENCE:
-                    auto_predecessor_stack[-1] = None
-                    in_sequence = True
-                elif child == PARALLEL:
-                    auto_predecessor_stack[-1] = None
-                    in_sequence = False
-                else:
-                    _sanitize_recursive(child, auto_predecessor_stack)
-                    if add_child_dependencies:
-                        task[DEPS].append(child[ID])
-                    if in_sequence:
-                        auto_predecessor_stack[-1] = child[ID]
-            auto_predecessor_stack.pop()
-
-    auto_predecessor_stack = []
-    _sanitize_recursive(plan, auto_predecessor_stack)
+    if in_place:
+        return plan
+    # the views of the children replace the children; markers are kept
+    child_views = [[] for view in views]
+    for position, view in enumerate(views):
+        if position:
+            child_views[parent_positions[position]].append(view)
+    for position, view in enumerate(views):
+        if has_children(view):
+            next_child_view = iter(child_views[position]).__next__
+            view[CHILDREN] = [child if isinstance(child, str) else next_child_view() for child in view[CHILDREN]]
+    return views[0]
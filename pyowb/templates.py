@@ -0,0 +1,95 @@
+# Output templates.
+#
+#   The writers fill the same XML snippet for every task.  A Template is
+#   parsed once, when the writer module is imported, into a %-format string
+#   with one positional slot per field; rendering a task is then a single
+#   % operation on a tuple, with no dict of locals and no re-parsing.
+#
+#   Templates use str.format syntax, e.g. '<UID>{_intid}</UID>'.  Format
+#   specs and conversions are not supported; format the value beforehand.
+
+import operator
+import string
+
+
+class Template:
+    def __init__(self, text):
+        chunks = []
+        slots = []
+        names = []
+        for literal, field_name, format_spec, conversion in string.Formatter().parse(text):
+            chunks.append(literal.replace('%', '%%'))
+            if field_name is None:
+                continue
+            if format_spec or conversion:
+                raise ValueError('template field "{0}" must not have a format spec or conversion'.format(field_name))
+            if field_name not in names:
+                names.append(field_name)
+            slots.append(names.index(field_name))
+            chunks.append('%s')
+        self.text = text
+        # distinct field names, in order of first appearance; render() takes values in this order
+        self.names = tuple(names)
+        self._format = ''.join(chunks)
+        # a field used more than once needs its value repeated in the % tuple
+        self._repeat = None
+        if len(slots) != len(names):
+            self._repeat = operator.itemgetter(*slots)
+
+    # values are given in the order of self.names
+    def render(self, *values):
+        if len(values) != len(self.names):
+            raise TypeError('template expects {0} values ({1}), got {2}'.format(len(self.names), ', '.join(self.names), len(values)))
+        if self._repeat is not None:
+            values = self._repeat(values)
+        return self._format % values
+
+    # Renders one copy of the template per tuple of values, joined into one string.
+    def render_rows(self, rows):
+        format_string = self._format
+        if self._repeat is not None:
+            repeat = self._repeat
+            return ''.join([format_string % repeat(values) for values in rows])
+        return ''.join([format_string % values for values in rows])
+
+    def render_mapping(self, mapping):
+        return self.render(*[mapping[name] for name in self.names])
+
+
+# Returns a Template for text with its leading newline removed, which lets
+# templates be written as triple-quoted strings starting on their own line.
+def block_template(text):
+    return Template(text.lstrip('\n'))
+
+
+# Collects small strings and writes them to outfile in large chunks.
+class ChunkedWriter:
+    def __init__(self, outfile, chunk_size=1 << 16):
+        self.outfile = outfile
+        self.chunk_size = chunk_size
+        self.characters_written = 0
+        self._chunks = []
+        self._pending = 0
+
+    def write(self, text):
+        self._chunks.append(text)
+        self._pending += len(text)
+        if self._pending >= self.chunk_size:
+            self.flush()
+
+    def writelines(self, texts):
+        for text in texts:
+            self.write(text)
+
+    def flush(self):
+        if self._chunks:
+            self.outfile.write(''.join(self._chunks))
+            self.characters_written += self._pending
+            self._chunks = []
+            self._pending = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
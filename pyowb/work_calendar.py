@@ -0,0 +1,156 @@
+# Working-day calendar.
+#
+#   The schedule is computed in working days; a WorkCalendar converts those
+#   offsets into dates.  It keeps a sorted table of the ordinals of every
+#   working day it has seen, so converting a whole column of offsets costs
+#   one bisect for the start date and then one list lookup per offset.
+
+import bisect
+import math
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+# Monday to Friday, in the order used by datetime.weekday() and numpy.busday_offset.
+DEFAULT_WEEKMASK = '1111100'
+
+# Number of extra days added whenever the table has to grow.
+_table_growth_days = 366
+
+
+def _as_ordinal(day):
+    if isinstance(day, datetime):
+        day = day.date()
+    return day.toordinal()
+
+
+class WorkCalendar:
+    # weekmask: 7 flags, Monday first, either as a '1'/'0' string or a sequence of bools.
+    # holidays: dates (or datetimes) that are never working days.
+    def __init__(self, weekmask=DEFAULT_WEEKMASK, holidays=()):
+        if isinstance(weekmask, str):
+            weekmask = [flag == '1' for flag in weekmask]
+        self.weekmask = tuple(bool(flag) for flag in weekmask)
+        if len(self.weekmask) != 7 or not any(self.weekmask):
+            raise ValueError('weekmask must have 7 entries, at least one of them a working day')
+        self.holidays = frozenset(_as_ordinal(holiday) for holiday in holidays)
+        # (first_ordinal, end_ordinal, working_ordinals): the table covers
+        # ordinals [first_ordinal, end_ordinal).  It is replaced, never
+        # modified, so a calendar may be shared by concurrent exports: each
+        # conversion works on the table it started with.
+        self._table = None
+
+    def is_working_day(self, day):
+        ordinal = _as_ordinal(day)
+        return self._is_working_ordinal(ordinal)
+
+    def _is_working_ordinal(self, ordinal):
+        # date.fromordinal(1) is a monday, so (ordinal - 1) % 7 is the weekday
+        return self.weekmask[(ordinal - 1) % 7] and ordinal not in self.holidays
+
+    def _working_ordinals_between(self, first_ordinal, end_ordinal):
+        is_working_ordinal = self._is_working_ordinal
+        return [ordinal for ordinal in range(first_ordinal, end_ordinal) if is_working_ordinal(ordinal)]
+
+    # Returns a table that covers [first_ordinal, end_ordinal).
+    def _cover(self, first_ordinal, end_ordinal):
+        table = self._table
+        if table is None:
+            table = (first_ordinal, first_ordinal, [])
+        table_first_ordinal, table_end_ordinal, working_ordinals = table
+        if first_ordinal >= table_first_ordinal and end_ordinal <= table_end_ordinal:
+            return table
+        if first_ordinal < table_first_ordinal:
+            first_ordinal = min(first_ordinal, table_first_ordinal - _table_growth_days)
+            working_ordinals = self._working_ordinals_between(first_ordinal, table_first_ordinal) + working_ordinals
+            table_first_ordinal = first_ordinal
+        if end_ordinal > table_end_ordinal:
+            end_ordinal = max(end_ordinal, table_end_ordinal + _table_growth_days)
+            working_ordinals = working_ordinals + self._working_ordinals_between(table_end_ordinal, end_ordinal)
+            table_end_ordinal = end_ordinal
+        table = self._table = (table_first_ordinal, table_end_ordinal, working_ordinals)
+        return table
+
+    # Returns (working_ordinals, position): a table and the position in it of
+    # the first working day on or after start_ordinal, with at least
+    # min_before working days before it and min_after after it.
+    def _position(self, start_ordinal, min_before, min_after):
+        first_ordinal, end_ordinal, working_ordinals = self._cover(start_ordinal, start_ordinal + 1)
+        while True:
+            position = bisect.bisect_left(working_ordinals, start_ordinal)
+            missing_before = min_before - position
+            missing_after = position + min_after + 1 - len(working_ordinals)
+            if missing_before <= 0 and missing_after <= 0:
+                return (working_ordinals, position)
+            # every week has at least one working day; holidays are made up by looping
+            first_ordinal, end_ordinal, working_ordinals = self._cover(first_ordinal - 7*max(missing_before, 0),
+                                                                       end_ordinal + 7*max(missing_after, 0))
+
+    # Returns the number of working days in [begin, end).
+    def count_working_days(self, begin, end):
+        begin_ordinal = _as_ordinal(begin)
+        end_ordinal = _as_ordinal(end)
+        if end_ordinal < begin_ordinal:
+            return -self.count_working_days(end, begin)
+        working_ordinals = self._cover(begin_ordinal, end_ordinal)[2]
+        return (bisect.bisect_left(working_ordinals, end_ordinal) -
+                bisect.bisect_left(working_ordinals, begin_ordinal))
+
+    # Converts offsets in working days from start_date into datetimes, in one batch.
+    #
+    # Offset 0 is the first working day on or after start_date; the time of day
+    # of start_date is kept, and fractional offsets add a fraction of a day.
+    # Finish offsets are exclusive: a task finishing after N whole working
+    # days ends at midnight following its N-th working day, rather than at
+    # the start of the next working day (which may be after a weekend).
+    def to_datetimes(self, start_date, offsets, is_finish=False):
+        if not isinstance(start_date, datetime):
+            start_date = datetime.combine(start_date, datetime.min.time())
+        offsets = list(offsets)
+        if not offsets:
+            return []
+        start_ordinal = start_date.toordinal()
+        min_whole_days = int(math.floor(min(offsets)))
+        max_whole_days = int(math.floor(max(offsets)))
+        working_ordinals, position = self._position(start_ordinal, max(-min_whole_days, 0), max(max_whole_days, 0))
+
+        datetimes = []
+        for days in offsets:
+            whole_days = int(math.floor(days))
+            fraction = days - whole_days
+            if is_finish and fraction == 0 and whole_days > 0:
+                ordinal = working_ordinals[position + whole_days - 1] + 1
+            else:
+                ordinal = working_ordinals[position + whole_days]
+            datetimes.append(start_date + timedelta(days=ordinal - start_ordinal + fraction))
+        return datetimes
+
+    def to_datetime(self, start_date, days, is_finish=False):
+        return self.to_datetimes(start_date, (days,), is_finish)[0]
+
+
+ScheduleDates = namedtuple('ScheduleDates', [
+    'early_start',
+    'early_finish',
+    'late_start',
+    'late_finish',
+])
+
+# Converts every column of a Schedule into datetimes, one batch per column.
+def schedule_to_dates(schedule, calendar, start_date):
+    return ScheduleDates(
+        early_start=calendar.to_datetimes(start_date, schedule.early_start),
+        early_finish=calendar.to_datetimes(start_date, schedule.early_finish, is_finish=True),
+        late_start=calendar.to_datetimes(start_date, schedule.late_start),
+        late_finish=calendar.to_datetimes(start_date, schedule.late_finish, is_finish=True),
+    )
+
+# Formats every column of ScheduleDates with date.strftime(date_format).
+# Dates repeat a lot within a plan, so each distinct date is formatted once.
+def format_schedule_dates(dates, date_format):
+    formatted = {}
+    def _format(date):
+        text = formatted.get(date, None)
+        if text is None:
+            text = formatted[date] = date.strftime(date_format)
+        return text
+    return ScheduleDates(*[[_format(date) for date in column] for column in dates])
@@ -0,0 +1,24 @@
+from pyowb import *
+from pyowb.batch import export_batch
+
+
+def test_exiting_plan_fails_only_its_own_job(tmp_path):
+    (tmp_path / 'bad.py').write_text('import sys\nsys.exit(3)\n')
+    (tmp_path / 'good.py').write_text("plan = {'name' : 'root', 'children' : [{'name' : 'a', 'effort' : 1}]}\n")
+    sources = [str(tmp_path / 'bad.py'), str(tmp_path / 'good.py')]
+    results = export_batch(sources, ['owb'], str(tmp_path / 'out'), datetime(2024, 1, 8), max_workers=2)
+    assert [result.source for result in results] == sources
+    assert 'SystemExit' in results[0].error
+    assert results[1].error is None
+    assert (tmp_path / 'out' / 'good.owb.xml').exists()
+
+def test_strict_fails_the_job_of_a_cyclic_plan(tmp_path):
+    (tmp_path / 'cyclic.json').write_text('{"name" : "root", "children" : ['
+                                         '{"id" : "a", "name" : "a", "effort" : 1, "deps" : ["b"]},'
+                                         '{"id" : "b", "name" : "b", "effort" : 1, "deps" : ["a"]}]}')
+    source = str(tmp_path / 'cyclic.json')
+    results = export_batch([source], ['owb'], str(tmp_path / 'out'), datetime(2024, 1, 8), max_workers=1)
+    assert results[0].error is None
+    results = export_batch([source], ['owb'], str(tmp_path / 'strict'), datetime(2024, 1, 8), max_workers=1, strict=True)
+    assert 'DependencyCycleError' in results[0].error
+    assert not (tmp_path / 'strict' / 'cyclic.owb.xml').exists()
@@ -0,0 +1,16 @@
+from pyowb.bench import generate_plan, run_benchmarks
+from pyowb.tasks import iter_preorder
+
+
+def test_generate_plan_is_reproducible():
+    assert generate_plan(300) == generate_plan(300)
+    assert generate_plan(300, seed=2) != generate_plan(300)
+    assert sum(1 for visit in iter_preorder(generate_plan(300))) == 300
+
+def test_run_benchmarks_times_every_phase():
+    results = run_benchmarks([200], fan_out=4)
+    assert results['options']['fan_out'] == 4
+    assert results['options']['depth'] == 7
+    phases = [record['phase'] for record in results['results']]
+    assert phases == ['generate_plan', 'sanitize_tasks', 'compile_plan', 'validate_tasks', 'leaf_expansion',
+                      'plan_to_owb_xml', 'plan_to_project_libre_xml', 'plan_to_ganttproject']
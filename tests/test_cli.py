@@ -0,0 +1,76 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import pytest
+
+_package_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _plan(effort):
+    return {'id' : 'r', 'name' : 'root', 'children' : ['sequence',
+        {'id' : 'a', 'name' : 'a', 'effort' : effort},
+        {'id' : 'b', 'name' : 'b', 'effort' : 1},
+    ]}
+
+def _run(arguments, **kwargs):
+    environment = dict(os.environ, PYTHONPATH=_package_directory)
+    return subprocess.run([sys.executable, '-m', 'pyowb'] + arguments, env=environment,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, **kwargs)
+
+def _wait_for(condition, seconds=20):
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+def test_export_writes_every_format(tmp_path):
+    (tmp_path / 'team.json').write_text(json.dumps(_plan(2)))
+    out = tmp_path / 'out'
+    result = _run(['export', str(tmp_path / 'team.json'), '-f', 'owb', '-f', 'project_libre', '-f', 'ganttproject',
+                   '-o', str(out), '--start-date', '2024-01-08'])
+    assert result.returncode == 0, result.stderr
+    assert sorted(os.listdir(str(out))) == ['team.gan', 'team.owb.xml', 'team.project_libre.xml']
+    assert 'start="2024-01-08T00:00:00"' in (out / 'team.owb.xml').read_text()
+    # a second run finds nothing to rewrite
+    result = _run(['export', str(tmp_path / 'team.json'), '-o', str(out), '--start-date', '2024-01-08'])
+    assert 'unchanged' in result.stderr
+
+def test_compile_and_batch(tmp_path):
+    (tmp_path / 'a.json').write_text(json.dumps(_plan(2)))
+    (tmp_path / 'b.json').write_text(json.dumps(_plan(3)))
+    image = str(tmp_path / 'a.pyowbc')
+    assert _run(['compile', str(tmp_path / 'a.json'), '-o', image]).returncode == 0
+    result = _run(['batch', image, str(tmp_path / 'b.json'), '-o', str(tmp_path / 'out'), '-j', '2'])
+    assert result.returncode == 0, result.stderr
+    assert sorted(os.listdir(str(tmp_path / 'out'))) == ['a.owb.xml', 'b.owb.xml']
+
+def test_missing_source_fails(tmp_path):
+    result = _run(['export', str(tmp_path / 'missing.json'), '-o', str(tmp_path)])
+    assert result.returncode != 0
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='needs SIGINT')
+def test_watch_exports_again_on_change(tmp_path):
+    source = tmp_path / 'team.json'
+    source.write_text(json.dumps(_plan(2)))
+    output = tmp_path / 'team.owb.xml'
+    environment = dict(os.environ, PYTHONPATH=_package_directory)
+    process = subprocess.Popen([sys.executable, '-m', 'pyowb', 'export', str(source), '-o', str(tmp_path),
+                                '--start-date', '2024-01-08', '--watch', '--interval', '0.05'],
+                               env=environment, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        assert _wait_for(output.exists)
+        first = output.read_text()
+        # a new modification time, even on coarse file systems
+        time.sleep(0.05)
+        source.write_text(json.dumps(_plan(5)))
+        os.utime(str(source), (time.time() + 2, time.time() + 2))
+        assert _wait_for(lambda: output.read_text() != first)
+    finally:
+        process.send_signal(signal.SIGINT)
+        process.communicate(timeout=20)
+    assert process.returncode == 0
@@ -0,0 +1,49 @@
+from pyowb import *
+from pyowb.bench import generate_plan
+
+
+def _export_all(tmp_path, plan, cache, suffix):
+    contents = []
+    for function, basename in ((plan_to_owb_xml, 'plan.owb.xml'), (plan_to_project_libre_xml, 'plan.xml'),
+                               (plan_to_ganttproject, 'plan.gan')):
+        filename = str(tmp_path / (suffix + basename))
+        function(filename, plan, context=make_export_context(datetime(2024, 1, 8), cache=cache))
+        with open(filename, 'rb') as infile:
+            contents.append(infile.read())
+    return contents
+
+def test_cached_export_after_an_edit_is_identical(tmp_path):
+    cache = ExportCache(str(tmp_path / 'cache'), max_unit_size=16)
+    plan = generate_plan(400)
+    _export_all(tmp_path, plan, cache, 'first.')
+    # an edited effort moves the dates of the tasks after it
+    plan[CHILDREN][0][CHILDREN][0].setdefault(EFFORT, 1)
+    plan[CHILDREN][0][CHILDREN][0][EFFORT] += 7
+    hits = cache.hits
+    cached = _export_all(tmp_path, plan, cache, 'cached.')
+    assert cache.hits > hits
+    assert cached == _export_all(tmp_path, plan, None, 'uncached.')
+
+def test_analysis_entry_follows_the_dependency_graph(tmp_path):
+    cache = ExportCache(str(tmp_path / 'cache'))
+    plan = {ID : 'r', NAME : 'root', CHILDREN : [SEQUENCE, {ID : 'a', NAME : 'a', EFFORT : 1}, {ID : 'b', NAME : 'b', EFFORT : 2}]}
+    key = analysis_cache_key(compile_plan(plan))
+    compile_plan(plan, cache=cache)
+    assert cache.get_object(key) is not None
+    # a new name keeps the analysis, a new effort does not
+    plan[CHILDREN][1][NAME] = 'renamed'
+    assert analysis_cache_key(compile_plan(plan)) == key
+    plan[CHILDREN][1][EFFORT] = 3
+    new_key = analysis_cache_key(compile_plan(plan))
+    assert new_key != key
+    assert cache.get_object(new_key) is None
+    compiled = compile_plan(plan, cache=cache)
+    assert compiled.schedule.project_finish == 5
+    assert cache.get_object(new_key)[1] == compiled.schedule
+
+def test_eviction_keeps_the_cache_small(tmp_path):
+    cache = ExportCache(str(tmp_path / 'cache'), max_bytes=4096)
+    for number in range(20):
+        cache.put_text(make_cache_key('test', number), 'x' * 1000)
+    assert sum(size for path, mtime, size in cache._entries()) <= 4096
+    assert cache.get_text(make_cache_key('test', 19)) == 'x' * 1000
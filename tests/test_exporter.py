@@ -0,0 +1,53 @@
+import re
+import pytest
+import xml.etree.ElementTree as ElementTree
+from datetime import datetime
+from pyowb import *
+from pyowb.exporter import *
+from pyowb.loaders import load_plan
+from pyowb.plan_image import save_plan_image
+from pyowb.cli import main as cli_main
+
+
+def _plan():
+    return {ID : 'r', NAME : 'root', CHILDREN : [SEQUENCE,
+        {ID : 'a', NAME : 'a', EFFORT : 2},
+        {ID : 'b', NAME : 'b', EFFORT : 1},
+    ]}
+
+def test_every_format_takes_the_start_date():
+    for export_format in EXPORT_FORMATS:
+        assert export_options(export_format, datetime(2024, 1, 8))['start_date'] == datetime(2024, 1, 8)
+
+def test_owb_and_ganttproject_start_on_the_start_date(tmp_path):
+    start_date = datetime(2024, 1, 8)
+    plan_to_owb_xml(str(tmp_path / 'plan.owb.xml'), _plan(), start_date=start_date)
+    root = ElementTree.parse(str(tmp_path / 'plan.owb.xml')).getroot()
+    assert [task.get('start') for task in root.iter('Task')][1:] == ['2024-01-08T00:00:00', '2024-01-10T00:00:00']
+    plan_to_ganttproject(str(tmp_path / 'plan.gan'), _plan(), context=make_export_context(start_date))
+    with open(str(tmp_path / 'plan.gan')) as infile:
+        assert re.findall(r'<task .* start="([-0-9]*)"', infile.read()) == ['2024-01-08', '2024-01-08', '2024-01-10']
+
+def _write_cyclic_plan(tmp_path):
+    (tmp_path / 'cyclic.json').write_text('{"name" : "root", "children" : ['
+                                         '{"id" : "a", "name" : "a", "effort" : 1, "deps" : ["b"]},'
+                                         '{"id" : "b", "name" : "b", "effort" : 1, "deps" : ["a"]}]}')
+    return str(tmp_path / 'cyclic.json')
+
+def test_strict_exporter_raises_on_cycle(tmp_path):
+    source = _write_cyclic_plan(tmp_path)
+    PlanExporter(source, ['owb'], str(tmp_path)).export()
+    with pytest.raises(DependencyCycleError):
+        PlanExporter(source, ['owb'], str(tmp_path), strict=True).export()
+    # a plan image is checked when it is loaded
+    image = str(tmp_path / 'cyclic.pyowbc')
+    save_plan_image(compile_plan(load_plan(source)), image)
+    with pytest.raises(DependencyCycleError):
+        PlanExporter(image, ['owb'], str(tmp_path), strict=True).export()
+
+def test_strict_command_line_fails_on_cycle(tmp_path, capsys):
+    source = _write_cyclic_plan(tmp_path)
+    assert cli_main(['export', source, '-o', str(tmp_path / 'out')]) == 0
+    assert cli_main(['export', source, '-o', str(tmp_path / 'strict'), '--strict']) == 1
+    assert 'dependency cycle' in capsys.readouterr().err
+    assert not (tmp_path / 'strict' / 'cyclic.owb.xml').exists()
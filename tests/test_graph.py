@@ -0,0 +1,35 @@
+import pytest
+from pyowb import *
+
+
+def test_transitive_reduction_drops_implied_dependencies():
+    assert transitive_reduction({'c' : ['a', 'b'], 'b' : ['a']}) == {'c' : ['b'], 'b' : ['a']}
+
+def test_transitive_reduction_keeps_repeated_predecessor_once():
+    assert transitive_reduction({'c' : ['a', 'a'], 'b' : ['a']}) == {'c' : ['a'], 'b' : ['a']}
+    assert transitive_reduction({'c' : ['a', 'b', 'a'], 'b' : ['a']}) == {'c' : ['b'], 'b' : ['a']}
+
+def test_transitive_reduction_of_cycle_is_unreduced():
+    assert transitive_reduction({'a' : ['b', 'b'], 'b' : ['a']}) == {'a' : ['b'], 'b' : ['a']}
+
+def _cyclic_plan():
+    return {ID : 'r', NAME : 'root', CHILDREN : [
+        {ID : 'a', NAME : 'a', EFFORT : 1, DEPS : ['b']},
+        {ID : 'b', NAME : 'b', EFFORT : 1, DEPS : ['a']},
+    ]}
+
+def test_cycle_is_reported(capsys):
+    compile_plan(_cyclic_plan())
+    assert 'dependency cycle' in capsys.readouterr().err
+
+def test_cycle_raises_when_strict():
+    with pytest.raises(DependencyCycleError):
+        compile_plan(_cyclic_plan(), strict=True)
+
+def test_writers_raise_on_cycle_when_strict(tmp_path):
+    filename = str(tmp_path / 'plan.xml')
+    for writer in (plan_to_owb_xml, plan_to_project_libre_xml, plan_to_ganttproject):
+        with pytest.raises(DependencyCycleError):
+            writer(filename, _cyclic_plan(), strict=True)
+    with pytest.raises(DependencyCycleError):
+        plan_to_owb_xml(filename, _cyclic_plan(), context=make_export_context(strict=True))
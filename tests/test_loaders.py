@@ -0,0 +1,112 @@
+import io
+import json
+import pytest
+from pyowb import *
+from pyowb.loaders import *
+
+
+def _plan():
+    return {ID : 'r', NAME : 'Root été "quoted"', RESOURCES : {'alice' : 2}, CHILDREN : [SEQUENCE,
+        {ID : 'a', NAME : 'QA - a', EFFORT : 2, DESC : 'line\nbreak\ttab \\ slash'},
+        {ID : 's', NAME : 's', DEPS : ['a'], CHILDREN : [
+            {ID : 'b', NAME : 'b', EFFORT : 1.5, RESOURCE : ['alice', 'bob'], 'flag' : True, 'none' : None},
+            PARALLEL,
+            {ID : 'c', NAME : 'c', EFFORT : 0.25e1, DEPS : [], CHILDREN : []},
+        ]},
+    ]}
+
+def test_streamed_json_matches_json_load():
+    text = json.dumps(_plan(), indent=1)
+    for chunk_size in (1, 2, 3, 7, 64, 1 << 16):
+        assert read_json_plan(io.StringIO(text), chunk_size=chunk_size) == json.loads(text), chunk_size
+
+def test_streamed_json_reads_deep_nesting():
+    depth = 5000
+    text = '{"name" : "root", "children" : [' * depth + '{"name" : "leaf"}' + ']}' * depth
+    node = read_json_plan(io.StringIO(text), chunk_size=100)
+    for level in range(depth):
+        node = node[CHILDREN][0]
+    assert node == {NAME : 'leaf'}
+
+def test_yaml_matches_the_plan():
+    pytest.importorskip('yaml')
+    text = '''
+id: r
+name: "Root \\u00e9t\\u00e9 \\"quoted\\""
+resources: {alice: 2}
+children:
+  - sequence
+  - {id: a, name: QA - a, effort: 2, desc: "line\\nbreak\\ttab \\\\ slash"}
+  - id: s
+    name: s
+    deps: [a]
+    children:
+      - {id: b, name: b, effort: 1.5, resource: [alice, bob], flag: true, none: null}
+      - parallel
+      - {id: c, name: c, effort: 0.25e+1, deps: [], children: []}
+'''
+    assert read_yaml_plan(io.StringIO(text)) == _plan()
+
+def test_toml_matches_the_plan():
+    text = b'''
+id = "r"
+name = "Root \\u00e9t\\u00e9 \\"quoted\\""
+resources = {alice = 2}
+children = [
+  "sequence",
+  {id = "a", name = "QA - a", effort = 2, desc = "line\\nbreak\\ttab \\\\ slash"},
+  {id = "s", name = "s", deps = ["a"], children = [
+    {id = "b", name = "b", effort = 1.5, resource = ["alice", "bob"], flag = true},
+    "parallel",
+    {id = "c", name = "c", effort = 0.25e1, deps = [], children = []},
+  ]},
+]
+'''
+    plan = _plan()
+    # TOML has no null
+    del plan[CHILDREN][2][CHILDREN][0]['none']
+    assert read_toml_plan(io.BytesIO(text)) == plan
+
+@pytest.mark.parametrize('text', ['', '{"name" : "root"', '{"name" : "root",}', '{"name" : "root"} x', '["root"]',
+                                  '{"name" : "root", "children" : [{"name" : }]}'])
+def test_malformed_json_raises(text):
+    with pytest.raises(PlanSourceError):
+        read_json_plan(io.StringIO(text), chunk_size=3)
+
+def test_malformed_yaml_and_toml_raise():
+    pytest.importorskip('yaml')
+    with pytest.raises(PlanSourceError):
+        read_yaml_plan(io.StringIO('- a list\n- not a plan\n'))
+    with pytest.raises(PlanSourceError):
+        read_yaml_plan(io.StringIO('name: [unclosed\n'))
+    with pytest.raises(PlanSourceError):
+        read_toml_plan(io.BytesIO(b'name = \n'))
+
+def test_malformed_xml_raises():
+    for text in (b'', b'<WORKBENCH_PROJECT><Tasks>', b'<html/>'):
+        with pytest.raises(PlanSourceError):
+            read_xml_plan(io.BytesIO(text))
+
+def test_mspdi_round_trip_keeps_tasks_and_efforts(tmp_path):
+    compiled = compile_plan(_plan())
+    filename = str(tmp_path / 'plan.xml')
+    plan_to_project_libre_xml(filename, compiled, start_date=datetime(2024, 1, 8))
+    with open(filename, 'rb') as infile:
+        read_back = compile_plan(read_xml_plan(infile))
+    efforts = dict(zip(compiled.ids, compiled.store.efforts))
+    leaves = [compiled.ids[index] for index in compiled.leaf_order]
+    assert [read_back.ids[index] for index in read_back.leaf_order] == leaves
+    for index in read_back.leaf_order:
+        assert get_effort(read_back.store, index) == efforts[read_back.ids[index]]
+    assert read_back.schedule.project_finish == compiled.schedule.project_finish
+
+def test_load_plan_by_suffix_and_name(tmp_path):
+    (tmp_path / 'plan.json').write_text(json.dumps(_plan()))
+    (tmp_path / 'plans.py').write_text('def make_plan():\n    return {"name" : "made"}\nplan = {"name" : "default"}\n')
+    assert load_plan(str(tmp_path / 'plan.json')) == _plan()
+    assert load_plan(str(tmp_path / 'plans.py')) == {NAME : 'default'}
+    assert load_plan(str(tmp_path / 'plans.py') + ':make_plan') == {NAME : 'made'}
+    with pytest.raises(PlanSourceError):
+        load_plan(str(tmp_path / 'plans.py') + ':missing')
+    with pytest.raises(PlanSourceError):
+        load_plan(str(tmp_path / 'plan.json') + ':plan')
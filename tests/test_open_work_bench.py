@@ -0,0 +1,76 @@
+import time
+import xml.etree.ElementTree as ElementTree
+from pyowb import *
+
+
+def _owb_dependencies(filename):
+    root = ElementTree.parse(filename).getroot()
+    return sorted((element.get('predecessorID'), element.get('successorID')) for element in root.iter('Dependency'))
+
+def test_leaves_inherit_sequence_predecessors_of_all_ancestors(tmp_path):
+    plan = {ID : 'r', NAME : 'root', CHILDREN : [SEQUENCE,
+        {ID : 'a', NAME : 'a', EFFORT : 1},
+        {ID : 's', NAME : 's', CHILDREN : [
+            {ID : 't', NAME : 't', CHILDREN : [{ID : 'b', NAME : 'b', EFFORT : 1}]},
+        ]},
+    ]}
+    filename = str(tmp_path / 'plan.owb.xml')
+    plan_to_owb_xml(filename, plan)
+    assert _owb_dependencies(filename) == [('a', 'b')]
+
+def _comb_plan(depth):
+    root = {NAME : 'root', CHILDREN : []}
+    node = root
+    for level in range(depth):
+        child = {NAME : 'n{0}'.format(level), CHILDREN : []}
+        node[CHILDREN] += [{NAME : 'l{0}'.format(level), EFFORT : 1}, child]
+        node = child
+    node[CHILDREN].append({NAME : 'last', EFFORT : 1})
+    return root
+
+# Every leaf of a deep plan inherits from its ancestors; that must not
+# cost a walk of all of them per leaf.
+def test_deep_plan_exports_in_linear_time(tmp_path):
+    seconds = []
+    for depth in (2000, 8000):
+        plan = _comb_plan(depth)
+        begin = time.perf_counter()
+        plan_to_owb_xml(str(tmp_path / 'comb.owb.xml'), plan)
+        seconds.append(time.perf_counter() - begin)
+    assert seconds[1] < 8 * seconds[0]
+
+def test_leaves_inherit_deps_of_summaries(tmp_path):
+    plan = {ID : 'r', NAME : 'root', CHILDREN : [
+        {ID : 'a', NAME : 'a', EFFORT : 3},
+        {ID : 's', NAME : 's', DEPS : ['a'], CHILDREN : [{ID : 'b', NAME : 'b', EFFORT : 1}]},
+    ]}
+    filename = str(tmp_path / 'plan.owb.xml')
+    plan_to_owb_xml(filename, plan)
+    assert _owb_dependencies(filename) == [('a', 'b')]
+
+# The dependencies read back schedule every leaf as the plan did.
+def test_round_trip_keeps_the_schedule(tmp_path):
+    from pyowb.bench import generate_plan
+    from pyowb.loaders import read_owb_plan
+    plan = generate_plan(500)
+    compiled = compile_plan(plan)
+    filename = str(tmp_path / 'plan.owb.xml')
+    plan_to_owb_xml(filename, compiled)
+    with open(filename) as infile:
+        read_back = compile_plan(read_owb_plan(infile))
+    early_starts = dict(zip(compiled.ids, compiled.schedule.early_start))
+    for index, task_id in enumerate(read_back.ids):
+        if not read_back.store.summaries[index]:
+            assert read_back.schedule.early_start[index] == early_starts[task_id], task_id
+    assert max(read_back.schedule.early_finish) == max(compiled.schedule.early_finish)
+
+# A summary's predecessors go to its first leaves, from the last leaves of
+# a summary predecessor: the other pairs are ordered by the chains.
+def test_summary_dependencies_link_first_and_last_leaves_only(tmp_path):
+    plan = {ID : 'r', NAME : 'root', CHILDREN : [
+        {ID : 's', NAME : 's', CHILDREN : [SEQUENCE, {ID : 'a', NAME : 'a', EFFORT : 1}, {ID : 'b', NAME : 'b', EFFORT : 1}]},
+        {ID : 't', NAME : 't', DEPS : ['s'], CHILDREN : [SEQUENCE, {ID : 'c', NAME : 'c', EFFORT : 1}, {ID : 'd', NAME : 'd', EFFORT : 1}]},
+    ]}
+    filename = str(tmp_path / 'plan.owb.xml')
+    plan_to_owb_xml(filename, plan)
+    assert _owb_dependencies(filename) == [('a', 'b'), ('b', 'c'), ('c', 'd')]
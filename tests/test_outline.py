@@ -0,0 +1,31 @@
+import xml.etree.ElementTree as ElementTree
+from pyowb import *
+
+
+def _plan():
+    return {ID : 'r', NAME : 'root', CHILDREN : [SEQUENCE,
+        {ID : 'a', NAME : 'a', EFFORT : 1},
+        {ID : 'e', NAME : 'Engineering', WBS : 'ENG', CHILDREN : [
+            {ID : 'b', NAME : 'b', EFFORT : 1},
+            PARALLEL,
+            {ID : 's', NAME : 's', CHILDREN : [{ID : 'c', NAME : 'c', EFFORT : 1}, {ID : 'd', NAME : 'd', EFFORT : 1}]},
+        ]},
+        {ID : 'f', NAME : 'f', EFFORT : 1},
+    ]}
+
+def test_outline_numbers_levels_and_wbs_codes():
+    compiled = compile_plan(_plan())
+    assert compiled.ids == ('r', 'a', 'e', 'b', 's', 'c', 'd', 'f')
+    assert list(compiled.levels) == [0, 1, 1, 2, 2, 3, 3, 1]
+    assert outline_numbers(compiled) == ['1', '1.1', '1.2', '1.2.1', '1.2.2', '1.2.2.1', '1.2.2.2', '1.3']
+    assert wbs_codes(compiled) == ['1', '1.1', 'ENG', 'ENG.1', 'ENG.2', 'ENG.2.1', 'ENG.2.2', '1.3']
+
+def test_project_libre_writes_outline_and_wbs(tmp_path):
+    filename = str(tmp_path / 'plan.xml')
+    plan_to_project_libre_xml(filename, _plan(), datetime(2024, 1, 8))
+    rows = []
+    for element in ElementTree.parse(filename).getroot().iter():
+        if element.tag.endswith('}Task') and element.find('{*}OutlineNumber') is not None:
+            rows.append((element.find('{*}WBS').text, element.find('{*}OutlineNumber').text, element.find('{*}OutlineLevel').text))
+    assert ('ENG.2.1', '1.2.2.1', '4') in rows
+    assert ('1.3', '1.3', '2') in rows
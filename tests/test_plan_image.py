@@ -0,0 +1,34 @@
+import pytest
+from pyowb import *
+
+
+def _plan():
+    return {ID : 'r', NAME : 'root', RESOURCES : {'alice' : 1}, CHILDREN : [SEQUENCE,
+        {ID : 'a', NAME : 'QA - a', EFFORT : 2, RESOURCE : 'alice', DESC : 'first'},
+        {ID : 'b', NAME : 'b', EFFORT : 1.5, RESOURCE : ['alice'], 'note' : {'priority' : 2}},
+    ]}
+
+def test_round_trip_keeps_every_column(tmp_path):
+    compiled = compile_plan(_plan())
+    filename = str(tmp_path / 'plan.pyowbc')
+    save_plan_image(compiled, filename)
+    loaded = load_plan_image(filename, mapped=False)
+    assert loaded.ids == compiled.ids
+    assert loaded.store.strings == compiled.store.strings
+    assert loaded.store.efforts.tobytes() == compiled.store.efforts.tobytes()
+    assert list(loaded.predecessors.values) == list(compiled.predecessors.values)
+    assert list(loaded.schedule.early_finish) == list(compiled.schedule.early_finish)
+    assert loaded.store.extras == compiled.store.extras
+    assert resource_assignments(loaded) == resource_assignments(compiled)
+
+def test_extras_that_json_cannot_hold_are_rejected(tmp_path):
+    plan = _plan()
+    plan[CHILDREN][1]['owner'] = object()
+    with pytest.raises(PlanImageError, match='ID=a'):
+        save_plan_image(compile_plan(plan), str(tmp_path / 'plan.pyowbc'))
+    assert not (tmp_path / 'plan.pyowbc').exists()
+
+def test_other_files_are_rejected(tmp_path):
+    (tmp_path / 'plan.pyowbc').write_bytes(b'not an image')
+    with pytest.raises(PlanImageError):
+        load_plan_image(str(tmp_path / 'plan.pyowbc'))
@@ -0,0 +1,31 @@
+import logging
+import os
+from pyowb import *
+
+
+def _plan():
+    return {NAME : 'root', CHILDREN : [SEQUENCE, {NAME : 'a', EFFORT : 1}, {NAME : 'b', EFFORT : 2}]}
+
+def test_report_lists_every_phase(tmp_path, caplog):
+    filename = str(tmp_path / 'plan.owb.xml')
+    with caplog.at_level(logging.INFO, logger='pyowb.profile'):
+        with profile_exports(trace_memory=True, log=True) as reports:
+            plan_to_owb_xml(filename, _plan())
+    assert len(reports) == 1
+    report = reports[0]
+    assert report['export'] == 'plan_to_owb_xml'
+    phases = [phase['phase'] for phase in report['phases']]
+    for phase in ('compile_plan', 'compile_plan/flatten', 'compile_plan/resolve_dependencies',
+                  'compile_plan/dependency_cycles', 'compile_plan/schedule', 'dates', 'leaf_dependencies', 'write'):
+        assert phase in phases
+    assert report['counts']['tasks'] == 3
+    assert report['bytes_written'] == os.path.getsize(filename)
+    assert report['peak_memory'] > 0
+    for phase in phases:
+        assert phase in caplog.text
+
+def test_no_report_outside_a_block(tmp_path):
+    with profile_exports() as reports:
+        pass
+    plan_to_owb_xml(str(tmp_path / 'plan.owb.xml'), _plan())
+    assert reports == []
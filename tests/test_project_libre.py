@@ -0,0 +1,34 @@
+import xml.etree.ElementTree as ElementTree
+from datetime import date
+from pyowb import *
+from pyowb.loaders import read_mspdi_plan
+
+_ns = {'p' : 'http://schemas.microsoft.com/project'}
+
+
+def _standard_week_days(filename):
+    root = ElementTree.parse(filename).getroot()
+    for calendar in root.iterfind('p:Calendars/p:Calendar', _ns):
+        if calendar.findtext('p:Name', namespaces=_ns) == 'Standard':
+            return [(week_day.findtext('p:DayType', namespaces=_ns), week_day.findtext('p:DayWorking', namespaces=_ns),
+                     week_day.findtext('p:TimePeriod/p:FromDate', namespaces=_ns))
+                    for week_day in calendar.iterfind('p:WeekDays/p:WeekDay', _ns)]
+
+def test_calendar_follows_work_calendar(tmp_path):
+    plan = {ID : 'r', NAME : 'root', CHILDREN : [{ID : 'a', NAME : 'a', EFFORT : 3}]}
+    calendar = WorkCalendar('1111110', holidays=[date(2024, 1, 9)])
+    filename = str(tmp_path / 'plan.xml')
+    plan_to_project_libre_xml(filename, plan, datetime(2024, 1, 8), calendar)
+    assert _standard_week_days(filename) == [
+        ('1', '0', None), ('2', '1', None), ('3', '1', None), ('4', '1', None),
+        ('5', '1', None), ('6', '1', None), ('7', '1', None),
+        ('0', '0', '2024-01-09T00:00:00'),
+    ]
+    with open(filename) as infile:
+        read_back = compile_plan(read_mspdi_plan(infile, calendar=calendar))
+    assert read_back.tasks[read_back.id_to_index['a']][EFFORT] == 3
+
+def test_default_calendar_is_monday_to_friday(tmp_path):
+    filename = str(tmp_path / 'plan.xml')
+    plan_to_project_libre_xml(filename, {NAME : 'root', EFFORT : 1}, datetime(2024, 1, 8))
+    assert [working for day_type, working, holiday in _standard_week_days(filename)] == ['0', '1', '1', '1', '1', '1', '0']
@@ -0,0 +1,73 @@
+from pyowb import *
+
+
+def _dates(compiled, task_id):
+    index = compiled.id_to_index[task_id]
+    return (compiled.schedule.early_start[index], compiled.schedule.early_finish[index])
+
+def _leaf(task_id, effort, resource=None):
+    task = {ID : task_id, NAME : task_id, EFFORT : effort}
+    if resource is not None:
+        task[RESOURCE] = resource
+    return task
+
+def test_capacity_of_one_serializes_parallel_leaves():
+    plan = {ID : 'r', NAME : 'root', CHILDREN : [_leaf('a', 2, 'alice'), _leaf('b', 3, 'alice')]}
+    compiled = compile_plan(plan)
+    # b is longer, so its late start is earlier: it goes first
+    assert _dates(compiled, 'b') == (0, 3)
+    assert _dates(compiled, 'a') == (3, 5)
+    assert compiled.schedule.project_finish == 5
+
+def test_capacity_of_two_allows_overlap():
+    plan = {ID : 'r', NAME : 'root', RESOURCES : {'testers' : 2}, CHILDREN : [
+        _leaf('a', 2, 'testers'), _leaf('b', 3, 'testers'), _leaf('c', 1, 'testers'),
+    ]}
+    compiled = compile_plan(plan)
+    assert _dates(compiled, 'a')[0] == _dates(compiled, 'b')[0] == 0
+    # the third one takes the unit that frees up first
+    assert _dates(compiled, 'c') == (2, 3)
+    assert compiled.schedule.project_finish == 3
+
+def test_task_with_several_resources_waits_for_all():
+    plan = {ID : 'r', NAME : 'root', CHILDREN : [
+        _leaf('a', 2, 'alice'), _leaf('b', 4, 'bob'), _leaf('c', 1, ['alice', 'bob']),
+    ]}
+    compiled = compile_plan(plan)
+    assert _dates(compiled, 'c') == (4, 5)
+    assert compiled.schedule.project_finish == 5
+
+def test_most_critical_leaf_goes_first():
+    # b is on the longest path (b -> d), so alice does it before a
+    plan = {ID : 'r', NAME : 'root', CHILDREN : [
+        _leaf('a', 1, 'alice'), _leaf('b', 1, 'alice'),
+        {ID : 'd', NAME : 'd', EFFORT : 5, DEPS : ['b']},
+    ]}
+    compiled = compile_plan(plan)
+    assert _dates(compiled, 'b') == (0, 1)
+    assert _dates(compiled, 'a') == (1, 2)
+    assert _dates(compiled, 'd') == (1, 6)
+    assert compiled.schedule.critical[compiled.id_to_index['b']]
+
+def test_summary_resource_applies_to_its_leaves():
+    plan = {ID : 'r', NAME : 'root', CHILDREN : [
+        {ID : 's', NAME : 's', RESOURCE : 'alice', CHILDREN : [_leaf('a', 2), _leaf('b', 2), _leaf('c', 1, 'bob')]},
+    ]}
+    compiled = compile_plan(plan)
+    assignments = resource_assignments(compiled)
+    assert assignments.names == ('alice', 'bob')
+    assert [assignments.names[resource] for resource in assignments.tasks[compiled.id_to_index['a']]] == ['alice']
+    assert [assignments.names[resource] for resource in assignments.tasks[compiled.id_to_index['c']]] == ['bob']
+    assert assignments.tasks[compiled.id_to_index['s']] == ()
+    assert sorted([_dates(compiled, 'a'), _dates(compiled, 'b')]) == [(0, 2), (2, 4)]
+    assert _dates(compiled, 'c') == (0, 1)
+
+def test_leveling_keeps_dependencies():
+    plan = {ID : 'r', NAME : 'root', CHILDREN : [
+        _leaf('a', 3, 'alice'),
+        {ID : 'b', NAME : 'b', EFFORT : 1, RESOURCE : 'bob', DEPS : ['a']},
+        _leaf('c', 1, 'bob'),
+    ]}
+    compiled = compile_plan(plan)
+    assert _dates(compiled, 'b')[0] >= _dates(compiled, 'a')[1]
+    assert _dates(compiled, 'c') == (0, 1)
@@ -0,0 +1,32 @@
+from pyowb import *
+
+
+def _marker_only_plan():
+    return {NAME : 'root', CHILDREN : [
+        {NAME : 'a', CHILDREN : [SEQUENCE]},
+        {NAME : 'b', EFFORT : 2},
+    ]}
+
+def test_rollup_totals_and_span():
+    plan = {ID : 'r', NAME : 'root', CHILDREN : [SEQUENCE,
+        {ID : 'a', NAME : 'a', EFFORT : 2},
+        {ID : 's', NAME : 's', CHILDREN : [{ID : 'b', NAME : 'b', EFFORT : 3}, {ID : 'c', NAME : 'c', EFFORT : 1}]},
+    ]}
+    rows = rollup_by_id(compile_plan(plan))
+    assert rows['r'] == RollupRow(6, 3, 0, 5)
+    assert rows['s'] == RollupRow(4, 2, 2, 5)
+    assert rows['a'] == RollupRow(2, 1, 0, 2)
+
+def test_summary_without_children_takes_its_own_dates():
+    compiled = compile_plan(_marker_only_plan())
+    rollup = compute_rollup(compiled)
+    index = compiled.id_to_index[compiled.ids[1]]
+    assert rollup.starts[index] == compiled.schedule.early_start[index]
+    assert rollup.finishes[index] == compiled.schedule.early_finish[index]
+    assert rollup_spans(rollup) == [2, 0, 2]
+
+def test_summary_without_children_exports(tmp_path):
+    plan = _marker_only_plan()
+    plan_to_ganttproject(str(tmp_path / 'plan.gan'), plan)
+    plan_to_project_libre_xml(str(tmp_path / 'plan.xml'), plan, datetime(2024, 1, 8))
+    plan_to_owb_xml(str(tmp_path / 'plan.owb.xml'), plan)
@@ -0,0 +1,70 @@
+from pyowb import *
+
+
+def _diamond_plan():
+    return {ID : 'r', NAME : 'root', CHILDREN : [
+        {ID : 'a', NAME : 'a', EFFORT : 2},
+        {ID : 'b', NAME : 'b', EFFORT : 3, DEPS : ['a']},
+        {ID : 'c', NAME : 'c', EFFORT : 1, DEPS : ['a']},
+        {ID : 'd', NAME : 'd', EFFORT : 1, DEPS : ['b', 'c']},
+    ]}
+
+def _dates(compiled, task_id):
+    schedule = compiled.schedule
+    index = compiled.id_to_index[task_id]
+    return (schedule.early_start[index], schedule.early_finish[index],
+            schedule.late_start[index], schedule.late_finish[index],
+            schedule.total_slack[index], schedule.critical[index])
+
+def test_critical_path_and_slack():
+    compiled = compile_plan(_diamond_plan())
+    assert compiled.schedule.project_finish == 6
+    assert _dates(compiled, 'a') == (0, 2, 0, 2, 0, 1)
+    assert _dates(compiled, 'b') == (2, 5, 2, 5, 0, 1)
+    assert _dates(compiled, 'c') == (2, 3, 4, 5, 2, 0)
+    assert _dates(compiled, 'd') == (5, 6, 5, 6, 0, 1)
+    assert _dates(compiled, 'r') == (0, 6, 0, 6, 0, 1)
+
+def test_sequence_chains_children():
+    plan = {ID : 'r', NAME : 'root', CHILDREN : [SEQUENCE,
+        {ID : 'a', NAME : 'a', EFFORT : 2},
+        {ID : 'b', NAME : 'b', EFFORT : 1},
+        {ID : 'c', NAME : 'c', EFFORT : 4},
+    ]}
+    compiled = compile_plan(plan)
+    assert [_dates(compiled, task_id)[:2] for task_id in 'abc'] == [(0, 2), (2, 3), (3, 7)]
+    assert compiled.schedule.project_finish == 7
+
+def test_summary_dependency_waits_for_every_leaf():
+    plan = {ID : 'r', NAME : 'root', CHILDREN : [
+        {ID : 's', NAME : 's', CHILDREN : [
+            {ID : 'a', NAME : 'a', EFFORT : 2},
+            {ID : 'b', NAME : 'b', EFFORT : 5},
+        ]},
+        {ID : 'c', NAME : 'c', EFFORT : 1, DEPS : ['s']},
+    ]}
+    compiled = compile_plan(plan)
+    assert _dates(compiled, 'c')[:2] == (5, 6)
+    assert _dates(compiled, 's')[:2] == (0, 5)
+    assert _dates(compiled, 'a')[4] == 3
+
+def test_summary_milestones_keep_leaf_dates():
+    plan = {ID : 'r', NAME : 'root', CHILDREN : [
+        {ID : 's', NAME : 's', CHILDREN : [
+            {ID : 'a', NAME : 'a', EFFORT : 2},
+            {ID : 'b', NAME : 'b', EFFORT : 5},
+        ]},
+        {ID : 't', NAME : 't', DEPS : ['s'], CHILDREN : [
+            {ID : 'c', NAME : 'c', EFFORT : 1},
+            {ID : 'd', NAME : 'd', EFFORT : 3},
+        ]},
+    ]}
+    plain = compile_plan(plan)
+    milestones = compile_plan(plan, summary_milestones=True)
+    for task_id in 'abcd':
+        assert _dates(milestones, task_id)[:2] == _dates(plain, task_id)[:2]
+    assert milestones.schedule.project_finish == plain.schedule.project_finish == 8
+
+def test_compute_schedule_matches_compiled_schedule():
+    compiled = compile_plan(_diamond_plan())
+    assert compute_schedule(compiled) == compiled.schedule
@@ -0,0 +1,62 @@
+from pyowb import *
+
+
+def _plan():
+    return {ID : 'r', NAME : 'root', CHILDREN : [
+        {ID : 'dev', NAME : 'Dev - backend', CHILDREN : [SEQUENCE,
+            {ID : 'api', NAME : 'Dev - api', EFFORT : 3},
+            {ID : 'db', NAME : 'Dev - db', EFFORT : 2},
+        ]},
+        {ID : 'qa', NAME : 'QA - testing', DEPS : ['dev'], CHILDREN : [
+            {ID : 'plan', NAME : 'QA - test plan', EFFORT : 1},
+            {ID : 'run', NAME : 'QA - test run', EFFORT : 4, DEPS : ['plan']},
+        ]},
+    ]}
+
+def _early_starts(compiled):
+    return dict(zip(compiled.ids, compiled.schedule.early_start))
+
+def test_selected_subtree_keeps_summaries_and_dependencies():
+    part = select_plan(compile_plan(_plan()), make_selection(ids=['qa']))
+    assert part.ids == ('r', 'qa', 'plan', 'run')
+    assert [part.ids[index] for index in part.predecessors[part.id_to_index['run']]] == ['plan']
+    assert part.predecessors[part.id_to_index['qa']] == ()
+
+def test_stubs_stand_in_for_external_predecessors():
+    full = compile_plan(_plan())
+    part = select_plan(full, make_selection(categories=['QA'], stubs=True))
+    assert part.ids == ('r', 'qa', 'plan', 'run', 'r#external', 'dev#external')
+    stub_index = part.id_to_index['dev#external']
+    assert part.tasks[stub_index][EFFORT] == 5
+    assert [part.ids[index] for index in part.predecessors[part.id_to_index['qa']]] == ['dev#external']
+    # the slice keeps the dates of the full plan, and they agree with its dependencies
+    full_starts = _early_starts(full)
+    for task_id, early_start in _early_starts(part).items():
+        if task_id in full_starts:
+            assert early_start == full_starts[task_id]
+    assert list(compute_schedule(part).early_start) == list(part.schedule.early_start)
+
+def test_summary_milestones_are_kept_for_summaries_above_the_selection():
+    full = compile_plan(_plan(), summary_milestones=True)
+    part = select_plan(full, make_selection(ids=['run'], stubs=True))
+    assert 'qa#start' in part.id_to_index
+    assert list(compute_schedule(part).early_start) == list(part.schedule.early_start)
+
+def test_selection_through_writers(tmp_path):
+    selection = make_selection(ids=['qa'], stubs=True)
+    plan_to_owb_xml(str(tmp_path / 'plan.owb.xml'), _plan(), selection=selection)
+    plan_to_project_libre_xml(str(tmp_path / 'plan.xml'), _plan(), datetime(2024, 1, 8), selection=selection)
+    plan_to_ganttproject(str(tmp_path / 'plan.gan'), _plan(), selection=selection)
+    text = (tmp_path / 'plan.owb.xml').read_text()
+    assert 'Dev - api' not in text and 'QA - test run' in text
+
+# A slice of a plan image is cut without compiling the plan again.
+def test_selection_from_a_plan_image(tmp_path):
+    image = str(tmp_path / 'plan.pyowbc')
+    save_plan_image(compile_plan(_plan()), image)
+    selection = make_selection(ids=['qa'], stubs=True)
+    with profile_exports() as reports:
+        plan_to_owb_xml(str(tmp_path / 'image.owb.xml'), image, selection=selection)
+    assert not any(phase['phase'].startswith('compile_plan') for phase in reports[0]['phases'])
+    plan_to_owb_xml(str(tmp_path / 'plan.owb.xml'), _plan(), selection=selection)
+    assert (tmp_path / 'image.owb.xml').read_text() == (tmp_path / 'plan.owb.xml').read_text()
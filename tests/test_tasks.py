@@ -0,0 +1,65 @@
+import copy
+import sys
+from pyowb import *
+
+
+def _sequence_chain(depth):
+    root = {NAME : 'root', CHILDREN : []}
+    node = root
+    for level in range(depth):
+        child = {NAME : 'n{0}'.format(level), CHILDREN : []}
+        node[CHILDREN] += [SEQUENCE, {NAME : 'l{0}'.format(level), EFFORT : 1}, child]
+        node = child
+    node[CHILDREN].append({NAME : 'last', EFFORT : 1})
+    return root
+
+def test_postorder_visits_children_first():
+    plan = {NAME : 'r', CHILDREN : [SEQUENCE, {NAME : 'a', CHILDREN : [{NAME : 'b'}]}, PARALLEL, {NAME : 'c'}]}
+    assert [(task[NAME], level) for task, level in iter_postorder(plan)] == [('b', 2), ('a', 1), ('c', 1), ('r', 0)]
+    compiled = compile_plan(plan)
+    assert [(compiled.ids[index], level) for index, level in iter_postorder(0, compiled.children.__getitem__)] == [
+        (compiled.ids[2], 2), (compiled.ids[1], 1), (compiled.ids[3], 1), (compiled.ids[0], 0)]
+
+def test_preorder_and_postorder_agree():
+    plan = _sequence_chain(50)
+    preorder = [task for task, parent_position, level, sequence_predecessor_position in iter_preorder(plan)]
+    postorder = [task for task, level in iter_postorder(plan)]
+    assert len(preorder) == len(postorder) == 102
+    assert postorder[-1] is preorder[0]
+
+# Far deeper than the recursion limit: nothing may recurse per level.
+def test_deep_sequence_chain_compiles_and_exports(tmp_path):
+    depth = 200000
+    assert depth > 100 * sys.getrecursionlimit()
+    compiled = compile_plan(_sequence_chain(depth))
+    assert compiled.levels[-1] == depth + 1
+    assert compiled.schedule.project_finish == depth + 1
+    assert compute_rollup(compiled).efforts[0] == depth + 1
+    plan_to_owb_xml(str(tmp_path / 'deep.owb.xml'), compiled)
+
+# The outline numbers of ProjectLibre and the nesting of GanttProject grow
+# with the depth of every task, so their files are quadratic in it; a
+# depth past the recursion limit is enough to show they do not recurse.
+def test_deep_sequence_chain_exports_to_every_format(tmp_path):
+    plan = _sequence_chain(3 * sys.getrecursionlimit())
+    plan_to_project_libre_xml(str(tmp_path / 'deep.xml'), plan)
+    plan_to_ganttproject(str(tmp_path / 'deep.gan'), plan)
+
+def test_sanitize_without_in_place_leaves_the_plan_alone():
+    plan = {NAME : 'root', CHILDREN : [SEQUENCE,
+        {ID : 'a', NAME : 'a', EFFORT : 1},
+        {NAME : 'b', EFFORT : 1, DEPS : ['c']},
+        {NAME : 's', CHILDREN : [{ID : 'c', NAME : 'c', EFFORT : 1}]},
+    ]}
+    original = copy.deepcopy(plan)
+    views = []
+    for attempt in range(2):
+        id_to_task = {}
+        views.append(sanitize_tasks(plan, id_to_task, False, in_place=False))
+        assert plan == original
+    assert views[0] == views[1]
+    # the SEQUENCE predecessors are added once, not once per call
+    b = views[1][CHILDREN][2]
+    assert b[DEPS] == ['c', 'a']
+    assert views[1][CHILDREN][3][DEPS] == [b[ID]]
+    assert sanitize_tasks(plan, {}, False) == views[1]
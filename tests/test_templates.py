@@ -0,0 +1,34 @@
+import io
+import pytest
+from pyowb.templates import *
+
+
+def test_render_equals_str_format():
+    text = '<Task name={_name} id="{_id}" pct="100%"><Parent id="{_id}"/>{{literal}}</Task>\n'
+    template = Template(text)
+    assert template.names == ('_name', '_id')
+    values = {'_name' : '"a % b"', '_id' : 12}
+    assert template.render('"a % b"', 12) == text.format(**values)
+    assert template.render_mapping(values) == text.format(**values)
+    rows = [('"x"', 1), ('"y"', 2)]
+    assert template.render_rows(rows) == ''.join(text.format(_name=name, _id=task_id) for name, task_id in rows)
+
+def test_block_template_drops_the_leading_newline():
+    assert block_template('''
+<a>{x}</a>
+''').render(1) == '<a>1</a>\n'
+
+def test_render_checks_its_values():
+    with pytest.raises(TypeError):
+        Template('{a}{b}').render(1)
+    with pytest.raises(ValueError):
+        Template('{a:>4}')
+
+def test_chunked_writer_writes_everything_in_order():
+    outfile = io.StringIO()
+    with ChunkedWriter(outfile, chunk_size=10) as writer:
+        for number in range(100):
+            writer.write(str(number))
+        writer.writelines(['-', '+'])
+    assert outfile.getvalue() == ''.join(str(number) for number in range(100)) + '-+'
+    assert writer.characters_written == len(outfile.getvalue())